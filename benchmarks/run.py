@@ -0,0 +1,325 @@
+"""
+when-cli benchmarks.
+
+Times the location lookup, the time string parsing, the conversion, the table rendering, the
+CLI startup, the CSV file conversion and the log filter. The results are written as JSON
+(microseconds per call) and can be compared with the results of another version:
+
+    $ python -m benchmarks.run --name before
+    $ python -m benchmarks.run --name after --compare benchmarks/results/before.json
+
+`make bench` runs all suites, `make binary` builds the standalone executable and times its
+startup.
+"""
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import zoneinfo
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterator
+
+import click
+
+ROOT = Path(__file__).parent.parent
+CORPUS = Path(__file__).parent / "corpus.txt"
+RESULTS_PATH = Path(__file__).parent / "results"
+
+# location_by_key: configured location, airport codes, city name, TZ name, coordinates, unknown key (and the directory)
+LOOKUPS = {
+    "user": "klu",
+    "iata": "lax",
+    "icao": "lowk",
+    "city": "vienna",
+    "tz": "Europe/Vienna",
+    "coordinates": "46.62,14.31",
+    "miss": "Nowhere/Special",
+}
+DIRECTORY_SIZE = 5000
+SHORT_RANGE = "2022-05-07 00:00 to 2022-05-08 00:00 in UTC"
+LONG_RANGE = "2022-01-01 00:00 to 2022-12-31 23:45 in UTC"
+BULK_ROWS = 50_000
+FILTER_LINES = 100_000
+CLI_ARGS = ["2022-05-07 00:00 to 2022-05-08 00:00 in UTC", "-l", "klu", "-l", "lax", "-l", "sin", "-l", "utc"]
+
+Benchmark = Callable[[], object]
+
+
+@contextlib.contextmanager
+def lookup_benchmarks() -> Iterator[dict[str, Benchmark]]:
+    from when import config
+    from when.when import location_by_key
+
+    def lookup(key: str) -> Benchmark:
+        def run():
+            try:
+                return location_by_key(key)
+            except zoneinfo.ZoneInfoNotFoundError:
+                return None
+
+        return run
+
+    # user location directory with DIRECTORY_SIZE entries
+    with tempfile.TemporaryDirectory(prefix="when-bench-") as tmp:
+        directory = Path(tmp) / "directory.csv"
+        lines = [f"user{i},Europe/Vienna,User {i},u{i}" for i in range(DIRECTORY_SIZE)]
+        directory.write_text("key,tz,description,aliases\n" + "\n".join(lines) + "\n")
+        env = {"WHEN_CONFIG_DIRECTORY": str(directory), "WHEN_CACHE_DIR": str(Path(tmp) / "cache")}
+        saved = {k: os.environ.get(k) for k in env}
+        os.environ.update(env)
+        config.reset()
+        try:
+            location_by_key("utc")  # open the indexes
+            benchmarks = {f"lookup.{name}": lookup(key) for name, key in LOOKUPS.items()}
+            benchmarks["lookup.directory"] = lookup(f"u{DIRECTORY_SIZE // 2}")
+            yield benchmarks
+        finally:
+            for k, v in saved.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+            # the settings must not keep the temporary directory
+            config.reset()
+
+
+@contextlib.contextmanager
+def parse_benchmarks() -> Iterator[dict[str, Benchmark]]:
+    """Per corpus, not per line."""
+    from when.when import parse_time_string, split_time_string
+
+    lines = [line.strip() for line in CORPUS.read_text().splitlines() if line.strip()]
+    splitted = [split_time_string(line) for line in lines]
+
+    def split():
+        return [split_time_string(line) for line in lines]
+
+    def parse():
+        return [(parse_time_string(t1, "UTC"), t2 and parse_time_string(t2, "UTC")) for t1, t2, _ in splitted]
+
+    yield {"parse.split": split, "parse.parse": parse}
+
+
+@contextlib.contextmanager
+def convert_benchmarks() -> Iterator[dict[str, Benchmark]]:
+    from when.when import Converter, Tzone, when
+
+    short, long = Tzone(SHORT_RANGE), Tzone(LONG_RANGE)
+    lines = [line.strip() for line in CORPUS.read_text().splitlines() if line.strip()]
+    keys = ["klu", "lax", "sin", "utc"]
+    converter = Converter(keys)
+    yield {
+        # 25 hourly times
+        "convert.short": lambda: short.convert("Europe/Vienna"),
+        # 35040 times every 15 minutes
+        "convert.long": lambda: long.convert("Europe/Vienna", step=900),
+        # per corpus into 4 locations: one when() per line vs. a shared converter
+        "convert.when": lambda: [when(line, keys) for line in lines],
+        "convert.many": lambda: list(converter.many(lines)),
+    }
+
+
+@contextlib.contextmanager
+def render_benchmarks() -> Iterator[dict[str, Benchmark]]:
+    from when.__main__ import command
+
+    cmd = command()
+
+    def render(*extra: str) -> Benchmark:
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                cmd.main(args=[*CLI_ARGS, *extra], prog_name="when-cli", standalone_mode=False)
+
+        return run
+
+    yield {"render.table": render(), "render.csv": render("-o", "csv")}
+
+
+@contextlib.contextmanager
+def startup_benchmarks() -> Iterator[dict[str, Benchmark]]:
+    """Complete `when-cli` processes: without bytecode cache, with bytecode cache and served by a daemon.
+
+    With WHEN_BENCH_BINARY also the standalone executable (startup.binary).
+    """
+    # the daemon of the user must not answer, and the results must not depend on the terminal
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+    env.update({"WHEN_DAEMON_SOCKET": os.devnull, "COLUMNS": "120", "PYTHONPATH": str(ROOT)})
+    argv = [sys.executable, "-c", "from when.daemon import run; run()", *CLI_ARGS]
+
+    with tempfile.TemporaryDirectory(prefix="when-bench-") as tmp:
+        pycache, sock = str(Path(tmp) / "pycache"), str(Path(tmp) / "when.sock")
+
+        def cold():
+            with tempfile.TemporaryDirectory(prefix="when-bench-") as prefix:
+                subprocess.run(argv, env={**env, "PYTHONPYCACHEPREFIX": prefix}, check=True, stdout=subprocess.DEVNULL)
+
+        def warm():
+            subprocess.run(argv, env={**env, "PYTHONPYCACHEPREFIX": pycache}, check=True, stdout=subprocess.DEVNULL)
+
+        def daemon():
+            subprocess.run(argv, env={**env, "WHEN_DAEMON_SOCKET": sock}, check=True, stdout=subprocess.DEVNULL)
+
+        server = subprocess.Popen(
+            [sys.executable, "-m", "when", "--daemon"],
+            env={**env, "WHEN_DAEMON_SOCKET": sock},
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            for _ in range(100):
+                if Path(sock).exists():
+                    break
+                time.sleep(0.05)
+            warm()  # fill the bytecode cache
+            benchmarks = {"startup.cold": cold, "startup.warm": warm, "startup.daemon": daemon}
+            if binary := os.environ.get("WHEN_BENCH_BINARY"):
+                # standalone build (see when-cli.spec)
+                benchmarks["startup.binary"] = lambda: subprocess.run(
+                    [binary, *CLI_ARGS], env=env, check=True, stdout=subprocess.DEVNULL
+                )
+            yield benchmarks
+        finally:
+            server.terminate()
+            server.wait()
+
+
+@contextlib.contextmanager
+def bulk_benchmarks() -> Iterator[dict[str, Benchmark]]:
+    """convert-file of BULK_ROWS rows into 3 locations, in-process and with a worker per CPU."""
+    from when.bulk import convert_file, default_jobs
+    from when.when import location_by_key
+
+    lines = [f"{i},2022-{i % 12 + 1:02}-{i % 28 + 1:02} {i % 24:02}:{i % 60:02}:00,row {i}" for i in range(BULK_ROWS)]
+    text = "id,created,note\n" + "\n".join(lines) + "\n"
+    source, targets = location_by_key("klu"), [(key, location_by_key(key)) for key in ("lax", "sin", "utc")]
+
+    def bulk(jobs: int) -> Benchmark:
+        def run():
+            return convert_file(io.StringIO(text), io.StringIO(), io.StringIO(), "created", source, targets, jobs=jobs)
+
+        return run
+
+    yield {"bulk.jobs1": bulk(1), f"bulk.jobs{default_jobs()}": bulk(default_jobs())}
+
+
+@contextlib.contextmanager
+def filter_benchmarks() -> Iterator[dict[str, Benchmark]]:
+    """when-cli filter of FILTER_LINES log lines, 10 per second."""
+    from when.rewrite import Rewriter, rewrite_stream
+
+    lines = [
+        f"2022-05-07 {i // 36000:02}:{i // 600 % 60:02}:{i // 10 % 60:02}.{i % 1000:03} INFO worker-{i % 7} id={i}\n"
+        for i in range(FILTER_LINES)
+    ]
+    data = "".join(lines).encode("utf-8")
+    utc, klu, lax = (
+        zoneinfo.ZoneInfo("UTC"),
+        zoneinfo.ZoneInfo("Europe/Vienna"),
+        zoneinfo.ZoneInfo("America/Los_Angeles"),
+    )
+
+    def run(annotate: bool) -> Benchmark:
+        targets = [("klu", klu), ("lax", lax)] if annotate else [("klu", klu)]
+
+        def rewrite():
+            # a new rewriter per run, its caches are part of the benchmark
+            rewrite_stream(Rewriter(utc, targets, annotate=annotate), io.BytesIO(data), io.BytesIO())
+
+        return rewrite
+
+    yield {"filter.rewrite": run(False), "filter.annotate": run(True)}
+
+
+SUITES = {
+    "lookup": lookup_benchmarks,
+    "parse": parse_benchmarks,
+    "convert": convert_benchmarks,
+    "render": render_benchmarks,
+    "startup": startup_benchmarks,
+    "bulk": bulk_benchmarks,
+    "filter": filter_benchmarks,
+}
+
+
+def measure(func: Benchmark, repeat: int) -> dict:
+    """Best and median time per call (µs), every run loops long enough to be measurable (0.2s)."""
+    timer = timeit.Timer(func)
+    loops, _ = timer.autorange()
+    times = [t / loops * 1e6 for t in timer.repeat(repeat=repeat, number=loops)]
+    return {"best": round(min(times), 3), "median": round(statistics.median(times), 3), "loops": loops}
+
+
+def commit() -> str | None:
+    with contextlib.suppress(OSError, subprocess.CalledProcessError):
+        cmd = ["git", "rev-parse", "--short", "HEAD"]
+        return subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    return None
+
+
+def run_benchmarks(suites: list[str], repeat: int, only: str = "") -> dict[str, dict]:
+    results = {}
+    for suite in suites:
+        with SUITES[suite]() as benchmarks:
+            for name, func in benchmarks.items():
+                if only and only not in name:
+                    continue
+                results[name] = measure(func, repeat)
+                click.echo(f"{name:<20} {results[name]['best']:>14,.1f} µs")
+    return results
+
+
+def compare(old: dict[str, dict], new: dict[str, dict], threshold: float) -> list[str]:
+    """Benchmarks slower than threshold times the old best."""
+    click.echo(f"\n{'':<20} {'old µs':>14} {'new µs':>14} {'ratio':>8}")
+    regressions = []
+    for name in [name for name in new if name in old]:
+        ratio = new[name]["best"] / old[name]["best"]
+        mark = ""
+        if ratio > threshold:
+            regressions.append(name)
+            mark = " slower"
+        click.echo(f"{name:<20} {old[name]['best']:>14,.1f} {new[name]['best']:>14,.1f} {ratio:>8.2f}{mark}")
+    return sorted(regressions)
+
+
+@click.command()
+@click.option("--name", default=None, help="Result name, the git commit by default.")
+@click.option("--suite", "suites", multiple=True, type=click.Choice(list(SUITES)), help="Run only these suites.")
+@click.option("-k", "only", default="", help="Run only benchmarks containing this text.")
+@click.option("--repeat", default=5, show_default=True, help="Runs per benchmark.")
+@click.option("--compare", "baseline", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--threshold", default=1.2, show_default=True, help="Fail --compare if slower than this ratio.")
+def main(name: str | None, suites: tuple[str], only: str, repeat: int, baseline: Path | None, threshold: float):
+    from when.__main__ import VERSION
+
+    name = name or commit() or VERSION
+    results = run_benchmarks(list(suites or SUITES), repeat, only)
+    report = {
+        "name": name,
+        "version": VERSION,
+        "commit": commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "benchmarks": results,
+    }
+    RESULTS_PATH.mkdir(exist_ok=True)
+    path = RESULTS_PATH / f"{name}.json"
+    path.write_text(json.dumps(report, indent=2) + "\n")
+    click.echo(f"written to {path}")
+
+    if baseline:
+        if regressions := compare(json.loads(baseline.read_text())["benchmarks"], results, threshold):
+            raise click.ClickException(f"slower than {baseline}: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
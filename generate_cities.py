@@ -1,30 +1,22 @@
 """
-Generate city to time zone mapping file.
+Generate city to time zone mapping file and the places (coordinates) file.
 
 Based on https://github.com/mitsuhiko/when-data
 Thank you Armin :)
 """
+import zoneinfo
 from pathlib import Path
+from typing import Iterator
 
 import click
-from pydantic import BaseModel
-
-
-class Location(BaseModel):
-    name: str
-    country: str
-    tz: str
-    sort_key: tuple
-
-    class Config:
-        fields = {"sort_key": {"exclude": True}}
-
-
-class Locations(BaseModel):
-    __root__: dict[str, Location] = {}
 
+from when.geo import Place, Places, write_places
+from when.index import Table, write_table
 
 DATA_PATH = Path(__file__).parent / "dump"
+# build input of generate_index.py, not part of the package
+CITIES_PATH = DATA_PATH / "cities.idx"
+PLACES_PATH = Path(__file__).parent / "when" / "data" / "places.idx"
 
 # geonames
 GEONAMEID = 0
@@ -48,48 +40,70 @@ TIMEZONE = 17
 MODIFICATION_DATE = 18
 
 
-memoized = {}
+def read_cities(
+    path: Path, label: str = "[1] Finding cities"
+) -> Iterator[tuple[tuple, str, tuple[str, str, str], tuple[float, float]]]:
+    """Stream (sort_key, name, (name, country, tz), (latitude, longitude)) of all populated places line by line."""
+    with click.progressbar(length=path.stat().st_size, label=label, update_min_steps=10000) as pb:
+        with path.open("rb") as f:
+            for line in f:
+                pb.update(len(line))
+                if line.startswith(b"#"):
+                    continue
+                pieces = line.rstrip(b"\r\n").split(b"\t")
 
+                tz = pieces[TIMEZONE]
+                if not tz or pieces[FEATURE_CLASS] != b"P":
+                    continue
 
-def find_locations() -> Locations:
-    locations = Locations()
-    cities = DATA_PATH / "cities15000.txt"
+                name = pieces[ASCIINAME].decode("utf-8")
+                country = pieces[COUNTRY_CODE]
+                sort_key = (
+                    pieces[FEATURE_CODE] != b"PPLC",
+                    country != b"US",
+                    -int(pieces[POPULATION] or 0),
+                )
+                coordinates = (float(pieces[LATITUDE]), float(pieces[LONGITUDE]))
+                yield sort_key, name, (name, country.decode("utf-8"), tz.decode("utf-8")), coordinates
 
-    with click.progressbar(length=cities.stat().st_size, label="[1] Finding cities", update_min_steps=10) as pb:
-        for line in cities.read_bytes().splitlines():
-            pb.update(len(line))
-            line = line.rstrip()
-            if line.startswith(b"#"):
-                continue
-            pieces = line.split(b"\t")
 
-            tz = pieces[TIMEZONE]
-            if not tz:
-                continue
+def find_locations(path: Path) -> dict[str, tuple[str, str, str]]:
+    """Best ranked city (capitals first, then US, then by population) per lower-case name."""
+    best: dict[str, tuple[tuple, tuple[str, str, str]]] = {}
+    for sort_key, name, city, _ in read_cities(path):
+        key = name.lower()
+        if key not in best or sort_key < best[key][0]:
+            best[key] = (sort_key, city)
+    return {key: city for key, (_, city) in best.items()}
 
-            feature_code = pieces[FEATURE_CODE]
-            if feature_code in (b"PPLA", b"PPLC") or feature_code[:1]:
-                name = pieces[ASCIINAME].decode("utf-8")
-                locations.__root__[name.lower()] = Location(
-                    name=name,
-                    country=pieces[COUNTRY_CODE].decode("utf-8"),
-                    tz=tz.decode("utf-8"),
-                    sort_key=(
-                        pieces[FEATURE_CODE] != b"PPLC",
-                        pieces[COUNTRY_CODE] != b"US",
-                        -int(pieces[POPULATION].decode("utf-8")),
-                    ),
-                )
 
-    return locations
+def find_places(path: Path) -> Iterator[Place]:
+    """Every populated place with a known timezone and its coordinates, streamed (see when.geo.write_places)."""
+    timezones = zoneinfo.available_timezones()
+    for _, _, (name, country, tz), (lat, lon) in read_cities(path, label="[4] Finding places"):
+        if tz in timezones:
+            yield Place(lat, lon, f"{name}, {country}", tz)
 
 
 @click.command()
-def main():
-    locations = find_locations()
+@click.option(
+    "--source",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=DATA_PATH / "cities15000.txt",
+    show_default=True,
+    help="geonames dump, e.g. cities15000.txt or allCountries.txt",
+)
+def main(source: Path):
+    locations = find_locations(source)
     click.echo("[2] Writing cities")
-    Path("when/when/data/cities.json").write_text(locations.json())
-    click.echo(f"[3] {len(locations.__root__)} written")
+    count = write_table(CITIES_PATH, locations)
+    if not Table(CITIES_PATH).verify():
+        raise click.ClickException(f"{CITIES_PATH} is corrupt")
+    click.echo(f"[3] {count} written")
+    count = write_places(PLACES_PATH, find_places(source))
+    if not Places(PLACES_PATH).verify():
+        raise click.ClickException(f"{PLACES_PATH} is corrupt")
+    click.echo(f"[5] {count} places written")
 
 
 if __name__ == "__main__":
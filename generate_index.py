@@ -0,0 +1,78 @@
+"""
+Generate the location lookup index.
+
+Combines airport codes (IATA, ICAO), city names and time zone names into one
+sorted table file used by when.when.location_by_key. Without a geonames dump the
+places file (when.geo) is written too, with the airports instead of the cities
+(see generate_cities.py).
+"""
+import zoneinfo
+from pathlib import Path
+from typing import Iterator
+
+import airportsdata
+import click
+
+from when.geo import Place, Places, write_places
+from when.index import Table, write_table
+
+DATA_PATH = Path(__file__).parent / "when" / "data"
+DUMP_PATH = Path(__file__).parent / "dump"
+
+
+def find_entries() -> dict[str, tuple[str, str, str]]:
+    """Collect all (kind, description, tz) entries by lower-case key, first source wins."""
+    timezones = zoneinfo.available_timezones()
+    entries: dict[str, tuple[str, str, str]] = {}
+
+    # IATA 3-letter code
+    # ICAO 4-alphanumeric code or FAA/TD LID prefaced by “K”
+    for code in ["IATA", "ICAO"]:
+        for key, entry in airportsdata.load(code).items():
+            if entry["tz"] in timezones:
+                entries.setdefault(key.lower(), (code, f"{entry['name']}, {entry['country']}", entry["tz"]))
+
+    # see generate_cities.py
+    cities = Table(DUMP_PATH / "cities.idx")
+    for key, (name, country, tz) in cities.items():
+        if tz in timezones:
+            entries.setdefault(key, ("city", f"{name}, {country}", tz))
+
+    # time zone names are case-sensitive, the original spelling is kept in the tz field
+    for tz in timezones:
+        entries.setdefault(tz.lower(), ("tz", "", tz))
+
+    return entries
+
+
+def find_places() -> Iterator[Place]:
+    """Airports with coordinates and a known timezone, the places without a geonames dump."""
+    timezones = zoneinfo.available_timezones()
+    for entry in airportsdata.load("ICAO").values():
+        if entry["tz"] in timezones and abs(entry["lat"]) <= 90 and abs(entry["lon"]) <= 180:
+            yield Place(entry["lat"], entry["lon"], f"{entry['name']}, {entry['country']}", entry["tz"])
+
+
+@click.command()
+def main():
+    click.echo("[1] Collecting airports, cities and timezones")
+    entries = find_entries()
+    click.echo("[2] Writing index")
+    path = DATA_PATH / "locations.idx"
+    count = write_table(path, entries)
+    if not Table(path).verify():
+        raise click.ClickException(f"{path} is corrupt")
+    click.echo(f"[3] {count} written")
+    if any(DUMP_PATH.glob("*.txt")):
+        click.echo("[4] Places (coordinates) of the geonames dump, see generate_cities.py")
+        return
+    click.echo("[4] Writing places (coordinates) of the airports, no geonames dump")
+    path = DATA_PATH / "places.idx"
+    count = write_places(path, find_places())
+    if not Places(path).verify():
+        raise click.ClickException(f"{path} is corrupt")
+    click.echo(f"[5] {count} written")
+
+
+if __name__ == "__main__":
+    main()
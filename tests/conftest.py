@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+
+def pytest_configure(config):
+    # keep the config file and the caches of the user out of the tests
+    home = tempfile.mkdtemp(prefix="when-tests-")
+    os.environ["WHEN_CONFIG_FILE"] = os.path.join(home, "config.json")
+    os.environ["WHEN_CACHE_DIR"] = os.path.join(home, "cache")
@@ -0,0 +1,41 @@
+import json
+
+import benchmarks.run
+from benchmarks.run import compare, measure, run_benchmarks
+from click.testing import CliRunner
+
+
+def test_measure():
+    result = measure(lambda: sum(range(100)), repeat=2)
+    assert 0 < result["best"] <= result["median"]
+    assert result["loops"] > 1
+
+
+def test_run_benchmarks():
+    results = run_benchmarks(["lookup", "convert"], repeat=1, only="short")
+    assert list(results) == ["convert.short"]
+
+
+def test_compare():
+    old = {"a": {"best": 10.0}, "b": {"best": 10.0}, "gone": {"best": 1.0}}
+    new = {"a": {"best": 11.0}, "b": {"best": 13.0}, "new": {"best": 1.0}}
+    assert compare(old, new, threshold=1.2) == ["b"]
+
+
+def test_main(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmarks.run, "RESULTS_PATH", tmp_path)
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"benchmarks": {"lookup.user": {"best": 1e-6}}}))
+
+    result = CliRunner().invoke(
+        benchmarks.run.main, ["--name", "test", "--suite", "lookup", "-k", "user", "--repeat", "1"]
+    )
+    assert result.exit_code == 0, result.output
+    report = json.loads((tmp_path / "test.json").read_text())
+    assert list(report["benchmarks"]) == ["lookup.user"]
+    assert report["version"]
+
+    args = ["--name", "test", "--suite", "lookup", "-k", "user", "--repeat", "1", "--compare", str(baseline)]
+    result = CliRunner().invoke(benchmarks.run.main, args)
+    assert result.exit_code == 1
+    assert "lookup.user" in result.output
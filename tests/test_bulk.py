@@ -0,0 +1,109 @@
+import csv
+import io
+
+import pytest
+from when.__main__ import dispatch
+from when.bulk import convert_file, convert_values, parse_timestamp
+from when.when import location_by_key
+
+CSV = """id,created,note
+1,2022-05-07 06:00,a
+2,bogus,b
+3,2022-03-27T03:30:00,c
+4,7. May 2022 17:00,"x,y"
+5,2022-05-07T06:00:00+00:00,d
+6
+"""
+
+
+def targets(*keys):
+    return [(key, location_by_key(key)) for key in keys]
+
+
+def test_parse_timestamp():
+    assert parse_timestamp("2022-05-07 06:00", "Europe/Vienna").isoformat() == "2022-05-07T06:00:00+02:00"
+    assert parse_timestamp("2022-05-07T06:00:00-07:00", "Europe/Vienna").isoformat() == "2022-05-07T06:00:00-07:00"
+    assert parse_timestamp("7. May 2022 6:00", "Europe/Vienna").isoformat() == "2022-05-07T06:00:00+02:00"
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("2022-05-07T06:00:00Z", "2022-05-07T06:00:00+00:00"),
+        ("2022-05-07T06:00:00.250Z", "2022-05-07T06:00:00.250000+00:00"),
+        ("2022-05-07 06:00:00 +0000", "2022-05-07T06:00:00+00:00"),
+        ("2022-05-07 06:00 -07:00", "2022-05-07T06:00:00-07:00"),
+        ("2022-05-07 06:00:00+05", "2022-05-07T06:00:00+05:00"),
+        ("7. May 2022 6:00 +0100", "2022-05-07T06:00:00+01:00"),
+        ("May 7th 2022 6:00am Z", "2022-05-07T06:00:00+00:00"),
+        # a date only, not a UTC offset
+        ("2022-05-07", "2022-05-07T00:00:00+02:00"),
+    ],
+)
+def test_parse_timestamp_offset(value, expected):
+    assert parse_timestamp(value, "Europe/Vienna").isoformat() == expected
+
+
+def test_convert_values():
+    assert convert_values("Europe/Vienna", ("UTC", "Asia/Singapore"), ["2022-01-01 00:00", "nope"]) == [
+        ["2021-12-31T23:00:00+00:00", "2022-01-01T07:00:00+08:00"],
+        "Unknown string format: nope",
+    ]
+
+
+@pytest.mark.parametrize("jobs, chunk_size", [(1, 10_000), (2, 2)])
+def test_convert_file(jobs, chunk_size):
+    output, errors = io.StringIO(), io.StringIO()
+    stats = convert_file(
+        io.StringIO(CSV), output, errors, "created", location_by_key("klu"), targets("utc", "lax"), chunk_size, jobs
+    )
+    assert stats == (6, 2)
+    assert list(csv.reader(io.StringIO(output.getvalue()))) == [
+        ["id", "created", "note", "created_utc", "created_lax"],
+        ["1", "2022-05-07 06:00", "a", "2022-05-07T04:00:00+00:00", "2022-05-06T21:00:00-07:00"],
+        ["3", "2022-03-27T03:30:00", "c", "2022-03-27T01:30:00+00:00", "2022-03-26T18:30:00-07:00"],
+        ["4", "7. May 2022 17:00", "x,y", "2022-05-07T15:00:00+00:00", "2022-05-07T08:00:00-07:00"],
+        ["5", "2022-05-07T06:00:00+00:00", "d", "2022-05-07T06:00:00+00:00", "2022-05-06T23:00:00-07:00"],
+    ]
+    assert [row[:2] for row in csv.reader(io.StringIO(errors.getvalue()))] == [["row", "id"], ["2", "2"], ["6", "6"]]
+
+
+def test_convert_file_many_chunks():
+    lines = [f"{i},2022-03-27 {i % 24:02}:00" for i in range(1000)]
+    output = io.StringIO()
+    stats = convert_file(
+        io.StringIO("id,ts\n" + "\n".join(lines)),
+        output,
+        io.StringIO(),
+        "ts",
+        location_by_key("utc"),
+        targets("klu"),
+        7,
+        2,
+    )
+    assert stats == (1000, 0)
+    rows = list(csv.reader(io.StringIO(output.getvalue())))[1:]
+    assert [row[0] for row in rows] == [str(i) for i in range(1000)]
+    assert [row[2] for row in rows[:2]] == ["2022-03-27T01:00:00+01:00", "2022-03-27T03:00:00+02:00"]
+
+
+@pytest.mark.parametrize("text", ["", "id,note\n1,a\n"])
+def test_convert_file_invalid(text):
+    with pytest.raises(ValueError):
+        convert_file(io.StringIO(text), io.StringIO(), io.StringIO(), "created", location_by_key("utc"), [], jobs=1)
+
+
+def test_cli(tmp_path, capsys):
+    path, errors = tmp_path / "in.csv", tmp_path / "errors.csv"
+    path.write_text(CSV)
+    command, args, prog_name = dispatch(
+        ["convert-file", str(path), "-c", "created", "--from", "utc", "-l", "sin", "-j", "1", "--errors", str(errors)]
+    )
+    assert prog_name == "when-cli convert-file"
+    with pytest.raises(SystemExit) as e:
+        command.main(args=args, prog_name=prog_name, standalone_mode=False)
+    assert e.value.code == 1
+    out, err = capsys.readouterr()
+    assert out.splitlines()[:2] == ["id,created,note,created_sin", "1,2022-05-07 06:00,a,2022-05-07T14:00:00+08:00"]
+    assert err == "2 of 6 rows could not be converted\n"
+    assert len(errors.read_text().splitlines()) == 3
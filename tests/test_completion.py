@@ -0,0 +1,117 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from when import completion, config
+from when.completion import LIMIT, complete_location, complete_time_string
+
+
+@pytest.mark.parametrize(
+    "incomplete, expected",
+    [
+        ("kl", ("klu", "Klagenfurt, Austria")),
+        ("KL", ("KLu", "Klagenfurt, Austria")),
+        ("lowk", ("lowk", "Klagenfurt Airport, AT (Europe/Vienna)")),
+        ("Europe/Vie", ("Europe/Vienna", "")),
+        ("europe/vie", ("Europe/Vienna", "")),
+        ("los ang", ("los angeles", "Los Angeles, US (America/Los_Angeles)")),
+    ],
+)
+def test_complete_location(incomplete, expected):
+    assert expected in complete_location(incomplete)
+
+
+def test_complete_location_limit():
+    candidates = complete_location("")
+    assert len(candidates) == LIMIT
+    assert candidates[:4] == [(loc["key"], loc["description"]) for loc in config.DEFAULT_LOCATIONS]
+    assert complete_location("no-such-location") == []
+
+
+@pytest.mark.parametrize(
+    "incomplete, expected",
+    [
+        ("17:00 in kl", "17:00 in klu"),
+        ("17:00 IN kl", "17:00 IN klu"),
+        ("17:00@kl", "17:00@klu"),
+        ("6:00 - 10:00 in Asia/Singa", "6:00 - 10:00 in Asia/Singapore"),
+    ],
+)
+def test_complete_time_string(incomplete, expected):
+    assert expected in [value for value, _ in complete_time_string(incomplete)]
+
+
+def test_complete_time_string_without_location():
+    assert complete_time_string("17:00") == []
+
+
+def test_complete_without_cached_settings(monkeypatch):
+    monkeypatch.setattr(completion, "cached_settings", lambda: None)
+    monkeypatch.setenv("WHEN_CONFIG_LOCATIONS", json.dumps([{"key": "home", "description": "Couch", "tz": "UTC"}]))
+    assert complete_location("ho")[0] == ("home", "Couch")
+    assert ("klu", "Klagenfurt, Austria") not in complete_location("kl")
+
+
+@pytest.mark.parametrize(
+    "words, expected",
+    [("when-cli -l kl", '"klu":"Klagenfurt, Austria"'), ("when-cli overlap sin kl", '"klu":"Klagenfurt, Austria"')],
+)
+def test_shell_completion(words, expected):
+    code = (
+        "import sys; from when.__main__ import run\n"
+        "try:\n    run()\nexcept SystemExit:\n    pass\n"
+        "print([m for m in sys.modules if m == 'when.when' or m.split('.')[0] in ('rich', 'pydantic', 'dateutil')])"
+    )
+    env = {**os.environ, "_WHEN_CLI_COMPLETE": "complete_zsh", "_TYPER_COMPLETE_ARGS": words}
+    proc = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert expected in proc.stdout
+    assert proc.stdout.splitlines()[-1] == "[]"
+
+
+@pytest.mark.parametrize(
+    "env, expected",
+    [
+        ({"_TYPER_COMPLETE_ARGS": "when-cli -l kl"}, ('_arguments \'*: :(("klu":"Klagenfurt, Austria"', 0)),
+        ({"_TYPER_COMPLETE_ARGS": "when-cli '17:00 in kl"}, ('_arguments \'*: :(("17:00 in klu"', 0)),
+        ({"_TYPER_COMPLETE_ARGS": "when-cli overlap sin kl"}, ('_arguments \'*: :(("klu"', 0)),
+        ({"_TYPER_COMPLETE_ARGS": "when-cli filter --from kl"}, ('_arguments \'*: :(("klu"', 0)),
+        ({"_TYPER_COMPLETE_ARGS": "when-cli -l no-such-location"}, ("_files", 0)),
+        ({"_WHEN_CLI_COMPLETE": "complete_bash", "COMP_WORDS": "when-cli -l kl", "COMP_CWORD": "2"}, ("klu\n", 0)),
+        ({"_WHEN_CLI_COMPLETE": "complete_fish", "_TYPER_COMPLETE_ARGS": "when-cli -l kl"}, ("klu\tKlagenfurt", 0)),
+        (
+            {
+                "_WHEN_CLI_COMPLETE": "complete_fish",
+                "_TYPER_COMPLETE_FISH_ACTION": "is-args",
+                "_TYPER_COMPLETE_ARGS": "when-cli -l kl",
+            },
+            (None, 0),
+        ),
+        # options, their values and the time string without location are completed by typer
+        ({"_TYPER_COMPLETE_ARGS": "when-cli --ti"}, None),
+        ({"_TYPER_COMPLETE_ARGS": "when-cli --output j"}, None),
+        ({"_TYPER_COMPLETE_ARGS": "when-cli 17:0"}, None),
+        ({"_TYPER_COMPLETE_ARGS": "when-cli convert-file in"}, None),
+        ({"_WHEN_CLI_COMPLETE": "complete_powershell"}, None),
+    ],
+)
+def test_complete_shell(env, expected):
+    result = completion.complete_shell({"_WHEN_CLI_COMPLETE": "complete_zsh", **env})
+    if expected is None or expected[0] is None:
+        assert result == expected
+    else:
+        output, code = result
+        assert output.startswith(expected[0]) and code == expected[1]
+
+
+def test_shell_completion_without_typer():
+    code = (
+        "import sys; from when.daemon import run\n"
+        "try:\n    run()\nexcept SystemExit:\n    pass\n"
+        "print([m for m in sys.modules if m in ('click', 'typer', 'when.__main__', 'when.when', 'pydantic', 'rich')])"
+    )
+    env = {**os.environ, "_WHEN_CLI_COMPLETE": "complete_zsh", "_TYPER_COMPLETE_ARGS": "when-cli -l kl"}
+    proc = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert '"klu":"Klagenfurt, Austria"' in proc.stdout
+    assert proc.stdout.splitlines()[-1] == "[]"
@@ -0,0 +1,132 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from when import config
+from when.__main__ import command
+from when.config import ConfigError, config_file, default_tz, get_settings
+from when.when import Tzone
+
+
+@pytest.fixture
+def config_path(tmp_path, monkeypatch):
+    path = tmp_path / "config.json"
+    monkeypatch.setenv("WHEN_CONFIG_FILE", str(path))
+    monkeypatch.setenv("WHEN_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.delenv("WHEN_CONFIG_DEFAULT_TZ", raising=False)
+    monkeypatch.delenv("WHEN_CONFIG_LOCATIONS", raising=False)
+    monkeypatch.setattr(config, "_settings", None)
+    return path
+
+
+def write_config(path, data, mtime_ns):
+    path.write_text(json.dumps(data))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_defaults(config_path):
+    settings = get_settings()
+    assert config_file() == config_path
+    assert settings.default_tz is None
+    assert [loc.key for loc in settings.locations] == ["klu", "els", "sin", "utc"]
+    assert get_settings() is settings
+
+
+def test_config_file(config_path, monkeypatch):
+    locations = [{"key": "home", "description": "On my couch", "tz": "Europe/Vienna"}]
+    write_config(config_path, {"default_tz": "Asia/Tokyo", "locations": locations}, 1)
+    settings = get_settings()
+    assert settings.default_tz == default_tz() == "Asia/Tokyo"
+    assert [(loc.key, loc.tz.key) for loc in settings.locations] == [("home", "Europe/Vienna")]
+
+    # the environment wins
+    monkeypatch.setenv("WHEN_CONFIG_DEFAULT_TZ", "UTC")
+    assert get_settings().default_tz == "Asia/Tokyo"
+    config.reset()
+    assert get_settings().default_tz == "UTC"
+    assert [loc.key for loc in get_settings().locations] == ["home"]
+
+
+def test_reload_on_change(config_path):
+    write_config(config_path, {"default_tz": "Asia/Tokyo"}, 1)
+    assert get_settings().default_tz == "Asia/Tokyo"
+    write_config(config_path, {"default_tz": "Asia/Seoul"}, 2)
+    assert get_settings().default_tz == "Asia/Tokyo"
+    config.reset()
+    assert get_settings().default_tz == "Asia/Seoul"
+
+
+def test_disk_cache(config_path, monkeypatch):
+    write_config(config_path, {"default_tz": "Asia/Tokyo"}, 1)
+    get_settings()
+    assert (config_path.parent / "cache" / "settings.json").exists()
+
+    def load_settings(path):
+        raise AssertionError("not cached")
+
+    config.reset()
+    monkeypatch.setattr(config, "load_settings", load_settings)
+    assert get_settings().default_tz == "Asia/Tokyo"
+    assert [loc.key for loc in get_settings().locations] == ["klu", "els", "sin", "utc"]
+    with pytest.raises(AssertionError):
+        write_config(config_path, {"default_tz": "Asia/Seoul"}, 2)
+        config.reset()
+        get_settings()
+
+
+@pytest.mark.parametrize(
+    "text", ["{", "[]", '{"locations": [{"key": "x", "description": "", "tz": "Nowhere/Special"}]}']
+)
+def test_invalid_config_file(config_path, text):
+    config_path.write_text(text)
+    with pytest.raises(ConfigError, match=str(config_path)):
+        get_settings()
+
+
+@pytest.mark.parametrize(
+    "env, expected",
+    [
+        ({}, "config.json: locations.0: Unknown timezone 'Nowhere/Special'\n"),
+        ({"WHEN_CONFIG_LOCATIONS": "[{"}, 'error parsing env var "when_config_locations"\n'),
+        (
+            {"WHEN_CONFIG_LOCATIONS": '[{"key": "y", "description": "", "tz": "Nowhere/Other"}]'},
+            "WHEN_CONFIG_LOCATIONS: locations.0: Unknown timezone 'Nowhere/Other'\n",
+        ),
+    ],
+)
+def test_cli_invalid_config(config_path, monkeypatch, capsys, env, expected):
+    monkeypatch.setenv("COLUMNS", "500")
+    for k, v in env.items():
+        monkeypatch.setenv(k, v)
+    config_path.write_text('{"locations": [{"key": "x", "description": "", "tz": "Nowhere/Special"}]}')
+    with pytest.raises(SystemExit) as e:
+        command().main(args=["17:00 in UTC"], prog_name="when-cli")
+    assert e.value.code == 1
+    out = capsys.readouterr().out
+    assert out.startswith("Invalid configuration: ") and out.endswith(expected)
+
+
+def test_default_tz_only_if_needed(config_path, monkeypatch):
+    def local_tz():
+        raise AssertionError("host timezone probed")
+
+    monkeypatch.setattr(config, "local_tz", local_tz)
+    assert Tzone("17:00 in UTC").t1.tzinfo.key == "UTC"
+    with pytest.raises(AssertionError):
+        Tzone("17:00")
+
+
+def test_cached_settings_without_pydantic(config_path):
+    code = (
+        "import sys; from when.config import get_settings; get_settings()\n"
+        "print([m for m in sys.modules if m.split('.')[0] in ('pydantic', 'tzlocal', 'when')])"
+    )
+    env = {**os.environ, "PYTHONPATH": os.getcwd()}
+    run = [sys.executable, "-c", code]
+    first = subprocess.run(run, env=env, capture_output=True, text=True, check=True).stdout
+    second = subprocess.run(run, env=env, capture_output=True, text=True, check=True).stdout
+    assert "pydantic" in first
+    assert "pydantic" not in second
+    assert "tzlocal" not in second
@@ -0,0 +1,161 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from when import daemon as when_daemon
+from when.daemon import PROTOCOL, fingerprint, forward, private_dir, serve, socket_path, trusted
+
+
+@pytest.fixture(scope="module")
+def daemon(tmp_path_factory):
+    path = tmp_path_factory.mktemp("daemon") / "when.sock"
+    threading.Thread(target=serve, args=(path,), daemon=True).start()
+    for _ in range(100):
+        if path.exists():
+            break
+        time.sleep(0.05)
+    return path
+
+
+def test_forward(daemon, capsys):
+    assert forward(["17:00 in UTC", "-l", "klu", "-l", "lax"], path=daemon) == 0
+    out = capsys.readouterr().out
+    assert "Klagenfurt, Austria (klu)" in out
+    assert "19:00" in out
+
+
+def test_forward_error(daemon, capsys):
+    assert forward(["17:00 in Nowhere/Special"], path=daemon) == 1
+    assert "Unknown timezone" in capsys.readouterr().out
+
+
+def test_forward_chunks(daemon, capsys, monkeypatch):
+    # the output of a long range arrives in several chunks
+    writes = []
+    write = when_daemon.sys.stdout.write
+    monkeypatch.setattr(when_daemon.sys.stdout, "write", lambda text: writes.append(text) or write(text))
+    argv = ["Jan 1 00:00 to Dec 31 23:00 in UTC", "--step", "1h", "-o", "jsonl", "-l", "klu"]
+    assert forward(argv, path=daemon) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 365 * 24
+    assert len(writes) > 1
+    assert all(len(text) <= when_daemon.CHUNK_SIZE + 1000 for text in writes)
+
+
+def test_forward_fallback(daemon, monkeypatch):
+    # unexpected errors before any output are handled by the client itself
+    import when.__main__
+
+    monkeypatch.setattr(when.__main__, "dispatch", lambda argv: 1 / 0)
+    assert forward(["17:00"], path=daemon) is None
+
+
+STALLED_CLIENT = """
+import json, socket, sys, time
+request = json.loads(sys.argv[2])
+with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+    sock.connect(sys.argv[1])
+    sock.sendall(json.dumps(request).encode("utf-8"))
+    sock.shutdown(socket.SHUT_WR)
+    with sock.makefile("rb") as messages:
+        print(json.loads(messages.readline())["status"], flush=True)
+    time.sleep(60)
+"""
+
+
+def test_forward_concurrent(daemon):
+    # a client which doesn't read its (long) output, e.g. a stopped pager, doesn't block other clients
+    request = {
+        "protocol": PROTOCOL,
+        "argv": ["Jan 1 00:00 to Dec 31 23:59 in UTC", "--step", "1m", "-o", "csv", "-l", "klu"],
+        "cwd": os.getcwd(),
+        "env": {},
+        "fingerprint": fingerprint(dict(os.environ)),
+    }
+    # in another process, the forked daemon children must not hold its socket
+    stalled = subprocess.Popen(
+        [sys.executable, "-c", STALLED_CLIENT, str(daemon), json.dumps(request)], stdout=subprocess.PIPE, text=True
+    )
+    try:
+        assert stalled.stdout.readline().strip() == "accepted"
+        codes = []
+        client = threading.Thread(target=lambda: codes.append(forward(["10:00 in UTC", "-l", "klu"], path=daemon)))
+        client.start()
+        client.join(timeout=10)
+        assert codes == [0]
+    finally:
+        stalled.kill()
+        stalled.wait()
+
+
+def test_forward_timeout(tmp_path, monkeypatch):
+    # a daemon which doesn't accept the request in time: the client falls back
+    monkeypatch.setattr(when_daemon, "TIMEOUT", 0.2)
+    path = tmp_path / "when.sock"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(str(path))
+        path.chmod(0o600)
+        server.listen()
+        start = time.monotonic()
+        assert forward(["17:00"], path=path) is None
+        assert time.monotonic() - start < 5
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--batch", "-"],
+        ["--batch=-"],
+        ["--daemon"],
+        ["--install-completion"],
+        ["convert-file", "-", "-c", "ts"],
+        ["filter"],
+    ],
+)
+def test_forward_local_args(daemon, argv):
+    assert forward(argv, path=daemon) is None
+
+
+def test_forward_no_daemon(tmp_path):
+    assert forward(["17:00"], path=tmp_path / "missing.sock") is None
+
+
+def test_socket_path(monkeypatch):
+    monkeypatch.delenv("WHEN_DAEMON_SOCKET", raising=False)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", "/run/user/1000")
+    assert socket_path() == Path(f"/run/user/1000/when-cli-{os.getuid()}.sock")
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    assert socket_path() == Path(tempfile.gettempdir()) / f"when-cli-{os.getuid()}" / "daemon.sock"
+
+
+def test_private_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "gettempdir", lambda: str(tmp_path))
+    path = tmp_path / f"when-cli-{os.getuid()}" / "daemon.sock"
+    private_dir(path)
+    assert path.parent.stat().st_mode & 0o777 == 0o700
+    path.parent.chmod(0o755)
+    with pytest.raises(RuntimeError):
+        private_dir(path)
+
+
+def test_untrusted_socket(tmp_path):
+    path = tmp_path / "when.sock"
+    assert not trusted(path)
+    path.write_text("")
+    assert not trusted(path)
+    path.unlink()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(str(path))
+        path.chmod(0o600)
+        assert trusted(path)
+        # accessible for other users
+        path.chmod(0o666)
+        assert not trusted(path)
+        assert forward(["17:00"], path=path) is None
@@ -0,0 +1,116 @@
+import csv
+import os
+
+import pytest
+from when import config
+from when.__main__ import command
+from when.config import ConfigError
+from when.directory import directory_table, lookup, read_directory
+from when.when import location_by_key
+
+TIMEZONES = ["Europe/Vienna", "America/Los_Angeles", "Asia/Singapore", "Australia/Sydney"]
+
+
+def write_directory(path, rows, mtime_ns=None):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["key", "tz", "description", "aliases"])
+        writer.writerows(rows)
+    if mtime_ns:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def directory(tmp_path, monkeypatch):
+    monkeypatch.setenv("WHEN_CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "directory.csv"
+    rows = [[f"user{i}", TIMEZONES[i % 4], f"User {i}", f"u{i};User.{i}"] for i in range(5000)]
+    rows += [["Alice", "Europe/Vienna", "Alice Smith", "asmith"], ["alice", "Asia/Tokyo", "", "smith"]]
+    write_directory(path, rows, 1)
+    return path
+
+
+@pytest.mark.parametrize(
+    "key, expected",
+    [
+        ("user42", ("user42", "User 42", "Asia/Singapore")),
+        ("USER42", ("user42", "User 42", "Asia/Singapore")),
+        ("u4999", ("user4999", "User 4999", "Australia/Sydney")),
+        ("user.7", ("user7", "User 7", "Australia/Sydney")),
+        # the first one wins
+        ("ALICE", ("Alice", "Alice Smith", "Europe/Vienna")),
+        ("smith", ("alice", "", "Asia/Tokyo")),
+    ],
+)
+def test_lookup(directory, key, expected):
+    location = lookup(directory_table(directory), key)
+    assert (location.key, location.description, location.tz.key) == expected
+
+
+def test_lookup_missing(directory):
+    table = directory_table(directory)
+    assert lookup(table, "nobody") is None
+    assert lookup(table, "") is None
+
+
+def test_rebuild_on_change(directory):
+    table = directory_table(directory)
+    assert directory_table(directory).path == table.path
+    assert len(list(table.path.parent.glob("directory-*.idx"))) == 1
+
+    write_directory(directory, [["bob", "UTC", "", ""]], 2)
+    table = directory_table(directory)
+    assert lookup(table, "bob").tz.key == "UTC"
+    assert lookup(table, "user42") is None
+    assert len(list(table.path.parent.glob("directory-*.idx"))) == 1
+
+
+def test_two_directories(directory, tmp_path):
+    other = tmp_path / "other.csv"
+    write_directory(other, [["bob", "UTC", "", ""]], 1)
+    first, second = directory_table(directory), directory_table(other)
+    # the indexes of other directories are kept
+    assert first.path.exists() and second.path.exists()
+    assert directory_table(directory).path == first.path
+
+
+def test_missing_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv("WHEN_CACHE_DIR", str(tmp_path / "cache"))
+    with pytest.raises(ConfigError, match="missing.csv"):
+        directory_table(tmp_path / "missing.csv")
+
+
+@pytest.mark.parametrize("rows", [None, [["bob", "Nowhere/Special", "", ""]]])
+def test_cli_invalid_directory(tmp_path, monkeypatch, capsys, rows):
+    monkeypatch.setenv("WHEN_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("WHEN_CONFIG_DIRECTORY", str(tmp_path / "directory.csv"))
+    monkeypatch.setenv("COLUMNS", "500")
+    monkeypatch.setattr(config, "_settings", None)
+    if rows:
+        write_directory(tmp_path / "directory.csv", rows)
+    with pytest.raises(SystemExit) as e:
+        command().main(args=["17:00 in bob"], prog_name="when-cli")
+    assert e.value.code == 1
+    out = capsys.readouterr().out
+    assert out.startswith("Invalid configuration: ")
+    assert ("directory.csv:2: unknown timezone" if rows else "No such file or directory") in out
+
+
+@pytest.mark.parametrize(
+    "header, row",
+    [(["key", "tz"], ["bob", "Nowhere/Special"]), (["name", "timezone"], ["bob", "UTC"])],
+)
+def test_invalid_directory(tmp_path, header, row):
+    path = tmp_path / "directory.csv"
+    path.write_text(",".join(header) + "\n" + ",".join(row) + "\n")
+    with pytest.raises(ValueError):
+        read_directory(path)
+
+
+def test_location_by_key(directory, monkeypatch):
+    monkeypatch.setenv("WHEN_CONFIG_DIRECTORY", str(directory))
+    monkeypatch.setattr(config, "_settings", None)
+    assert location_by_key("u42").description == "User 42"
+    # configured locations and the index of airports and cities
+    assert location_by_key("klu").description == "Klagenfurt, Austria"
+    assert location_by_key("lax").tz.key == "America/Los_Angeles"
@@ -0,0 +1,66 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+from when.formatter import Formatter, _key
+from when.when import Tzone
+
+TIMES = Tzone("2022-10-29 20:00 to 2022-10-30 04:00 in UTC").convert("Europe/Vienna", step=900)
+
+
+@pytest.mark.parametrize(
+    "formats",
+    [
+        {"date": "%x", "time": "%H:%M", "tz": "%Z"},
+        {"date": "%A, %d. %B %Y", "time": "%I:%M %p", "tz": "%z"},
+        {"date": "%c", "time": "%s", "tz": "%Z %z"},
+        {"date": "%Y-%m-%d %H:%M", "time": "100%%", "tz": "UTC%z"},
+        {"date": "", "time": "%-H:%M", "tz": "tz"},
+    ],
+)
+@pytest.mark.parametrize("columns", [["date", "time", "tz"], ["tz", "date"], ["time", "unknown"]])
+def test_formatter(formats, columns):
+    formatter = Formatter(columns, formats)
+    expected = [[t.strftime(formats[col]) for col in columns if col in formats] for t in TIMES]
+    assert [formatter(t) for t in TIMES] == expected
+    assert [formatter.text(t) for t in TIMES] == [" ".join(cols) for cols in expected]
+
+
+@pytest.mark.parametrize(
+    "fmt, same",
+    [
+        # same date, different time
+        ("%x", True),
+        ("%d.%m.%Y", True),
+        ("%H:%M", False),
+        ("%Z", True),
+        ("%x %Z%z", True),
+        ("%x %H:%M", False),
+        ("%c", False),
+        ("constant", True),
+    ],
+)
+def test_key(fmt, same):
+    tz = ZoneInfo("Europe/Vienna")
+    key = _key(fmt)
+    if key is None:
+        assert not same
+    else:
+        assert (key(datetime(2022, 5, 7, 6, 0, tzinfo=tz)) == key(datetime(2022, 5, 7, 7, 0, tzinfo=tz))) is same
+
+
+def test_formatter_caches():
+    calls = []
+
+    class Counting(datetime):
+        def strftime(self, fmt):
+            calls.append(fmt)
+            return super().strftime(fmt)
+
+    formatter = Formatter(["date", "time", "tz"])
+    for t in TIMES:
+        formatter(Counting.fromtimestamp(t.timestamp(), t.tzinfo).replace(fold=t.fold))
+    # date: 2 days, tz: CEST -> CET, time: every row
+    assert calls.count("%x") == 2
+    assert calls.count("%Z") == 2
+    assert calls.count("%H:%M") == len(TIMES)
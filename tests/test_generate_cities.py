@@ -0,0 +1,56 @@
+import generate_cities
+from click.testing import CliRunner
+from generate_cities import find_locations, find_places, main
+from when.geo import Place, Places
+
+ROWS = [
+    # geonameid, name, asciiname, ..., feature class, feature code, country, ..., population, ..., timezone
+    ("1", "Springfield", "P", "PPL", "US", "30000", "America/Chicago"),
+    ("2", "Springfield", "P", "PPL", "US", "160000", "America/Chicago"),
+    ("3", "Springfield", "P", "PPLA", "AU", "200000", "Australia/Sydney"),
+    ("4", "Vienna", "P", "PPL", "US", "16000", "America/New_York"),
+    ("5", "Vienna", "P", "PPLC", "AT", "1800000", "Europe/Vienna"),
+    ("6", "Großglockner", "T", "MT", "AT", "", "Europe/Vienna"),
+    ("7", "Nowhere", "P", "PPL", "XX", "20000", ""),
+]
+
+
+def write_dump(path):
+    with path.open("w") as f:
+        f.write("# comment\n")
+        for geonameid, name, feature_class, feature_code, country, population, tz in ROWS:
+            pieces = [geonameid, name, name, "", geonameid, "-" + geonameid, feature_class, feature_code, country]
+            pieces += [""] * 5 + [population, "", "", tz, "2022-01-01"]
+            f.write("\t".join(pieces) + "\n")
+    return path
+
+
+def test_find_locations(tmp_path):
+    dump = write_dump(tmp_path / "cities.txt")
+    assert find_locations(dump) == {
+        # best ranked city wins: capitals first, then US, then population
+        "springfield": ("Springfield", "US", "America/Chicago"),
+        "vienna": ("Vienna", "AT", "Europe/Vienna"),
+    }
+
+
+def test_find_places(tmp_path):
+    dump = write_dump(tmp_path / "cities.txt")
+    # every populated place with a timezone, not only the best ranked ones
+    assert list(find_places(dump)) == [
+        Place(1.0, -1.0, "Springfield, US", "America/Chicago"),
+        Place(2.0, -2.0, "Springfield, US", "America/Chicago"),
+        Place(3.0, -3.0, "Springfield, AU", "Australia/Sydney"),
+        Place(4.0, -4.0, "Vienna, US", "America/New_York"),
+        Place(5.0, -5.0, "Vienna, AT", "Europe/Vienna"),
+    ]
+
+
+def test_main(tmp_path, monkeypatch):
+    monkeypatch.setattr(generate_cities, "CITIES_PATH", tmp_path / "cities.idx")
+    monkeypatch.setattr(generate_cities, "PLACES_PATH", tmp_path / "places.idx")
+    result = CliRunner().invoke(main, ["--source", str(write_dump(tmp_path / "cities.txt"))])
+    assert result.exit_code == 0, result.output
+    places = Places(tmp_path / "places.idx")
+    assert len(places) == 5
+    assert places.nearest(5.1, -5.1) == ("Vienna, AT", "Europe/Vienna")
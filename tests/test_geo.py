@@ -0,0 +1,119 @@
+import random
+from zoneinfo import ZoneInfoNotFoundError
+
+import pytest
+from when import geo
+from when.geo import Place, Places, parse_coordinates, unit_vector, write_places
+from when.index import TableError
+from when.when import location_by_key, when
+
+PLACES = [
+    Place(46.62, 14.31, "Klagenfurt, AT", "Europe/Vienna"),
+    Place(46.06, 13.24, "Udine, IT", "Europe/Rome"),
+    Place(46.05, 14.51, "Ljubljana, SI", "Europe/Ljubljana"),
+    Place(61.22, -149.90, "Anchorage, US", "America/Anchorage"),
+    Place(-18.14, 178.44, "Suva, FJ", "Pacific/Fiji"),
+    Place(-13.83, -171.77, "Apia, WS", "Pacific/Apia"),
+    Place(78.22, 15.65, "Longyearbyen, SJ", "Arctic/Longyearbyen"),
+    Place(82.50, -62.35, "Alert, CA", "America/Toronto"),
+    Place(-0.22, -78.51, "Quito, EC", "America/Guayaquil"),
+]
+
+
+@pytest.fixture
+def places_path(tmp_path, monkeypatch):
+    path = tmp_path / "places.idx"
+    write_places(path, PLACES)
+    monkeypatch.setattr(geo, "PLACES_INDEX", path)
+    geo.places_index.cache_clear()
+    yield path
+    geo.places_index.cache_clear()
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("46.62,14.31", (46.62, 14.31)),
+        (" -33.9 , +18.4 ", (-33.9, 18.4)),
+        ("90,-180", (90.0, -180.0)),
+        ("91,0", None),
+        ("0,181", None),
+        ("klu", None),
+        ("46.62", None),
+    ],
+)
+def test_parse_coordinates(text, expected):
+    assert parse_coordinates(text) == expected
+
+
+@pytest.mark.parametrize(
+    "lat, lon, expected",
+    [
+        (46.6, 14.3, "Klagenfurt, AT"),
+        (46.1, 13.5, "Udine, IT"),
+        # across the date line
+        (-15.0, -179.5, "Suva, FJ"),
+        # across the pole
+        (89.9, 120.0, "Alert, CA"),
+        (-89.0, 0.0, "Suva, FJ"),
+    ],
+)
+def test_nearest(places_path, lat, lon, expected):
+    places = Places(places_path)
+    assert places.verify()
+    assert len(places) == len(PLACES)
+    assert places.nearest(lat, lon)[0] == expected
+
+
+def test_nearest_brute_force(tmp_path):
+    rnd = random.Random(1)
+    points = [Place(rnd.uniform(-90, 90), rnd.uniform(-180, 180), f"place {i}", "UTC") for i in range(2000)]
+    write_places(tmp_path / "places.idx", points)
+    places = Places(tmp_path / "places.idx")
+    for _ in range(200):
+        lat, lon = rnd.uniform(-90, 90), rnd.uniform(-180, 180)
+        query = unit_vector(lat, lon)
+        nearest = min(points, key=lambda p: sum((a - b) ** 2 for a, b in zip(query, unit_vector(p.lat, p.lon))))
+        assert places.nearest(lat, lon) == (nearest.description, "UTC")
+
+
+def test_duplicates(tmp_path):
+    # many places with the same coordinates
+    places = [Place(10.0, 20.0, f"same {i}", "UTC") for i in range(100)] + [Place(-10.0, -20.0, "other", "UTC")]
+    assert write_places(tmp_path / "places.idx", iter(places)) == 101
+    assert Places(tmp_path / "places.idx").nearest(-9.0, -21.0) == ("other", "UTC")
+    assert Places(tmp_path / "places.idx").nearest(10.0, 20.0)[0].startswith("same")
+
+
+def test_empty(tmp_path):
+    write_places(tmp_path / "places.idx", [])
+    assert Places(tmp_path / "places.idx").nearest(0, 0) is None
+
+
+def test_invalid(tmp_path):
+    (tmp_path / "places.idx").write_bytes(b"WHENIDX\x00" + bytes(20))
+    with pytest.raises(TableError):
+        Places(tmp_path / "places.idx")
+
+
+def test_location_by_key(places_path):
+    location = location_by_key("46.6, 14.3")
+    assert (location.key, location.description, location.tz.key) == ("", "Klagenfurt, AT", "Europe/Vienna")
+    zones = when("2022-05-07 12:00 in 61.2,-149.9", ["utc"])
+    assert zones[0].times[0].isoformat() == "2022-05-07T20:00:00+00:00"
+
+
+def test_location_by_key_without_places(tmp_path, monkeypatch):
+    monkeypatch.setattr(geo, "PLACES_INDEX", tmp_path / "missing.idx")
+    geo.places_index.cache_clear()
+    with pytest.raises(ZoneInfoNotFoundError):
+        location_by_key("46.6,14.3")
+    geo.places_index.cache_clear()
+
+
+@pytest.mark.parametrize(
+    "key, tz",
+    [("46.62,14.31", "Europe/Vienna"), ("-33.9, 18.4", "Africa/Johannesburg"), ("40.7,-74.0", "America/New_York")],
+)
+def test_shipped_places(key, tz):
+    assert location_by_key(key).tz.key == tz
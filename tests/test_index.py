@@ -0,0 +1,59 @@
+import pytest
+from when.index import Table, TableError, write_table
+
+ENTRIES = {
+    "klu": ("IATA", "Klagenfurt Airport, AT", "Europe/Vienna"),
+    "lowk": ("ICAO", "Klagenfurt Airport, AT", "Europe/Vienna"),
+    "erfurt": ("city", "Erfurt, DE", "Europe/Berlin"),
+    "zürich": ("city", "Zürich, CH", "Europe/Zurich"),
+    "europe/vienna": ("tz", "", "Europe/Vienna"),
+}
+
+
+@pytest.fixture
+def table(tmp_path):
+    path = tmp_path / "test.idx"
+    assert write_table(path, ENTRIES) == len(ENTRIES)
+    return Table(path)
+
+
+@pytest.mark.parametrize("key, fields", list(ENTRIES.items()) + [("missing", None), ("", None), ("zzz", None)])
+def test_table_get(table, key, fields):
+    assert table.get(key) == fields
+
+
+def test_table_iter(table):
+    assert len(table) == len(ENTRIES)
+    assert list(table) == sorted(ENTRIES)
+    assert dict(table.items()) == ENTRIES
+
+
+def test_table_verify(table, tmp_path):
+    assert table.verify()
+    data = bytearray((tmp_path / "test.idx").read_bytes())
+    data[-1] ^= 0xFF
+    (tmp_path / "corrupt.idx").write_bytes(data)
+    assert not Table(tmp_path / "corrupt.idx").verify()
+
+
+def test_table_invalid(tmp_path):
+    (tmp_path / "invalid.idx").write_bytes(b"no table file at all")
+    with pytest.raises(TableError):
+        Table(tmp_path / "invalid.idx")
+
+
+@pytest.mark.parametrize(
+    "prefix, keys",
+    [
+        ("", sorted(ENTRIES)),
+        ("e", ["erfurt", "europe/vienna"]),
+        ("eu", ["europe/vienna"]),
+        ("z", ["zürich"]),
+        ("zü", ["zürich"]),
+        ("x", []),
+        ("lowkx", []),
+    ],
+)
+def test_table_prefix(table, prefix, keys):
+    assert [key for key, _ in table.prefix(prefix)] == keys
+    assert all(fields == ENTRIES[key] for key, fields in table.prefix(prefix))
@@ -1,6 +1,7 @@
-from zoneinfo import ZoneInfo
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 import pytest
+from when.model import Location
 from when.when import location_by_key
 
 
@@ -20,6 +21,10 @@ from when.when import location_by_key
         # airports - ICAO 4-alphanumeric code - mix upper/lower-case
         ("lowk", ZoneInfo("Europe/Vienna")),
         ("lOWk", ZoneInfo("Europe/Vienna")),
+        # cities - mix upper/lower-case
+        ("Erfurt", ZoneInfo("Europe/Berlin")),
+        ("los angeles", ZoneInfo("America/Los_Angeles")),
+        ("TORRANCE", ZoneInfo("America/Los_Angeles")),
         # TZ names
         ("Europe/Vienna", ZoneInfo("Europe/Vienna")),
         ("Asia/Singapore", ZoneInfo("Asia/Singapore")),
@@ -27,3 +32,22 @@ from when.when import location_by_key
 )
 def test_location_by_key(key, tz):
     assert location_by_key(key).tz == tz
+
+
+@pytest.mark.parametrize("key", ["europe/vienna", "Nowhere/Special", "not a place"])
+def test_location_by_key_unknown(key):
+    with pytest.raises(ZoneInfoNotFoundError):
+        location_by_key(key)
+
+
+def test_location():
+    location = Location(key="klu", description="Klagenfurt", tz="Europe/Vienna")
+    assert location.tz is ZoneInfo("Europe/Vienna")
+    assert Location.validate({"key": "klu", "description": "Klagenfurt", "tz": "Europe/Vienna"}) == location
+    assert not hasattr(location, "__dict__")
+
+
+@pytest.mark.parametrize("value", [{"key": "x", "description": "", "tz": "Nowhere/Special"}, {"key": "x"}, "klu"])
+def test_location_invalid(value):
+    with pytest.raises((ValueError, TypeError)):
+        Location.validate(value)
@@ -0,0 +1,118 @@
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from when.output import iso_rows, labels, utc_offset_text, write
+from when.when import offset_rows, rows, when, when_stream
+
+TIME_STRING = "2022-10-30 00:00 to 2022-10-30 02:00 in UTC"
+LOCATIONS = ["klu", "utc", "Europe/Vienna", "Europe/Vienna"]
+ISO = [
+    ["2022-10-30T02:00:00+02:00", "2022-10-30T00:00:00+00:00", "2022-10-30T02:00:00+02:00"],
+    ["2022-10-30T02:00:00+01:00", "2022-10-30T01:00:00+00:00", "2022-10-30T02:00:00+01:00"],
+    ["2022-10-30T03:00:00+01:00", "2022-10-30T02:00:00+00:00", "2022-10-30T03:00:00+01:00"],
+]
+
+
+def render(output: str) -> str:
+    zones = when_stream(TIME_STRING, LOCATIONS[:3])
+    stream = io.StringIO()
+    write(output, zones, rows(zones), stream, columns=["time", "tz"], offsets=offset_rows(zones))
+    return stream.getvalue()
+
+
+def test_labels():
+    assert labels(when_stream(TIME_STRING, LOCATIONS)) == ["klu", "utc", "Europe/Vienna", "Europe/Vienna-2"]
+
+
+def test_json():
+    data = json.loads(render("json"))
+    assert [zone["label"] for zone in data["zones"]] == ["klu", "utc", "Europe/Vienna"]
+    assert data["zones"][0]["description"] == "Klagenfurt, Austria"
+    assert data["rows"] == ISO
+
+
+def test_jsonl():
+    lines = render("jsonl").splitlines()
+    assert [json.loads(line) for line in lines] == [dict(zip(["klu", "utc", "Europe/Vienna"], row)) for row in ISO]
+
+
+@pytest.mark.parametrize("output, delimiter", [("csv", ","), ("tsv", "\t")])
+def test_csv(output, delimiter):
+    assert list(csv.reader(io.StringIO(render(output)), delimiter=delimiter)) == [
+        ["klu", "utc", "Europe/Vienna"],
+        *ISO,
+    ]
+
+
+def test_plain():
+    assert render("plain").splitlines() == [
+        "02:00 CEST\t00:00 UTC\t02:00 CEST",
+        "02:00 CET\t01:00 UTC\t02:00 CET",
+        "03:00 CET\t02:00 UTC\t03:00 CET",
+    ]
+
+
+@pytest.mark.parametrize(
+    "time_string, location_keys",
+    [
+        (TIME_STRING, LOCATIONS),
+        ("1900-01-01 00:00 to 1900-01-01 02:00 in UTC", ["Europe/Amsterdam", "Asia/Kolkata", "America/St_Johns"]),
+    ],
+)
+def test_iso_rows(time_string, location_keys):
+    zones = when(time_string, location_keys)
+    expected = [[t.isoformat() for t in row] for row in rows(zones)]
+    assert list(iso_rows(rows(zones), offset_rows(zones))) == expected
+    assert list(iso_rows(rows(zones))) == expected
+
+
+@pytest.mark.parametrize(
+    "seconds, expected", [(0, "+00:00"), (19800, "+05:30"), (-34200, "-09:30"), (-3601, "-01:00:01")]
+)
+def test_utc_offset_text(seconds, expected):
+    assert utc_offset_text(seconds) == expected
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        render("xml")
+
+
+def test_cli_without_rich():
+    code = (
+        "import sys; from when.__main__ import run; sys.argv = ['when-cli', '17:00 in UTC', '-l', 'klu', '-o', 'csv']\n"
+        "try:\n    run()\nexcept SystemExit:\n    pass\n"
+        "print([m for m in sys.modules if m.split('.')[0] in ('rich', 'rich_click')])"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    header, row, modules = proc.stdout.splitlines()
+    assert header == "klu"
+    assert row[11:] in ("18:00:00+01:00", "19:00:00+02:00")
+    assert modules == "[]"
+
+
+def test_cli_batch_streaming():
+    # a co-process gets every result before it sends the next line, also with a block buffered stdout
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "when", "--batch", "-", "-l", "klu"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+        env={
+            **{k: v for k, v in os.environ.items() if k != "PYTHONUNBUFFERED"},
+            "WHEN_DAEMON_SOCKET": "/nonexistent/when.sock",
+        },
+    )
+    try:
+        for time_string in ("17:00 in UTC", "9:00 in UTC"):
+            proc.stdin.write(time_string + "\n")
+            proc.stdin.flush()
+            assert json.loads(proc.stdout.readline())["time_string"] == time_string
+    finally:
+        proc.stdin.close()
+        proc.wait(timeout=30)
@@ -0,0 +1,108 @@
+import json
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+from when.__main__ import dispatch
+from when.model import Location
+from when.overlap import intersect, overlap, parse_hours, working_intervals
+from when.when import location_by_key
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "text, hours",
+    [
+        ("09:00-17:00", (540, 1020)),
+        ("9-17", (540, 1020)),
+        (" 8:30 - 12 ", (510, 720)),
+        ("22:00-06:00", (1320, 1800)),
+        ("00:00-24:00", (0, 1440)),
+    ],
+)
+def test_parse_hours(text, hours):
+    assert parse_hours(text) == hours
+
+
+@pytest.mark.parametrize("text", ["", "9", "9-9", "9:60-17", "25-26", "24-1", "nine-five"])
+def test_parse_hours_invalid(text):
+    with pytest.raises(ValueError):
+        parse_hours(text)
+
+
+@pytest.mark.parametrize(
+    "a, b, expected",
+    [
+        ([(0, 10), (20, 30)], [(5, 25)], [(5, 10), (20, 25)]),
+        ([(0, 10)], [(10, 20)], []),
+        ([(0, 100)], [(10, 20), (30, 40), (90, 110)], [(10, 20), (30, 40), (90, 100)]),
+        ([], [(0, 10)], []),
+    ],
+)
+def test_intersect(a, b, expected):
+    assert intersect(a, b) == expected
+    assert intersect(b, a) == expected
+
+
+def test_working_intervals_dst():
+    tz = ZoneInfo("Europe/Vienna")
+    # Friday before and Monday after the DST change (2022-03-27)
+    intervals = working_intervals(tz, parse_hours("09:00-17:00"), date(2022, 3, 25), date(2022, 3, 28))
+    assert intervals == [
+        (int(utc(2022, 3, 25, 8).timestamp()), int(utc(2022, 3, 25, 16).timestamp())),
+        (int(utc(2022, 3, 28, 7).timestamp()), int(utc(2022, 3, 28, 15).timestamp())),
+    ]
+    assert len(working_intervals(tz, parse_hours("9-17"), date(2022, 3, 25), date(2022, 3, 28), weekends=True)) == 4
+
+
+def test_overlap_dst():
+    """The US switch to DST two weeks before Europe, the overlap is an hour longer in between."""
+    locations = [(location_by_key("klu"), parse_hours("08-18")), (location_by_key("lax"), parse_hours("07-17"))]
+    slots = overlap(locations, date(2022, 3, 10), date(2022, 3, 29))
+    assert [(s.start, s.end) for s in slots[:3]] == [
+        (utc(2022, 3, 10, 15), utc(2022, 3, 10, 17)),
+        (utc(2022, 3, 11, 15), utc(2022, 3, 11, 17)),
+        (utc(2022, 3, 14, 14), utc(2022, 3, 14, 17)),
+    ]
+    assert [s.duration // 3600 for s in slots] == [2, 2] + [3] * 10 + [2, 2]
+
+
+def test_overlap_many_locations():
+    tzs = ["Europe/Vienna", "Europe/London", "Europe/Berlin", "Africa/Lagos", "Europe/Lisbon"] * 40
+    locations = [(Location(key=str(i), description="", tz=tz), parse_hours("09-17")) for i, tz in enumerate(tzs)]
+    slots = overlap(locations, date(2022, 1, 1), date(2022, 12, 31), min_duration=3600)
+    # all year 7 hours: 09:00-16:00 UTC in winter, 08:00-15:00 UTC in summer (Lagos has no DST)
+    assert len(slots) == 260
+    assert {s.duration for s in slots} == {7 * 3600}
+
+
+def test_overlap_none():
+    locations = [(location_by_key("klu"), parse_hours("09-17")), (location_by_key("lax"), parse_hours("09-17"))]
+    assert overlap(locations, date(2022, 5, 2), date(2022, 5, 6)) == []
+
+
+def test_overlap_min_duration():
+    locations = [(location_by_key("klu"), parse_hours("09-17")), (location_by_key("utc"), parse_hours("14-18"))]
+    assert len(overlap(locations, date(2022, 5, 2), date(2022, 5, 6), min_duration=3600)) == 5
+    assert overlap(locations, date(2022, 5, 2), date(2022, 5, 6), min_duration=3601) == []
+
+
+def test_cli(capsys):
+    command, args, prog_name = dispatch(
+        ["overlap", "klu", "lax", "-w", "08-18", "-w", "LAX=7-17", "--from", "2022-03-14", "--to", "2022-03-14"]
+        + ["-o", "json"]
+    )
+    assert prog_name == "when-cli overlap"
+    command.main(args=args, prog_name=prog_name, standalone_mode=False)
+    assert json.loads(capsys.readouterr().out) == [
+        {"start": "2022-03-14T14:00:00+00:00", "end": "2022-03-14T17:00:00+00:00", "minutes": 180}
+    ]
+
+
+def test_dispatch_time_string():
+    command, args, prog_name = dispatch(["17:00", "-l", "klu"])
+    assert (args, prog_name) == (["17:00", "-l", "klu"], "when-cli")
+    assert command is dispatch([])[0]
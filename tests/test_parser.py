@@ -0,0 +1,72 @@
+from datetime import date, datetime
+
+import pytest
+from dateutil.parser import parse as dateutil_parse
+from when.parser import DATEUTIL, FAST, parse, parse_step
+
+from .test_tzone import DATES, TIMES
+
+TODAY = date(2022, 4, 13)
+
+
+@pytest.mark.parametrize("datum_str, datum", DATES)
+@pytest.mark.parametrize("uhrzeit_str, uhrzeit", TIMES)
+def test_parse_fast_like_dateutil(datum_str, datum, uhrzeit_str, uhrzeit):
+    for text in [datum_str + " " + uhrzeit_str, uhrzeit_str + " " + datum_str]:
+        assert parse(text) == (dateutil_parse(text, ignoretz=True), FAST)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        # german month names
+        ("30. Oktober 2021 14:00", datetime(2021, 10, 30, 14, 0)),
+        ("1. März 6:00", datetime(2022, 3, 1, 6, 0)),
+        ("24. Dez 18:00", datetime(2022, 12, 24, 18, 0)),
+        # english variations
+        ("Sep 30, 2021 2 PM", datetime(2021, 9, 30, 14, 0)),
+        ("1979 September 30th 6:00", datetime(1979, 9, 30, 6, 0)),
+        ("2021/09/30 12am", datetime(2021, 9, 30, 0, 0)),
+        ("12pm", datetime(2022, 4, 13, 12, 0)),
+        ("12:30:15", datetime(2022, 4, 13, 12, 30, 15)),
+        # 2-digit years
+        ("30.09.79 6:00", datetime(1979, 9, 30, 6, 0)),
+        ("30.09.21 6:00", datetime(2021, 9, 30, 6, 0)),
+        ("30.09.71 6:00", datetime(2071, 9, 30, 6, 0)),
+        # date only
+        ("2021-09-30", datetime(2021, 9, 30, 0, 0)),
+    ],
+)
+def test_parse_fast(text, expected):
+    assert parse(text, today=TODAY) == (expected, FAST)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Monday 2pm", dateutil_parse("Monday 2pm", default=datetime(2022, 4, 13))),
+        ("13pm", datetime(2022, 4, 13, 13, 0)),
+        ("09/30/2021 6:00", datetime(2021, 9, 30, 6, 0)),
+    ],
+)
+def test_parse_fallback(text, expected):
+    assert parse(text, today=TODAY) == (expected, DATEUTIL)
+
+
+@pytest.mark.parametrize("text", ["", "tomorrow", "25:00", "2021-02-30 1:00"])
+def test_parse_invalid(text):
+    with pytest.raises(ValueError):
+        parse(text, today=TODAY)
+
+
+@pytest.mark.parametrize(
+    "text, seconds", [("30s", 30), ("1m", 60), ("15m", 900), ("1h", 3600), ("2H", 7200), ("1d", 86400), (" 15 m ", 900)]
+)
+def test_parse_step(text, seconds):
+    assert parse_step(text) == seconds
+
+
+@pytest.mark.parametrize("text", ["", "0h", "15", "1w", "h", "-1h", "1.5h"])
+def test_parse_step_invalid(text):
+    with pytest.raises(ValueError):
+        parse_step(text)
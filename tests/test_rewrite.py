@@ -0,0 +1,88 @@
+import io
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+from when.__main__ import dispatch
+from when.rewrite import Rewriter, ZoneWindow, chunks, offset_seconds, rewrite_stream
+
+UTC, VIENNA, LAX = ZoneInfo("UTC"), ZoneInfo("Europe/Vienna"), ZoneInfo("America/Los_Angeles")
+SYSLOG = r"(?P<month>\w{3}) +(?P<day>\d+) (?P<hour>\d\d):(?P<minute>\d\d):(?P<second>\d\d) (?P<year>\d{4})"
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("2022-05-07 06:00:00 INFO x", "2022-05-07 08:00:00+02:00 INFO x"),
+        ("[2022-05-07T06:00:00.123456Z] x", "[2022-05-07T08:00:00.123456+02:00] x"),
+        ("2022-05-07T06:00:00,5-0700 x", "2022-05-07T15:00:00,5+02:00 x"),
+        ("2022-03-27 00:59:59 2022-03-27 01:00:00", "2022-03-27 01:59:59+01:00 2022-03-27 03:00:00+02:00"),
+        ("2022-13-01 00:00:00 2022-02-30 00:00:00 2022-05-07 24:00:00", None),
+        ("no timestamp 2022-05-07", None),
+    ],
+)
+def test_rewrite(text, expected):
+    assert Rewriter(UTC, [("klu", VIENNA)])(text) == (expected or text)
+
+
+def test_annotate():
+    rewriter = Rewriter(VIENNA, [("utc", UTC), ("lax", LAX)], annotate=True)
+    assert rewriter("2022-10-30 02:30:00 a\n2022-10-30 02:30:00.5 b\n") == (
+        "2022-10-30 02:30:00 [utc 2022-10-30 00:30:00+00:00, lax 2022-10-29 17:30:00-07:00] a\n"
+        "2022-10-30 02:30:00.5 [utc 2022-10-30 00:30:00.5+00:00, lax 2022-10-29 17:30:00.5-07:00] b\n"
+    )
+
+
+def test_pattern():
+    rewriter = Rewriter(UTC, [("lax", LAX)], pattern=SYSLOG)
+    assert rewriter("May  7 06:00:00 2022 sshd") == "2022-05-06T23:00:00-07:00 sshd"
+    assert rewriter("Foo  7 06:00:00 2022 sshd") == "Foo  7 06:00:00 2022 sshd"
+
+
+@pytest.mark.parametrize(
+    "targets, pattern, annotate",
+    [
+        ([("klu", VIENNA)], r"(?P<year>\d{4})", False),
+        ([("klu", VIENNA)], "(", False),
+        ([], r"(?P<year>\d{4})", False),
+        ([("klu", VIENNA), ("lax", LAX)], SYSLOG, False),
+    ],
+)
+def test_rewriter_invalid(targets, pattern, annotate):
+    with pytest.raises(ValueError):
+        Rewriter(UTC, targets, pattern=pattern, annotate=annotate)
+
+
+@pytest.mark.parametrize("key", ["Europe/Vienna", "America/St_Johns", "Australia/Lord_Howe", "UTC"])
+def test_zone_window(key):
+    tz, start = ZoneInfo(key), int(datetime(2021, 1, 1, tzinfo=timezone.utc).timestamp())
+    zone = ZoneWindow(tz)
+    for seconds in range(start, start + 2 * 365 * 86400, 997):
+        naive = datetime(1970, 1, 1) + timedelta(seconds=seconds)
+        assert zone.to_utc(seconds) == int(naive.replace(tzinfo=tz).timestamp())
+        assert zone.utcoffset(seconds) == int(datetime.fromtimestamp(seconds, tz).utcoffset().total_seconds())
+
+
+def test_offset_seconds():
+    assert [offset_seconds(text) for text in ("Z", "+02:00", "-0730")] == [0, 7200, -27000]
+
+
+def test_chunks():
+    stream = io.BufferedReader(io.BytesIO(b"a\nb\nc"), buffer_size=3)
+    assert b"".join(chunks(stream, size=3)) == b"a\nb\nc"
+    assert all(chunk.endswith(b"\n") for chunk in list(chunks(io.BufferedReader(io.BytesIO(b"a\nbb\n" * 100)), 7)))
+
+
+def test_rewrite_stream():
+    output = io.BytesIO()
+    rewrite_stream(Rewriter(UTC, [("klu", VIENNA)]), io.BytesIO(b"2022-05-07 06:00:00 \xff\n"), output)
+    assert output.getvalue() == b"2022-05-07 08:00:00+02:00 \xff\n"
+
+
+def test_cli(tmp_path, capsysbinary):
+    path = tmp_path / "app.log"
+    path.write_text("2022-05-07 06:00:00 INFO x\n")
+    command, args, prog_name = dispatch(["filter", str(path), "-l", "lax", "--from", "klu"])
+    assert prog_name == "when-cli filter"
+    command.main(args=args, prog_name=prog_name, standalone_mode=False)
+    assert capsysbinary.readouterr().out == b"2022-05-06 21:00:00-07:00 INFO x\n"
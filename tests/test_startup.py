@@ -0,0 +1,47 @@
+import subprocess
+import sys
+
+import pytest
+
+# milliseconds, cumulative import time of when.__main__
+IMPORT_BUDGET = 150
+
+# loaded on demand only (help, usage, rendering, conversion)
+LAZY_MODULES = [
+    "arrow",
+    "dateutil",
+    "numpy",
+    "pydantic",
+    "rich",
+    "rich_click",
+    "tzlocal",
+    "when.config",
+    "when.rich_typer",
+    "when.when",
+]
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Cumulative import time (µs) per module via python -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize("module", ["when.__main__", "when.daemon"])
+def test_lazy_imports(module):
+    times = import_times(module)
+    assert not [m for m in LAZY_MODULES if m in times]
+
+
+def test_import_budget():
+    # best of three to be robust against a busy machine
+    assert min(import_times("when.__main__")["when.__main__"] for _ in range(3)) < IMPORT_BUDGET * 1000
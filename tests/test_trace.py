@@ -0,0 +1,70 @@
+import io
+import json
+import pstats
+import time
+
+import pytest
+from when import trace
+from when.__main__ import dispatch
+
+
+@pytest.fixture
+def tracing():
+    trace.start()
+    yield
+    trace.stop(io.StringIO())
+
+
+def test_disabled():
+    assert not trace.enabled()
+    assert trace.phase("a") is trace.phase("b")
+    items = [1, 2]
+    assert trace.iterate("a", items) is items
+
+
+def test_phases(tracing):
+    with trace.phase("outer"):
+        with trace.phase("inner"):
+            time.sleep(0.01)
+        with trace.phase("inner"):
+            pass
+    assert list(trace.iterate("items", iter([1, 2, 3]))) == [1, 2, 3]
+
+    phases = trace.report()["phases"]
+    assert list(phases) == ["startup", "outer", "inner", "items"]
+    assert phases["inner"]["calls"] == 2
+    assert phases["outer"]["ms"] >= phases["inner"]["ms"] >= 10
+    assert phases["outer"]["self_ms"] == pytest.approx(phases["outer"]["ms"] - phases["inner"]["ms"], abs=0.01)
+
+
+def test_stop():
+    trace.start()
+    with trace.phase("a"):
+        pass
+    stream = io.StringIO()
+    trace.stop(stream)
+    assert not trace.enabled()
+    assert set(json.loads(stream.getvalue())["phases"]) == {"startup", "a"}
+
+
+@pytest.mark.parametrize("args, env", [(["--timings"], {}), ([], {"WHEN_TRACE": "1"})])
+def test_cli_timings(args, env, monkeypatch, capsys):
+    for k, v in env.items():
+        monkeypatch.setenv(k, v)
+    command, args, prog_name = dispatch(
+        ["2022-05-07 00:00 to 2022-05-07 03:00 in UTC", "-l", "klu", "-o", "csv", *args]
+    )
+    command.main(args=args, prog_name=prog_name, standalone_mode=False)
+    captured = capsys.readouterr()
+    assert len(captured.out.splitlines()) == 5
+    phases = json.loads(captured.err)["phases"]
+    assert {"startup", "settings", "imports", "locations", "parse", "convert", "render"} <= set(phases)
+    assert not trace.enabled()
+
+
+def test_cli_profile(tmp_path, capsys):
+    path = tmp_path / "when.prof"
+    command, args, prog_name = dispatch(["17:00 in UTC", "-l", "klu", "--profile", str(path)])
+    command.main(args=args, prog_name=prog_name, standalone_mode=False)
+    assert not capsys.readouterr().err
+    assert pstats.Stats(str(path)).total_calls > 0
@@ -0,0 +1,96 @@
+import random
+import zoneinfo
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+from when.transitions import Rule, Transitions, transitions, tzif_data
+
+ZONES = sorted(zoneinfo.available_timezones())
+
+
+def reference(instant: int, tz: ZoneInfo) -> tuple:
+    local = datetime.fromtimestamp(instant, tz)
+    return local.replace(tzinfo=None), local.fold, local.utcoffset(), local.tzname()
+
+
+def fields(local: datetime) -> tuple:
+    return local.replace(tzinfo=None), local.fold, local.utcoffset(), local.tzname()
+
+
+@pytest.mark.parametrize("key", ZONES)
+def test_localize(key):
+    tz = ZoneInfo(key)
+    table = transitions(tz)
+    rnd = random.Random(key)
+    # around every transition, random instants and far beyond the transition list (footer rule)
+    instants = {t + d for t in table.times for d in (-3601, -1, 0, 1, 1800, 3599, 3600, 7200)}
+    instants.update(rnd.randrange(-4_000_000_000, 8_000_000_000) for _ in range(200))
+    instants = sorted(t for t in instants if -50_000_000_000 < t < 100_000_000_000)
+
+    assert [fields(local) for local in table.localize(instants)] == [reference(t, tz) for t in instants]
+    assert table.offsets(instants) == [int(reference(t, tz)[2].total_seconds()) for t in instants]
+
+
+@pytest.mark.parametrize(
+    "key", ["Europe/Vienna", "America/Los_Angeles", "Australia/Lord_Howe", "Europe/Dublin", "Asia/Gaza", "UTC"]
+)
+@pytest.mark.parametrize("step", [900, 3600, 86400 + 17])
+def test_localize_range(key, step):
+    tz = ZoneInfo(key)
+    start = int(datetime(2021, 1, 1, tzinfo=timezone.utc).timestamp())
+    stop = int(datetime(2041, 1, 1, tzinfo=timezone.utc).timestamp())
+    times = list(transitions(tz).localize_range(start, stop, step))
+    assert [fields(local) for local in times] == [reference(t, tz) for t in range(start, stop, step)]
+    assert all(local.tzinfo is tz for local in times)
+
+
+def test_localize_range_empty():
+    assert list(transitions(ZoneInfo("Europe/Vienna")).localize_range(10, 10, 3600)) == []
+
+
+def test_windows():
+    table = transitions(ZoneInfo("Europe/Vienna"))
+    start = int(datetime(2022, 1, 1, tzinfo=timezone.utc).timestamp())
+    stop = int(datetime(2023, 1, 1, tzinfo=timezone.utc).timestamp())
+    windows = list(table.windows(start, stop))
+    # CET, CEST, CET
+    assert [w.period.offset for w in windows] == [3600, 7200, 3600]
+    assert [w.period.name for w in windows] == ["CET", "CEST", "CET"]
+    # 2022-10-30 01:00 UTC: the clocks go back from 03:00 to 02:00
+    assert windows[2].start == int(datetime(2022, 10, 30, 1, 0, tzinfo=timezone.utc).timestamp())
+    assert windows[2].fold_end == windows[2].start + 3600
+
+
+@pytest.mark.parametrize(
+    "tz_string, std, dst",
+    [
+        ("CET-1CEST,M3.5.0,M10.5.0/3", 3600, 7200),
+        ("<+1030>-10:30<+11>-11,M10.1.0,M4.1.0", 37800, 39600),
+        ("IST-1GMT0,M10.5.0,M3.5.0/1", 3600, 0),
+        ("EST5EDT,M3.2.0,M11.1.0", -18000, -14400),
+        ("<-03>3", -10800, None),
+    ],
+)
+def test_rule(tz_string, std, dst):
+    rule = Rule(tz_string)
+    assert rule.std.offset == std
+    assert (rule.dst.offset if rule.dst else None) == dst
+
+
+def test_rule_invalid():
+    with pytest.raises(ValueError):
+        Rule("CET-1CEST")
+
+
+@pytest.mark.parametrize("key", ["Nowhere/Land", "../etc/passwd", "/etc/localtime"])
+def test_tzif_data_unknown(key):
+    with pytest.raises(zoneinfo.ZoneInfoNotFoundError):
+        tzif_data(key)
+
+
+def test_load_without_key():
+    with open(zoneinfo.TZPATH[0] + "/Europe/Vienna", "rb") as f:
+        tz = ZoneInfo.from_file(f)
+    with pytest.raises(ValueError):
+        Transitions.load(tz)
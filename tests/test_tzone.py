@@ -1,10 +1,13 @@
+import io
 from datetime import date
 from datetime import datetime as dt
 from datetime import time
+from itertools import islice
 from zoneinfo import ZoneInfo
 
 import pytest
-from when.when import parse_time_string, split_time_string
+from when.transitions import tzif_data
+from when.when import Tzone, parse_time_string, split_time_string
 
 DATES = [
     ("", date.today()),
@@ -73,9 +76,121 @@ def test_parse_time_string(datum_str, datum, uhrzeit_str, uhrzeit, tz):
     if not tz:
         # ignore empty tz
         return
-    assert parse_time_string(datum_str + " " + uhrzeit_str, tz).datetime == dt.combine(
-        datum, uhrzeit, tzinfo=ZoneInfo(tz)
-    )
-    assert parse_time_string(uhrzeit_str + " " + datum_str, tz).datetime == dt.combine(
-        datum, uhrzeit, tzinfo=ZoneInfo(tz)
-    )
+    assert parse_time_string(datum_str + " " + uhrzeit_str, tz) == dt.combine(datum, uhrzeit, tzinfo=ZoneInfo(tz))
+    assert parse_time_string(uhrzeit_str + " " + datum_str, tz) == dt.combine(datum, uhrzeit, tzinfo=ZoneInfo(tz))
+
+
+@pytest.mark.parametrize(
+    "time_string, tz, expected",
+    [
+        # same instants in all zones, also across DST changes
+        (
+            "2022-03-27 00:00 to 2022-03-27 03:00 in UTC",
+            "Europe/Vienna",
+            ["2022-03-27T01:00:00+01:00", "2022-03-27T03:00:00+02:00", "04:00", "05:00"],
+        ),
+        (
+            "2022-10-30 00:00 to 2022-10-30 02:00 in UTC",
+            "Europe/Vienna",
+            ["2022-10-30T02:00:00+02:00", "2022-10-30T02:00:00+01:00", "03:00"],
+        ),
+        ("2022-10-30 00:00 to 2022-10-30 02:00 in UTC", "Asia/Singapore", ["08:00", "09:00", "10:00"]),
+        ("2022-10-30 02:00 to 2022-10-30 00:00 in UTC", "UTC", []),
+    ],
+)
+def test_tzone_convert(time_string, tz, expected):
+    times = Tzone(time_string).convert(tz)
+    assert [t.isoformat() if "T" in e else t.strftime("%H:%M") for t, e in zip(times, expected)] == expected
+    assert len(times) == len(expected)
+    assert all(t.tzinfo == ZoneInfo(tz) for t in times)
+
+
+@pytest.mark.parametrize(
+    "step, limit, offset, expected",
+    [
+        (3600, None, 0, ["00:00", "01:00", "02:00", "03:00", "04:00", "05:00", "06:00"]),
+        (900, 3, 0, ["00:00", "00:15", "00:30"]),
+        (900, 3, 2, ["00:30", "00:45", "01:00"]),
+        (86400, None, 0, ["00:00"]),
+        (7200, None, 2, ["04:00", "06:00"]),
+        (3600, 5, 10, []),
+    ],
+)
+def test_tzone_paging(step, limit, offset, expected):
+    tzone = Tzone("2022-05-07 00:00 to 2022-05-07 06:00 in UTC")
+    assert [t.strftime("%H:%M") for t in tzone.convert("UTC", step=step, limit=limit, offset=offset)] == expected
+    assert len(tzone.instants(step=step, limit=limit, offset=offset)) == len(expected)
+
+
+@pytest.mark.parametrize(
+    "time_string, limit, offset, expected",
+    [
+        # DST starts on March 27th, 09:00 stays 09:00 in Vienna
+        (
+            "2022-03-25 09:00 to 2022-03-29 09:00 in Europe/Vienna",
+            None,
+            0,
+            ["2022-03-25T08:00", "2022-03-26T08:00", "2022-03-27T07:00", "2022-03-28T07:00", "2022-03-29T07:00"],
+        ),
+        # DST ends on October 30th
+        (
+            "2022-10-29 09:00 to 2022-10-31 09:00 in Europe/Vienna",
+            None,
+            0,
+            ["2022-10-29T07:00", "2022-10-30T08:00", "2022-10-31T08:00"],
+        ),
+        ("2022-03-25 09:00 to 2022-03-29 09:00 in Europe/Vienna", 2, 1, ["2022-03-26T08:00", "2022-03-27T07:00"]),
+        ("2022-03-25 09:00 to 2022-03-24 09:00 in Europe/Vienna", None, 0, []),
+    ],
+)
+def test_tzone_day_steps(time_string, limit, offset, expected):
+    """Whole days are stepped in the local time of the time string, not in UTC."""
+    tzone = Tzone(time_string)
+    utc = [t.strftime("%Y-%m-%dT%H:%M") for t in tzone.convert("UTC", step=86400, limit=limit, offset=offset)]
+    assert utc == expected
+    local = tzone.convert("Europe/Vienna", step=86400, limit=limit, offset=offset)
+    assert {t.strftime("%H:%M") for t in local} <= {"09:00"}
+    assert tzone.utc_offsets("Europe/Vienna", step=86400, limit=limit, offset=offset) == [
+        int(t.utcoffset().total_seconds()) for t in local
+    ]
+    # the same runs without a transition table
+    tz = ZoneInfo.from_file(io.BytesIO(tzif_data("America/Los_Angeles")))
+    assert [t.isoformat() for t in tzone.convert(tz, step=86400)] == [
+        t.isoformat() for t in tzone.convert("America/Los_Angeles", step=86400)
+    ]
+
+
+def test_tzone_iter_convert_is_lazy():
+    times = Tzone("2022-01-01 00:00 to 2022-12-31 23:45 in UTC").iter_convert("Europe/Vienna", step=900)
+    assert [t.isoformat() for t in islice(times, 2)] == ["2022-01-01T01:00:00+01:00", "2022-01-01T01:15:00+01:00"]
+    assert sum(1 for _ in times) == 365 * 96 - 2
+
+
+@pytest.mark.parametrize(
+    "tz",
+    ["Europe/Vienna", "America/Los_Angeles", "Australia/Lord_Howe", "Europe/Amsterdam", "UTC"],
+)
+@pytest.mark.parametrize(
+    "time_string, step",
+    [
+        ("2022-10-30 00:00 to 2022-10-30 03:00 in UTC", 900),
+        ("2022-01-01 00:00 to 2022-12-31 23:00 in UTC", 3600 * 7),
+        ("1937-06-30 00:00 to 1937-07-01 23:00 in UTC", 1800),
+    ],
+)
+def test_tzone_utc_offsets(tz, time_string, step):
+    """The offsets of the actual instants, not of today."""
+    tzone = Tzone(time_string)
+    expected = [int(t.utcoffset().total_seconds()) for t in tzone.convert(tz, step=step)]
+    assert tzone.utc_offsets(tz, step=step) == expected
+    assert sum(run.count for run in tzone.runs(tz, step=step)) == len(expected)
+
+
+def test_tzone_runs_without_key():
+    tz = ZoneInfo.from_file(io.BytesIO(tzif_data("Europe/Vienna")))
+    tzone = Tzone("2022-10-30 00:00 to 2022-10-30 03:00 in UTC")
+    assert tzone.runs(tz, step=1800) == tzone.runs("Europe/Vienna", step=1800)
+    assert [t.isoformat() for t in tzone.convert(tz, step=1800)] == [
+        t.isoformat() for t in tzone.convert("Europe/Vienna", step=1800)
+    ]
+    assert [t.fold for t in tzone.convert(tz, step=1800)] == [0, 0, 1, 1, 0, 0, 0]
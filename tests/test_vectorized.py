@@ -0,0 +1,61 @@
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from when.model import Location  # noqa: E402
+from when.vectorized import localize, utc_offsets  # noqa: E402
+from when.when import when_array  # noqa: E402
+
+ZONES = ["Europe/Vienna", "America/Los_Angeles", "Australia/Lord_Howe", "Asia/Kathmandu", "UTC"]
+
+
+def expected(seconds: np.ndarray, tz: str) -> tuple[list[datetime], list[int]]:
+    local = [datetime.fromtimestamp(int(t), ZoneInfo(tz)) for t in seconds]
+    return [t.replace(tzinfo=None) for t in local], [int(t.utcoffset().total_seconds()) for t in local]
+
+
+@pytest.mark.parametrize("tz", ZONES)
+def test_localize_epoch_seconds(tz):
+    rnd = np.random.default_rng(42)
+    seconds = rnd.integers(-2_000_000_000, 4_000_000_000, size=5000)
+    result = localize(seconds, Location(key="", description="", tz=tz))
+    local, offsets = expected(seconds, tz)
+    assert result.local.dtype == np.dtype("datetime64[s]")
+    assert result.local.tolist() == local
+    assert result.offsets.tolist() == offsets
+
+
+@pytest.mark.parametrize("tz", ZONES)
+def test_localize_datetime64(tz):
+    start = np.datetime64("2021-01-01T00:00:00.250")
+    stamps = np.arange(start, start + np.timedelta64(730, "D"), np.timedelta64(15, "m"))
+    result = localize(stamps, Location(key="", description="", tz=tz))
+    local, offsets = expected(stamps.astype("datetime64[s]").astype(np.int64), tz)
+    # the unit (ms) is kept
+    assert result.local.dtype == stamps.dtype
+    assert result.local.astype("datetime64[s]").tolist() == local
+    assert result.offsets.tolist() == offsets
+
+
+def test_nat_and_empty():
+    tz = ZoneInfo("Europe/Vienna")
+    stamps = np.array(["2022-07-01T12:00", "NaT"], dtype="datetime64[s]")
+    assert utc_offsets(stamps, tz).tolist() == [7200, 0]
+    assert np.isnat(localize(stamps, Location(key="", description="", tz="Europe/Vienna")).local[1])
+    assert utc_offsets(np.array([], dtype=np.int64), tz).size == 0
+
+
+def test_invalid_dtype():
+    with pytest.raises(TypeError):
+        utc_offsets(np.array([1.5]), ZoneInfo("UTC"))
+
+
+def test_when_array():
+    instant = int(datetime(2022, 1, 15, 12, tzinfo=timezone.utc).timestamp())
+    results = when_array(np.array([instant]), ["klu", "lax", "Asia/Singapore"])
+    assert [r.location.tz.key for r in results] == ["Europe/Vienna", "America/Los_Angeles", "Asia/Singapore"]
+    assert [str(r.local[0]) for r in results] == ["2022-01-15T13:00:00", "2022-01-15T04:00:00", "2022-01-15T20:00:00"]
+    assert [int(r.offsets[0]) for r in results] == [3600, -28800, 28800]
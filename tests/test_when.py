@@ -1,5 +1,8 @@
+from concurrent.futures import ThreadPoolExecutor
+from zoneinfo import ZoneInfoNotFoundError
+
 import pytest
-from when.when import when
+from when.when import Converter, offset_rows, rows, when, when_batch, when_many, when_stream
 
 
 @pytest.mark.parametrize(
@@ -21,3 +24,76 @@ def test_when(time_string, location_keys, times_count):
         assert zones[i].name == loc
         assert zones[i].tz
         assert len(zones[i].times) == times_count
+        assert all(t.tzinfo is zones[i].times[0].tzinfo for t in zones[i].times)
+
+
+def test_when_batch():
+    lines = ["6:00\n", "\n", "6:00 - 10:00 in KLU\n", "no time at all\n", "6:00 in Nowhere/Special\n"]
+    results = list(when_batch(lines, ["sin", "klu"]))
+    assert [time_string for time_string, _ in results] == [
+        "6:00",
+        "6:00 - 10:00 in KLU",
+        "no time at all",
+        "6:00 in Nowhere/Special",
+    ]
+    assert [len(zones[0].times) for _, zones in results[:2]] == [1, 5]
+    assert isinstance(results[2][1], Exception)
+    assert isinstance(results[3][1], ZoneInfoNotFoundError)
+
+
+def test_when_stream():
+    zones = when_stream("2022-03-27 00:00 to 2022-03-27 03:00 in UTC", ["klu", "utc"], step=1800, limit=5)
+    assert [zone.tz for zone in zones] == ["Europe/Vienna", "UTC"]
+    assert [[t.strftime("%H:%M") for t in row] for row in rows(zones)] == [
+        ["01:00", "00:00"],
+        ["01:30", "00:30"],
+        ["03:00", "01:00"],
+        ["03:30", "01:30"],
+        ["04:00", "02:00"],
+    ]
+
+
+def test_when_offsets():
+    zones = when("2022-03-27 00:00 to 2022-03-27 03:00 in UTC", ["klu", "lax"], step=1800)
+    assert [zone.offset for zone in zones] == [3600, -7 * 3600]
+    assert zones[0].offsets == [3600, 3600, 7200, 7200, 7200, 7200, 7200]
+    assert zones[1].offsets == [-7 * 3600] * 7
+    assert list(offset_rows(when_stream("2022-03-27 00:00 to 2022-03-27 01:00 in UTC", ["klu", "utc"]))) == [
+        (3600, 0),
+        (7200, 0),
+    ]
+
+
+def test_when_many():
+    time_strings = ["6:00 in UTC", "6:00 - 10:00 in KLU", "no time at all"]
+    results = when_many(time_strings, ["sin", "klu"])
+    assert [zone.times for zone in next(results)] == [zone.times for zone in when("6:00 in UTC", ["sin", "klu"])]
+    assert [len(zone.times) for zone in next(results)] == [5, 5]
+    with pytest.raises(Exception):
+        next(results)
+
+
+def test_when_many_unknown_location():
+    with pytest.raises(ZoneInfoNotFoundError):
+        when_many(["6:00"], ["Nowhere/Special"])
+
+
+def test_converter():
+    converter = Converter(["klu", "lax"], step=1800, limit=3)
+    zones = converter.convert("2022-03-27 00:00 to 2022-03-27 03:00 in UTC")
+    assert [zone.name for zone in zones] == ["klu", "lax"]
+    assert zones[0].offsets == [3600, 3600, 7200]
+    assert converter.resolve("UTC") is converter.resolve("UTC")
+    lazy = converter.convert("2022-03-27 00:00 to 2022-03-27 03:00 in UTC", lazy=True)
+    assert list(rows(lazy)) == list(rows(zones))
+
+
+def test_converter_threads():
+    converter = Converter(["klu", "lax", "sin"])
+    time_strings = [
+        f"2022-03-{day:02} 6:00 to 2022-03-{day:02} 18:00 in {tz}" for day in range(1, 29) for tz in ("UTC", "LAX")
+    ]
+    expected = [[zone.times for zone in converter.convert(t)] for t in time_strings]
+    with ThreadPoolExecutor(8) as pool:
+        results = pool.map(lambda t: [zone.times for zone in converter.convert(t)], time_strings * 4)
+    assert list(results) == expected * 4
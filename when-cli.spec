@@ -1,35 +1,56 @@
 # -*- mode: python ; coding: utf-8 -*-
+"""
+Standalone when-cli build, tuned for the startup time:
 
-from PyInstaller.building.api import EXE, COLLECT, PYZ
-from PyInstaller.building.build_main import Analysis
-from PyInstaller.building.osx import BUNDLE
-from PyInstaller.utils.hooks import collect_data_files, collect_submodules
-
-block_cipher = None
+* onedir: the executable starts from its directory, a onefile build unpacks itself into a
+  temporary directory on every start,
+* only the precompiled lookup indexes of when/data (locations and places, see generate_index.py)
+  and the TZif files of the tzdata package, no text tables,
+* no UPX, compressed libraries are decompressed on every start,
+* no optional or build-time only packages (numpy, airportsdata, ...). rich, rich-click and
+  pydantic are bundled but imported on demand only, like in the Python package.
 
-extra_files = []
-extra_folders = ["when/data"]
-extra_pyinstaller_files = []
+`make binary` builds dist/when-cli/when-cli and reports its startup time.
+"""
+from pathlib import Path
 
-# Process the extra-files and folders
-for file_item in extra_files:
-    extra_pyinstaller_files.append((file_item, "."))
+from PyInstaller.building.api import COLLECT, EXE, PYZ
+from PyInstaller.building.build_main import Analysis
+from PyInstaller.utils.hooks import collect_data_files
 
-for folder_item in extra_folders:
-    extra_pyinstaller_files.append((folder_item, folder_item))
+block_cipher = None
 
-extra_pyinstaller_files += collect_data_files('airportsdata')
+# the lookup indexes, the location index already contains the cities
+datas = [(f"when/data/{name}", "when/data") for name in ("locations.idx", "places.idx")]
+# zoneinfo files and the list of zones (zoneinfo.available_timezones), no zone.tab, tzdata.zi, ...
+tzdata_tables = ("iso3166.tab", "leapseconds", "tzdata.zi", "zone.tab", "zone1970.tab", "zonenow.tab")
+datas += [(source, target) for source, target in collect_data_files("tzdata") if Path(source).name not in tzdata_tables]
 
+excludes = [
+    # optional extra (`when-cli[numpy]`), never imported by the CLI
+    "numpy",
+    "when.vectorized",
+    # build and development time only
+    "airportsdata",
+    "generate_cities",
+    "generate_index",
+    "benchmarks",
+    "black",
+    "pytest",
+    # optional imports of rich (jupyter and IPython support) pull in IPython, jedi, sqlite3, tkinter, ...
+    "IPython",
+    "tkinter",
+]
 
-a = Analysis(['when/__main__.py'],
+a = Analysis(['when/daemon.py'],
              pathex=[],
              binaries=[],
-             datas=extra_pyinstaller_files,
+             datas=datas,
              hiddenimports=[],
              hookspath=[],
              hooksconfig={},
              runtime_hooks=[],
-             excludes=[],
+             excludes=excludes,
              win_no_prefer_redirects=False,
              win_private_assemblies=False,
              cipher=block_cipher,
@@ -39,19 +60,24 @@ pyz = PYZ(a.pure, a.zipped_data,
 
 exe = EXE(pyz,
           a.scripts,
-          a.binaries,
-          a.zipfiles,
-          a.datas,
           [],
+          exclude_binaries=True,
           name='when-cli',
           debug=False,
           bootloader_ignore_signals=False,
           strip=False,
-          upx=True,
-          upx_exclude=[],
-          runtime_tmpdir=None,
+          upx=False,
           console=True,
           disable_windowed_traceback=False,
           target_arch=None,
           codesign_identity=None,
           entitlements_file=None )
+
+coll = COLLECT(exe,
+               a.binaries,
+               a.zipfiles,
+               a.datas,
+               strip=False,
+               upx=False,
+               upx_exclude=[],
+               name='when-cli')
@@ -1,33 +1,22 @@
+"""
+when-cli command line interface.
+
+Keep the module level imports lightweight: rich, the help formatter and the conversion
+libraries are imported only by the code paths which need them.
+"""
 import locale
+import os
 import sys
-import zoneinfo
-from datetime import datetime as dt
+from enum import Enum
+from functools import cache
 from typing import List
 
-import rich.box
-import rich_click.rich_click
-import rich_click.typer as typer
-from rich import print
-from rich.markdown import Markdown
-from rich.style import Style
-from rich.table import Table
-from rich.text import Text
+import click
+import typer
+from typer.core import TyperCommand
+from typer.main import get_command
 
-from when import rich_typer
-from when.config import settings
-from when.when import when
-
-rich_click.rich_click.USE_RICH_MARKUP = True
-rich_click.rich_click.SHOW_ARGUMENTS = True
-rich_click.rich_click.GROUP_ARGUMENTS_OPTIONS = False
-rich_click.rich_click.SHOW_METAVARS_COLUMN = True
-rich_click.rich_click.FOOTER_TEXT = rich_typer.blend_text(
-    "Made with ♥ by https://github.com/chassing/when-cli", (32, 32, 255), (255, 32, 255)
-)
-rich_click.rich_click.STYLE_FOOTER_TEXT = "#D920FF"
-
-locale.setlocale(locale.LC_ALL, "")
-locale.setlocale(locale.LC_TIME, "")
+from when import trace
 
 
 INFO_COLS = [
@@ -38,6 +27,16 @@ INFO_COLS = [
 
 VERSION = "2.0"
 
+
+class Output(str, Enum):
+    table = "table"
+    json = "json"
+    jsonl = "jsonl"
+    csv = "csv"
+    tsv = "tsv"
+    plain = "plain"
+
+
 SHORT_USAGE = """
 
 # Usage
@@ -85,6 +84,7 @@ $ when-cli [OPTIONS] TIME_STRING
     * lax (Los Angeles International Airport)
     * KJFK (John F Kennedy International Airport)
 * self defined locations via WHEN_CONFIG_LOCATIONS
+* coordinates (latitude,longitude), e.g. 46.62,14.31
 
 # Examples
 
@@ -102,28 +102,177 @@ Complete usage guide can be found at [https://github.com/chassing/when-cli/blob/
 """
 
 
+class Command(TyperCommand):
+    """Rich help and error output, rich and rich-click are loaded on demand only."""
+
+    def main(self, *args, standalone_mode: bool = True, **kwargs):
+        try:
+            return super().main(*args, standalone_mode=False, **kwargs)
+        except click.ClickException as e:
+            if not standalone_mode:
+                raise
+            from rich_click.rich_click import rich_format_error
+
+            setup_rich_click()
+            rich_format_error(e)
+            sys.exit(e.exit_code)
+        except click.exceptions.Abort:
+            if not standalone_mode:
+                raise
+            from rich_click.rich_click import rich_abort_error
+
+            rich_abort_error()
+            sys.exit(1)
+        except ValueError as e:
+            # the config file or the location directory (when.config is loaded on demand only)
+            from when.config import ConfigError
+
+            if not isinstance(e, ConfigError) or not standalone_mode:
+                raise
+            from rich.markup import escape
+
+            error(f"[b red]Invalid configuration[/]: {escape(str(e))}")
+
+    def format_help(self, ctx: click.Context, formatter: click.HelpFormatter):
+        from when import rich_typer
+
+        setup_rich_click()
+        rich_typer.rich_format_help(self, ctx, formatter)
+
+
+def setup_rich_click():
+    import rich_click.rich_click
+
+    from when import rich_typer
+
+    rich_click.rich_click.USE_RICH_MARKUP = True
+    rich_click.rich_click.SHOW_ARGUMENTS = True
+    rich_click.rich_click.GROUP_ARGUMENTS_OPTIONS = False
+    rich_click.rich_click.SHOW_METAVARS_COLUMN = True
+    rich_click.rich_click.FOOTER_TEXT = rich_typer.blend_text(
+        "Made with ♥ by https://github.com/chassing/when-cli", (32, 32, 255), (255, 32, 255)
+    )
+    rich_click.rich_click.STYLE_FOOTER_TEXT = "#D920FF"
+
+
+def error(message: str):
+    from rich import print
+
+    print(message)
+    sys.exit(1)
+
+
 def complete_info_columns(ctx: typer.Context, incomplete: str):
     for name, help_text in INFO_COLS:
         if name.startswith(incomplete) and name not in ctx.params.get("info-columns", []):
             yield (name, help_text)
 
 
+def complete_locations(incomplete: str):
+    from when.completion import complete_location
+
+    return complete_location(incomplete)
+
+
+def complete_time_string(incomplete: str):
+    from when.completion import complete_time_string
+
+    return complete_time_string(incomplete)
+
+
 def show_usage(value: bool):
     if not value:
         return
+    from rich import print
+    from rich.markdown import Markdown
+
     print(Markdown(SHORT_USAGE))
     sys.exit(0)
 
 
+def start_daemon(value: bool):
+    if not value:
+        return
+    from rich import print
+
+    from when.daemon import serve, socket_path
+
+    print(f"when-cli daemon listening on [b]{socket_path()}[/]")
+    try:
+        serve()
+    except RuntimeError as e:
+        error(f"[b red]{e}[/]")
+    sys.exit(0)
+
+
+def start_timings(ctx: typer.Context, value: bool):
+    if not value:
+        return
+    trace.start(timings=True)
+    ctx.call_on_close(trace.stop)
+
+
+def start_profile(ctx: typer.Context, value: str):
+    if not value:
+        return
+    trace.start(timings=False, profile=value)
+    ctx.call_on_close(trace.stop)
+
+
+def zone_as_dict(zone) -> dict:
+    """JSON compatible zone, times as ISO 8601 strings."""
+    return {
+        "name": zone.name,
+        "description": zone.description,
+        "tz": zone.tz,
+        "offset": zone.offset,
+        "times": [t.isoformat() for t in zone.times],
+        "offsets": list(zone.offsets),
+    }
+
+
+def step_seconds(value: str) -> int:
+    from when.parser import parse_step
+
+    try:
+        return parse_step(value)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+
+def print_batch(lines: typer.FileText, locations: List[str], step: int, limit: int | None):
+    import json
+    import zoneinfo
+
+    from when.when import when_batch
+
+    for time_string, result in when_batch(lines, location_keys=locations, step=step, limit=limit):
+        if isinstance(result, zoneinfo.ZoneInfoNotFoundError):
+            line = {"time_string": time_string, "error": f"Unknown timezone: {result}"}
+        elif isinstance(result, Exception):
+            line = {"time_string": time_string, "error": str(result)}
+        else:
+            line = {"time_string": time_string, "zones": [zone_as_dict(zone) for zone in result]}
+        sys.stdout.write(json.dumps(line) + "\n")
+        # every result is written immediately, e.g. for a co-process which sends one line at a time
+        sys.stdout.flush()
+
+
 def main(
-    time_string: str,
+    time_string: str = typer.Argument(
+        None,
+        help="Time string to convert, see --usage. Required without --batch.",
+        autocompletion=complete_time_string,
+    ),
     locations: List[str] = typer.Option(
-        [loc.key for loc in settings.locations],
+        None,
         "--locations",
         "-l",
         help="Display these locations. Can be given multiple times.",
+        show_default="configured locations",
         metavar="LOCATION_KEY",
         envvar="WHEN_LOCATIONS",
+        autocompletion=complete_locations,
     ),
     table_color: str = typer.Option(
         "deep_sky_blue2", envvar="WHEN_TABLE_COLOR", metavar="COLOR", help="Table border color"
@@ -145,9 +294,56 @@ def main(
         envvar="WHEN_INFO_COLUMNS",
         metavar="COL_NAME",
     ),
+    step: str = typer.Option(
+        "1h",
+        callback=step_seconds,
+        envvar="WHEN_STEP",
+        metavar="STEP",
+        help="Step between the times of a range, e.g. 15m, 1h or 1d.",
+    ),
+    limit: int = typer.Option(
+        None, min=1, envvar="WHEN_LIMIT", metavar="INTEGER", help="Display at most this many times."
+    ),
+    output: Output = typer.Option(
+        Output.table,
+        "--output",
+        "-o",
+        envvar="WHEN_OUTPUT",
+        help="Output format, all but table are written while the times are converted.",
+    ),
+    batch: typer.FileText = typer.Option(
+        None,
+        metavar="FILE",
+        help="Convert every line of FILE ('-' for stdin) and print one JSON object per line.",
+    ),
+    timings: bool = typer.Option(
+        False,
+        "--timings",
+        is_eager=True,
+        expose_value=False,
+        callback=start_timings,
+        envvar="WHEN_TRACE",
+        help="Report the wall time and allocated memory blocks per phase to stderr (JSON).",
+    ),
+    profile: str = typer.Option(
+        None,
+        is_eager=True,
+        expose_value=False,
+        callback=start_profile,
+        metavar="FILE",
+        help="Write a cProfile file, see python -m pstats.",
+    ),
     usage: bool = typer.Option(
         None, is_flag=True, is_eager=True, expose_value=False, callback=show_usage, help="Show usage."
     ),
+    daemon: bool = typer.Option(
+        None,
+        is_flag=True,
+        is_eager=True,
+        expose_value=False,
+        callback=start_daemon,
+        help="Run as daemon, later when-cli calls are served by it. Socket: WHEN_DAEMON_SOCKET.",
+    ),
 ):
     """[b yellow]when-cli[/] is a timezone conversion tool. It takes as input a natural time string, can also be a time range,
     and converts it into different timezone(s) at specific location(s).
@@ -159,6 +355,10 @@ def main(
     \b
     $ when-cli "30. September 17:00 to Oct 1st 2:3pm in LAX"
     $ when-cli "17:00 in Europe/Berlin" -l lax -l klu
+    $ cat times.txt | when-cli --batch - -l lax -l klu
+    $ when-cli overlap klu els sin  [dim]# common working hours, see when-cli overlap --help[/]
+    $ when-cli convert-file export.csv -c created -l lax  [dim]# CSV files, see when-cli convert-file --help[/]
+    $ tail -f app.log | when-cli filter -l klu  [dim]# log timestamps, see when-cli filter --help[/]
 
     \b
     [b white]Syntax[/]
@@ -178,56 +378,374 @@ def main(
     [#2020FF]C[/][#4520FF]o[/][#6A20FF]l[/][#8F20FF]o[/][#B420FF]r[/][#D920FF]s[/]
     See [link]https://rich.readthedocs.io/en/latest/appendix/colors.html[/] for all available color codes.
     """
+    if not batch and not time_string:
+        raise typer.BadParameter("TIME_STRING is required", param_hint="TIME_STRING")
+
+    import zoneinfo
+
+    with trace.phase("settings"):
+        from when.config import get_settings
+
+        settings = get_settings()
+    with trace.phase("imports"):
+        from when.when import offset_rows, rows, when_stream
+
+    locations = locations or [loc.key for loc in settings.locations]
+    if batch:
+        try:
+            print_batch(batch, locations, step=step, limit=limit)
+        except zoneinfo.ZoneInfoNotFoundError as e:
+            error(f"[b red]Unknown timezone[/]: {e}")
+        return
+
     try:
-        zones = when(time_string=time_string, location_keys=locations)
+        zones = when_stream(time_string=time_string, location_keys=locations, step=step, limit=limit)
     except zoneinfo.ZoneInfoNotFoundError as e:
-        print(f"[b red]Unknown timezone[/]: {e}")
-        sys.exit(1)
-
-    zones = sorted(zones, key=lambda x: x.offset)
-    table = Table(title="Time table", style=table_color, box=rich.box.ROUNDED, padding=row_padding)
-    for zone in zones:
-        text = zone.description + (f" ({zone.name})" if zone.name else "")
-        if text:
-            text += "\n"
-        text += zone.tz
-        table.add_column(Text(text, justify="center", style=header_color))
-
-    p_times = None
-    for _times in zip(*[zone.times for zone in zones]):
-        row = []
-        times = [dt.fromisoformat(t) for t in _times]
-
-        for i, time in enumerate(times):
-            row_text = Text()
-            date_col = Text(
-                time.strftime(date_format),
-                style=Style(
-                    color=date_color, bgcolor="yellow" if p_times and p_times[i].date() < time.date() else None
-                ),
+        error(f"[b red]Unknown timezone[/]: {e}")
+
+    formats = {"date": date_format, "time": time_format, "tz": tz_format}
+    locale.setlocale(locale.LC_ALL, "")
+    if output != Output.table:
+        from when.output import write
+
+        with trace.phase("render"):
+            write(
+                output.value,
+                zones,
+                rows(zones),
+                sys.stdout,
+                columns=info_columns,
+                formats=formats,
+                offsets=offset_rows(zones),
             )
+        return
 
-            time_col = Text(time.strftime(time_format), style=time_color)
-            tz_col = Text(time.strftime(tz_format), style=tz_color)
+    with trace.phase("imports"):
+        import rich.box
+        from rich import print
+        from rich.style import Style
+        from rich.table import Table
+        from rich.text import Text
+
+        from when.formatter import Formatter
+
+    with trace.phase("render"):
+        zones = sorted(zones, key=lambda x: x.offset)
+        table = Table(title="Time table", style=table_color, box=rich.box.ROUNDED, padding=row_padding)
+        for zone in zones:
+            text = zone.description + (f" ({zone.name})" if zone.name else "")
+            if text:
+                text += "\n"
+            text += zone.tz
+            table.add_column(Text(text, justify="center", style=header_color))
+
+        formatters = [Formatter(info_columns, formats) for _ in zones]
+        styles = {"date": Style(color=date_color), "time": Style.parse(time_color), "tz": Style.parse(tz_color)}
+        # highlight the date if it has changed since the previous row and the tz on DST changes
+        new_date = Style(color=date_color, bgcolor="yellow")
+        new_offset = Style.parse(tz_color) + Style(bgcolor="yellow")
+        p_times = p_offsets = None
+        for times, offsets in zip(rows(zones), offset_rows(zones)):
+            row = []
+            for i, (time, formatter) in enumerate(zip(times, formatters)):
+                date_style = new_date if p_times and p_times[i].toordinal() < time.toordinal() else styles["date"]
+                tz_style = new_offset if p_offsets and p_offsets[i] != offsets[i] else styles["tz"]
+                row_text = Text()
+                for info_col, value in zip(formatter.columns, formatter(time)):
+                    style = date_style if info_col == "date" else tz_style if info_col == "tz" else styles[info_col]
+                    row_text.append(value, style=style)
+                    row_text.append(" ")
+                row.append(row_text)
+
+            p_times, p_offsets = times, offsets
+            table.add_row(*row)
+
+        print(table)
+
+
+def overlap(
+    locations: List[str] = typer.Argument(
+        None,
+        metavar="[LOCATION_KEY]...",
+        help="Find slots for these locations.",
+        show_default="configured locations",
+        autocompletion=complete_locations,
+    ),
+    hours: List[str] = typer.Option(
+        [],
+        "--hours",
+        "-w",
+        metavar="[LOCATION_KEY=]HH:MM-HH:MM",
+        help="Working hours of all locations or of LOCATION_KEY only. Can be given multiple times. "
+        "[default: 09:00-17:00]",
+    ),
+    first: str = typer.Option(None, "--from", metavar="DATE", help="First day.", show_default="today"),
+    last: str = typer.Option(None, "--to", metavar="DATE", help="Last day.", show_default="6 days after the first"),
+    min_duration: str = typer.Option(
+        "30m", "--min", callback=step_seconds, metavar="DURATION", help="Minimum slot length."
+    ),
+    weekends: bool = typer.Option(False, "--weekends", help="Saturdays and Sundays are working days too."),
+    output: Output = typer.Option(Output.table, "--output", "-o", envvar="WHEN_OUTPUT", help="Output format."),
+):
+    """Find the common working hours of locations, e.g. for meetings.
 
-            for info_col in info_columns:
-                if info_col == "date":
-                    row_text += date_col
-                if info_col == "time":
-                    row_text += time_col
-                if info_col == "tz":
-                    row_text += tz_col
-                row_text += " "
-            row.append(row_text)
+    \b
+    ---
+    Examples:
 
-        p_times = times
-        table.add_row(*row)
+    \b
+    $ when-cli overlap klu els sin
+    $ when-cli overlap klu lax --hours 08:00-18:00 --hours lax=07:00-16:00 --from 2022-03-01 --to 2022-03-31
+    """
+    import datetime as dt
+    import zoneinfo
+
+    from when.config import get_settings
+    from when.overlap import DEFAULT_HOURS, overlap as find_slots, parse_hours
+    from when.parser import parse
+    from when.when import location_by_key
 
+    locations = locations or [loc.key for loc in get_settings().locations]
+    default_hours = DEFAULT_HOURS
+    location_hours = {}
+    try:
+        for value in hours:
+            key, sep, window = value.rpartition("=")
+            if sep:
+                location_hours[key.lower()] = parse_hours(window)
+            else:
+                default_hours = window
+        default = parse_hours(default_hours)
+        start = parse(first)[0].date() if first else dt.date.today()
+        end = parse(last)[0].date() if last else start + dt.timedelta(days=6)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+    try:
+        resolved = [(key, location_by_key(key)) for key in locations]
+    except zoneinfo.ZoneInfoNotFoundError as e:
+        error(f"[b red]Unknown timezone[/]: {e}")
+
+    slots = find_slots(
+        [(location, location_hours.get(key.lower(), default)) for key, location in resolved],
+        start,
+        end,
+        weekends=weekends,
+        min_duration=min_duration,
+    )
+
+    locale.setlocale(locale.LC_ALL, "")
+    if output != Output.table:
+        from when.output import write_slots
+
+        write_slots(output.value, slots, sys.stdout)
+        return
+
+    if not slots:
+        error("[b red]No common working hours found.[/]")
+
+    import rich.box
+    from rich import print
+    from rich.table import Table
+    from rich.text import Text
+
+    table = Table(title="Common working hours", box=rich.box.ROUNDED)
+    table.add_column(Text("Duration", justify="center", style="green"))
+    for _, location in resolved:
+        text = location.description + (f" ({location.key})" if location.key else "")
+        table.add_column(Text((text + "\n" if text else "") + str(location.tz), justify="center", style="green"))
+    for slot in slots:
+        row = [f"{slot.duration // 3600}:{slot.duration % 3600 // 60:02}"]
+        for _, location in resolved:
+            start_local, end_local = slot.start.astimezone(location.tz), slot.end.astimezone(location.tz)
+            end_fmt = "%H:%M" if end_local.date() == start_local.date() else "%a %x %H:%M"
+            row.append(f"{start_local.strftime('%a %x %H:%M')} - {end_local.strftime(end_fmt)}")
+        table.add_row(*row)
     print(table)
 
 
+def convert_file(
+    input: typer.FileText = typer.Argument(..., metavar="INPUT", help="CSV file with a header row, '-' for stdin."),
+    output: typer.FileTextWrite = typer.Argument("-", metavar="OUTPUT", help="CSV file, '-' for stdout."),
+    column: str = typer.Option(..., "--column", "-c", help="Column with the timestamps."),
+    source: str = typer.Option(
+        None,
+        "--from",
+        metavar="LOCATION_KEY",
+        help="Location or timezone of timestamps without UTC offset.",
+        show_default="default timezone",
+        autocompletion=complete_locations,
+    ),
+    locations: List[str] = typer.Option(
+        None,
+        "--locations",
+        "-l",
+        help="Convert into these locations, one column each. Can be given multiple times.",
+        show_default="configured locations",
+        metavar="LOCATION_KEY",
+        envvar="WHEN_LOCATIONS",
+        autocompletion=complete_locations,
+    ),
+    errors: typer.FileTextWrite = typer.Option(
+        "-", metavar="FILE", help="Write the rows which can't be converted to this CSV file.", show_default="stderr"
+    ),
+    chunk_size: int = typer.Option(10_000, min=1, metavar="INTEGER", help="Rows per chunk."),
+    jobs: int = typer.Option(None, "--jobs", "-j", min=1, help="Worker processes.", show_default="CPU count"),
+):
+    """Convert a timestamp column of a CSV file into locations, e.g. exports with local timestamps.
+
+    A column per location is appended to every row ([b]<column>_<location>[/], ISO 8601), the rows
+    keep their order. The file is converted in chunks by a pool of worker processes.
+
+    \b
+    ---
+    Examples:
+
+    \b
+    $ when-cli convert-file export.csv converted.csv -c created --from klu -l lax -l sin
+    $ cat export.csv | when-cli convert-file - -c created --from Europe/Vienna -l utc --errors failed.csv
+    """
+    import zoneinfo
+
+    from when.bulk import convert_file as convert, default_jobs
+    from when.config import default_tz, get_settings
+    from when.when import location_by_key
+
+    locations = locations or [loc.key for loc in get_settings().locations]
+    try:
+        source_location = location_by_key(source or default_tz())
+        targets = [(key, location_by_key(key)) for key in locations]
+    except zoneinfo.ZoneInfoNotFoundError as e:
+        error(f"[b red]Unknown timezone[/]: {e}")
+
+    # "-" is stdout for click, the errors go to stderr by default
+    errors = sys.stderr if errors.name == "<stdout>" else errors
+    try:
+        stats = convert(
+            input, output, errors, column, source_location, targets, chunk_size=chunk_size, jobs=jobs or default_jobs()
+        )
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="'--column'")
+    output.flush()
+    if stats.errors:
+        sys.stderr.write(f"{stats.errors} of {stats.rows} rows could not be converted\n")
+        sys.exit(1)
+
+
+def filter_lines(
+    input: typer.FileBinaryRead = typer.Argument("-", metavar="FILE", help="Log file, '-' for stdin."),
+    locations: List[str] = typer.Option(
+        None,
+        "--locations",
+        "-l",
+        help="Convert into these locations, more than one with --annotate only. Can be given multiple times.",
+        show_default="default timezone, configured locations with --annotate",
+        metavar="LOCATION_KEY",
+        autocompletion=complete_locations,
+    ),
+    source: str = typer.Option(
+        "UTC",
+        "--from",
+        metavar="LOCATION_KEY",
+        help="Location or timezone of timestamps without UTC offset.",
+        autocompletion=complete_locations,
+    ),
+    pattern: str = typer.Option(
+        None,
+        "--pattern",
+        "-p",
+        envvar="WHEN_FILTER_PATTERN",
+        metavar="REGEX",
+        help="Timestamp pattern, groups: year, month, day, hour, minute, second (optional: sep, fraction, offset).",
+        show_default="ISO 8601, e.g. 2022-05-07 06:00:00.123 or 2022-05-07T06:00:00Z",
+    ),
+    annotate: bool = typer.Option(
+        False, "--annotate", "-a", help="Keep the timestamps and append the local times of the locations."
+    ),
+):
+    """Rewrite the timestamps of log lines into local times, e.g. behind tail -f.
+
+    Every line is written as soon as it has been read.
+
+    \b
+    ---
+    Examples:
+
+    \b
+    $ tail -f app.log | when-cli filter -l klu
+    $ when-cli filter app.log -a -l klu -l lax --from Europe/Vienna
+    """
+    import zoneinfo
+
+    from when.config import default_tz, get_settings
+    from when.rewrite import DEFAULT_PATTERN, Rewriter, rewrite_stream
+    from when.when import location_by_key
+
+    if not locations:
+        locations = [loc.key for loc in get_settings().locations] if annotate else [default_tz()]
+    try:
+        source_tz = location_by_key(source).tz
+        targets = [(key, location_by_key(key).tz) for key in locations]
+    except zoneinfo.ZoneInfoNotFoundError as e:
+        error(f"[b red]Unknown timezone[/]: {e}")
+    if len(targets) > 1 and not annotate:
+        raise typer.BadParameter("Timestamps can be rewritten into one location only, use --annotate for more")
+    try:
+        rewriter = Rewriter(source_tz, targets, pattern=pattern or DEFAULT_PATTERN, annotate=annotate)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="'--pattern'")
+
+    try:
+        rewrite_stream(rewriter, input, sys.stdout.buffer)
+    except BrokenPipeError:
+        # e.g. | head, see https://docs.python.org/3/library/signal.html#note-on-sigpipe
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+
+# sub-commands: when-cli <name> ..., everything else is a TIME_STRING conversion
+COMMANDS = {"overlap": overlap, "convert-file": convert_file, "filter": filter_lines}
+
+
+@cache
+def command(name: str = "") -> click.Command:
+    """The when-cli click command or the sub-command name."""
+    app = typer.Typer()
+    app.command(cls=Command)(COMMANDS[name] if name else main)
+    return get_command(app)
+
+
+def dispatch(argv: list[str]) -> tuple[click.Command, list[str], str]:
+    """Command, its arguments and program name for the when-cli arguments argv."""
+    if argv and argv[0] in COMMANDS:
+        return command(argv[0]), argv[1:], f"when-cli {argv[0]}"
+    return command(), argv, "when-cli"
+
+
+def warm_up():
+    """Load settings, location index, zone data and the rendering libraries upfront."""
+    import rich.markdown  # noqa: F401
+    import rich.table  # noqa: F401
+
+    from when.config import get_settings
+    from when.when import when
+
+    setup_rich_click()
+    when("00:00", [loc.key for loc in get_settings().locations])
+
+
+def completion_argv() -> list[str]:
+    """when-cli arguments of a shell completion request, they are passed in the environment."""
+    from click.parser import split_arg_string
+
+    words = os.environ.get("_TYPER_COMPLETE_ARGS") or os.environ.get("COMP_WORDS") or ""
+    return split_arg_string(words)[1:]
+
+
 def run():
-    typer.run(main)
+    completing = "_WHEN_CLI_COMPLETE" in os.environ
+    cmd, args, prog_name = dispatch(completion_argv() if completing else sys.argv[1:])
+    cmd.main(args=args, prog_name=prog_name, complete_var="_WHEN_CLI_COMPLETE")
 
 
 if __name__ == "__main__":
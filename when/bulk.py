@@ -0,0 +1,165 @@
+"""
+Bulk conversion of a timestamp column of a CSV file, see `when-cli convert-file`.
+
+The file is read in chunks of rows. Only the values of the timestamp column of a chunk are sent
+to the worker processes, the converted values come back in the same order and are appended to
+the rows of the chunk, so the output has the order of the input. At most a few chunks per
+worker are in flight, the memory use does not depend on the size of the file. Rows whose
+timestamp can't be parsed are written to the errors file instead of the output.
+"""
+import csv
+import os
+import re
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Iterable, Iterator, NamedTuple, TextIO
+
+from .model import Location
+from .parser import parse
+from .when import as_zoneinfo, parse_time_string
+
+CHUNK_SIZE = 10_000
+# chunks per worker in flight
+AHEAD = 2
+# trailing UTC offset (Z, +02, +0200, +02:00) after a time, e.g. 2022-05-07 06:00:00 +0000 or 6:00am Z
+OFFSET = re.compile(
+    r"(?P<value>.*(?::\d{2}(?:[.,]\d+)?|[ap]\.?m\.?))\s*"
+    r"(?P<offset>Z|(?P<sign>[+-])(?P<hours>\d{2})(?::?(?P<minutes>\d{2}))?)",
+    re.IGNORECASE,
+)
+
+Chunk = list[list[str]]
+# the converted values of a timestamp or the error message
+Converted = list[str] | str
+
+
+class Stats(NamedTuple):
+    rows: int
+    errors: int
+
+
+def default_jobs() -> int:
+    """CPUs available to this process."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def parse_timestamp(value: str, source: str) -> datetime:
+    """Timestamp in the source timezone, ISO 8601 without the parser.
+
+    A trailing UTC offset is kept (the time string parser ignores it), the timestamp is in the
+    source timezone only without one.
+    """
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except ValueError:
+        if m := OFFSET.fullmatch(value):
+            return _parse_naive(m["value"]).replace(tzinfo=_offset(m))
+        return parse_time_string(value, source)
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=as_zoneinfo(source))
+
+
+def _parse_naive(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return parse(value)[0]
+
+
+def _offset(m: re.Match) -> timezone:
+    if m["offset"].upper() == "Z":
+        return timezone.utc
+    seconds = int(m["hours"]) * 3600 + int(m["minutes"] or 0) * 60
+    return timezone(timedelta(seconds=-seconds if m["sign"] == "-" else seconds))
+
+
+def convert_values(source: str, targets: tuple[str, ...], values: list[str]) -> list[Converted]:
+    """ISO 8601 times of values in every target timezone, runs in the worker processes."""
+    zones = [as_zoneinfo(tz) for tz in targets]
+    result: list[Converted] = []
+    for value in values:
+        try:
+            timestamp = parse_timestamp(value.strip(), source)
+            result.append([timestamp.astimezone(tz).isoformat() for tz in zones])
+        except (ValueError, OverflowError) as e:
+            result.append(str(e) or f"can't parse '{value}'")
+    return result
+
+
+def chunks(rows: Iterable[list[str]], size: int) -> Iterator[Chunk]:
+    chunk: Chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _in_order(executor: Executor | None, func, chunks: Iterable[Chunk], index: int, ahead: int):
+    """(chunk, converted values) in the order of chunks, at most ahead chunks are submitted at once."""
+    pending: deque[tuple[Chunk, Future]] = deque()
+    for chunk in chunks:
+        values = [row[index] if index < len(row) else "" for row in chunk]
+        if executor is None:
+            yield chunk, func(values)
+            continue
+        pending.append((chunk, executor.submit(func, values)))
+        if len(pending) >= ahead:
+            chunk, future = pending.popleft()
+            yield chunk, future.result()
+    while pending:
+        chunk, future = pending.popleft()
+        yield chunk, future.result()
+
+
+def convert_file(
+    input: TextIO,
+    output: TextIO,
+    errors: TextIO,
+    column: str,
+    source: Location,
+    targets: list[tuple[str, Location]],
+    chunk_size: int = CHUNK_SIZE,
+    jobs: int = 1,
+) -> Stats:
+    """Append a column per (label, location) of targets with the times of column (in source) to the CSV rows.
+
+    The header of the output gets "<column>_<label>" columns, the errors file (written on the
+    first error) the row number (1 is the first row after the header), the row and the error message.
+    """
+    reader = csv.reader(input)
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("The input is empty, a header row is required")
+    if column not in header:
+        raise ValueError(f"Column '{column}' not found in the header: {', '.join(header)}")
+    index = header.index(column)
+
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(header + [f"{column}_{label}" for label, _ in targets])
+    error_writer = csv.writer(errors, lineterminator="\n")
+
+    func = partial(convert_values, str(source.tz), tuple(str(location.tz) for _, location in targets))
+    executor = ProcessPoolExecutor(jobs) if jobs > 1 else None
+    rows = failed = 0
+    try:
+        for chunk, converted in _in_order(executor, func, chunks(reader, chunk_size), index, jobs * AHEAD):
+            for row, values in zip(chunk, converted):
+                rows += 1
+                if isinstance(values, str):
+                    if not failed:
+                        # no errors, no errors file (click opens files for writing lazily)
+                        error_writer.writerow(["row"] + header + ["error"])
+                    failed += 1
+                    error_writer.writerow([rows] + row + [values])
+                else:
+                    writer.writerow(row + values)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return Stats(rows=rows, errors=failed)
@@ -0,0 +1,186 @@
+"""
+Shell completion of location keys and timezone names.
+
+Completions are requested on every keystroke, so only the standard library, the memory-mapped
+indexes (prefix search, see when.index.Table.prefix) and the cached settings are used: neither
+rich, the time string parser nor pydantic are imported. Without cached settings (e.g. after the
+config file has changed) the user locations are read without validation.
+
+Locations (the values of the location options, the location of the time string and the
+arguments of `when-cli overlap`) are even completed before typer and click are imported (see
+complete_shell and when.daemon.run), everything else is completed by typer.
+"""
+import json
+import os
+import re
+import shlex
+from pathlib import Path
+from typing import Iterator
+
+from .config import DEFAULT_LOCATIONS, cached_settings, config_file
+from .index import TableError, locations_index
+
+# candidates per completion, shells struggle with thousands of them
+LIMIT = 100
+
+# location separators in TIME_STRING, see when.when.split_time_string
+SEPARATORS = ("@", " in ", " IN ")
+
+# sub-commands (see when.__main__.COMMANDS) and the options with location values per command
+# ("" is when-cli itself)
+COMMANDS = ("overlap", "convert-file", "filter")
+LOCATION_OPTIONS = {
+    "": ("-l", "--locations"),
+    "overlap": (),
+    "convert-file": ("-l", "--locations", "--from"),
+    "filter": ("-l", "--locations", "--from"),
+}
+WHITESPACE = re.compile(r"\s")
+
+Candidate = tuple[str, str]
+
+
+def _user_locations() -> tuple[list[Candidate], str | None]:
+    """(key, description) of the user locations and the directory."""
+    if (settings := cached_settings()) is not None:
+        return [(loc.key, loc.description) for loc in settings.locations], settings.directory
+
+    # environment first, then the config file, like the settings
+    try:
+        data = json.loads(config_file().read_text())
+    except (OSError, ValueError):
+        data = {}
+    data = data if isinstance(data, dict) else {}
+    env = {k.lower(): v for k, v in os.environ.items() if k.lower().startswith("when_config_")}
+    try:
+        locations = json.loads(env["when_config_locations"]) if "when_config_locations" in env else None
+    except ValueError:
+        locations = None
+    locations = locations or data.get("locations") or DEFAULT_LOCATIONS
+    directory = env.get("when_config_directory") or data.get("directory")
+    return [(loc.get("key", ""), loc.get("description", "")) for loc in locations if isinstance(loc, dict)], directory
+
+
+def _candidates(incomplete: str) -> Iterator[Candidate]:
+    prefix = incomplete.lower()
+    locations, directory = _user_locations()
+    for key, description in locations:
+        if key.lower().startswith(prefix):
+            yield incomplete + key[len(prefix) :], description
+
+    if directory:
+        from .directory import directory_table
+
+        try:
+            table = directory_table(Path(directory).expanduser())
+        except (OSError, ValueError, TableError):
+            table = None
+        for key, (_, description, tz) in table.prefix(prefix) if table else ():
+            yield incomplete + key[len(prefix) :], f"{description} ({tz})" if description else tz
+
+    for key, (kind, description, tz) in locations_index().prefix(prefix):
+        if kind == "tz":
+            # TZ names are case-sensitive
+            yield tz, ""
+        else:
+            yield incomplete + key[len(prefix) :], f"{description} ({tz})"
+
+
+def complete_location(incomplete: str) -> list[Candidate]:
+    """(value, help) of the user locations, the directory, airport codes, cities and TZ names starting with
+    incomplete."""
+    seen: set[str] = set()
+    result = []
+    for value, help_text in _candidates(incomplete):
+        if value.lower() not in seen:
+            seen.add(value.lower())
+            result.append((value, help_text))
+            if len(result) == LIMIT:
+                break
+    return result
+
+
+def complete_time_string(incomplete: str) -> list[Candidate]:
+    """Complete the location of a time string (after 'in' or '@')."""
+    positions = [(incomplete.rfind(sep), sep) for sep in SEPARATORS]
+    pos, sep = max(positions)
+    if pos < 0:
+        return []
+    head, needle = incomplete[: pos + len(sep)], incomplete[pos + len(sep) :]
+    return [(head + value, help_text) for value, help_text in complete_location(needle)]
+
+
+def split_words(text: str) -> list[str]:
+    """Words of a command line like click.parser.split_arg_string, an unclosed quote ends the last word."""
+    lexer = shlex.shlex(text, posix=True)
+    lexer.whitespace_split = True
+    lexer.commenters = ""
+    words = []
+    try:
+        for word in lexer:
+            words.append(word)
+    except ValueError:
+        words.append(lexer.token)
+    return words
+
+
+def _completion_args(env: dict[str, str]) -> tuple[list[str], str] | None:
+    """(arguments before the word, word) to complete, like the typer shell completion classes."""
+    if env["_WHEN_CLI_COMPLETE"] == "complete_bash":
+        words = split_words(env.get("COMP_WORDS", ""))
+        cword = int(env.get("COMP_CWORD", 0))
+        return words[1:cword], words[cword] if cword < len(words) else ""
+    if env["_WHEN_CLI_COMPLETE"] in ("complete_zsh", "complete_fish"):
+        text = env.get("_TYPER_COMPLETE_ARGS", "")
+        args = split_words(text)[1:]
+        if args and not text.endswith(" "):
+            return args[:-1], args[-1]
+        return args, ""
+    return None
+
+
+def _locations(args: list[str], incomplete: str) -> list[Candidate] | None:
+    """Location candidates, None if the word isn't a location (or it can't be told without click)."""
+    command = args[0] if args and args[0] in COMMANDS else ""
+    args = args[1:] if command else args
+    previous = args[-1] if args else ""
+    if previous in LOCATION_OPTIONS[command]:
+        return complete_location(incomplete)
+    # the word is an option or (maybe) the value of one
+    if incomplete.startswith("-") or previous.startswith("-"):
+        return None
+    if command == "overlap":
+        return complete_location(incomplete)
+    if not command and any(sep in incomplete for sep in SEPARATORS):
+        return complete_time_string(incomplete)
+    return None
+
+
+def _zsh_escape(text: str) -> str:
+    return text.replace('"', '""').replace("'", "''").replace("$", "\\$").replace("`", "\\`")
+
+
+def complete_shell(env: dict[str, str]) -> tuple[str | None, int] | None:
+    """(output, exit code) of a completion request of bash, zsh or fish (the output of typer for
+    them), None if typer has to complete it."""
+    if (completion_args := _completion_args(env)) is None:
+        return None
+    if (candidates := _locations(*completion_args)) is None:
+        return None
+
+    shell = env["_WHEN_CLI_COMPLETE"]
+    if shell == "complete_bash":
+        return "\n".join(value for value, _ in candidates), 0
+    if shell == "complete_zsh":
+        if not candidates:
+            return "_files", 0
+        items = [
+            f'"{_zsh_escape(value)}":"{_zsh_escape(help_text)}"' if help_text else f'"{_zsh_escape(value)}"'
+            for value, help_text in candidates
+        ]
+        return "_arguments '*: :((" + "\n".join(items) + "))'", 0
+    # fish: the candidates (get-args) or whether there are any (is-args, without output)
+    if env.get("_TYPER_COMPLETE_FISH_ACTION") == "is-args":
+        return None, 0 if candidates else 1
+    lines = [f"{value}\t{WHITESPACE.sub(' ', help_text)}" if help_text else value for value, help_text in candidates]
+    return "\n".join(lines), 0
@@ -1,26 +1,175 @@
-from typing import List
+"""
+when-cli settings.
 
-from pydantic import BaseSettings
-from tzlocal import get_localzone
+The settings are loaded on first access (get_settings) from the config file and the
+WHEN_CONFIG_* environment variables, the environment wins. The validated result is kept for
+the process (see reset) and cached on disk, keyed by the modification time of the config file
+and the environment, so pydantic is only imported when one of them has changed. The host
+timezone is probed only if a time string without timezone is converted and no default timezone
+is configured.
+"""
+import json
+import os
+from dataclasses import dataclass, field
+from functools import cache
+from pathlib import Path
+from typing import TYPE_CHECKING
 
 from .model import Location
 
+if TYPE_CHECKING:
+    from .index import Table
 
-class Settings(BaseSettings):
-    default_tz: str = str(get_localzone())
-    locations: List[Location] = [
-        Location(key="klu", description="Klagenfurt, Austria", tz="Europe/Vienna"),
-        Location(key="els", description="El Segundo, USA", tz="America/Los_Angeles"),
-        Location(key="sin", description="Singapore", tz="Asia/Singapore"),
-        Location(key="utc", description="Greenwich, UK", tz="UTC"),
-    ]
+# bump on changes of the settings or the cache format
+CACHE_VERSION = 2
 
-    def get(self):
-        """."""
-        return self
+DEFAULT_LOCATIONS = [
+    {"key": "klu", "description": "Klagenfurt, Austria", "tz": "Europe/Vienna"},
+    {"key": "els", "description": "El Segundo, USA", "tz": "America/Los_Angeles"},
+    {"key": "sin", "description": "Singapore", "tz": "Asia/Singapore"},
+    {"key": "utc", "description": "Greenwich, UK", "tz": "UTC"},
+]
 
-    class Config:
-        env_prefix = "when_config_"
 
+class ConfigError(ValueError):
+    """Invalid config file or location directory."""
 
-settings = Settings()
+
+@dataclass(slots=True)
+class Settings:
+    # None: host timezone, see default_tz()
+    default_tz: str | None
+    locations: list[Location]
+    # CSV file with more user locations, see when.directory
+    directory: str | None = None
+    _by_key: dict[str, Location] = field(init=False, repr=False, compare=False)
+    _directory: "Table | None" = field(init=False, repr=False, compare=False, default=None)
+
+    def __post_init__(self):
+        self._by_key = {}
+        for location in self.locations:
+            self._by_key.setdefault(location.key.lower(), location)
+
+    def location(self, key: str) -> Location | None:
+        """User location by key (case-insensitive): the configured locations first, then the directory."""
+        if location := self._by_key.get(key.lower()):
+            return location
+        if self.directory:
+            from .directory import directory_table, lookup
+
+            if self._directory is None:
+                self._directory = directory_table(Path(self.directory).expanduser())
+            return lookup(self._directory, key)
+        return None
+
+    def as_dict(self) -> dict:
+        return {
+            "default_tz": self.default_tz,
+            "locations": [{"key": loc.key, "description": loc.description, "tz": loc.tz.key} for loc in self.locations],
+            "directory": self.directory,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Settings":
+        locations = [Location(**loc) for loc in data["locations"]]
+        return cls(default_tz=data["default_tz"], locations=locations, directory=data["directory"])
+
+
+def _xdg(name: str, fallback: str) -> Path:
+    return Path(os.environ.get(name) or Path.home() / fallback)
+
+
+def config_file() -> Path:
+    """WHEN_CONFIG_FILE or $XDG_CONFIG_HOME/when-cli/config.json."""
+    if path := os.environ.get("WHEN_CONFIG_FILE"):
+        return Path(path)
+    return _xdg("XDG_CONFIG_HOME", ".config") / "when-cli" / "config.json"
+
+
+def cache_dir() -> Path:
+    """WHEN_CACHE_DIR or $XDG_CACHE_HOME/when-cli."""
+    if path := os.environ.get("WHEN_CACHE_DIR"):
+        return Path(path)
+    return _xdg("XDG_CACHE_HOME", ".cache") / "when-cli"
+
+
+def _cache_key(path: Path) -> list:
+    try:
+        stat = path.stat()
+        mtime = [stat.st_mtime_ns, stat.st_size]
+    except OSError:
+        mtime = None
+    env = sorted([k, v] for k, v in os.environ.items() if k.lower().startswith("when_config_"))
+    return [CACHE_VERSION, str(path), mtime, env]
+
+
+def _read_cache(key: list) -> Settings | None:
+    try:
+        data = json.loads((cache_dir() / "settings.json").read_text())
+        if data["key"] == key:
+            return Settings.from_dict(data["settings"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def write_cache_file(path: Path, text: str) -> None:
+    """Replace path atomically, errors (e.g. read-only file system) are ignored, it's just a cache."""
+    import tempfile
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=path.parent, prefix=f".{path.name}.", delete=False) as f:
+            f.write(text)
+        os.replace(f.name, path)
+    except OSError:
+        pass
+
+
+def load_settings(path: Path) -> Settings:
+    """Validate the config file and the environment, see when.loader."""
+    from .loader import load
+
+    return load(path)
+
+
+_settings: Settings | None = None
+
+
+def get_settings() -> Settings:
+    """The settings, loaded once per process or after reset()."""
+    global _settings
+    if _settings is not None:
+        return _settings
+
+    path = config_file()
+    key = _cache_key(path)
+    if (settings := _read_cache(key)) is None:
+        settings = load_settings(path)
+        write_cache_file(cache_dir() / "settings.json", json.dumps({"key": key, "settings": settings.as_dict()}))
+    _settings = settings
+    return settings
+
+
+def cached_settings() -> Settings | None:
+    """The loaded or the cached settings, None if they need to be validated (see get_settings)."""
+    return _settings or _read_cache(_cache_key(config_file()))
+
+
+def reset() -> None:
+    """Load the settings again on the next access, e.g. for the next request of the daemon."""
+    global _settings
+    _settings = None
+
+
+@cache
+def local_tz() -> str:
+    """Host timezone."""
+    from tzlocal import get_localzone
+
+    return str(get_localzone())
+
+
+def default_tz() -> str:
+    """Timezone of time strings without timezone: WHEN_CONFIG_DEFAULT_TZ, config file or the host timezone."""
+    return get_settings().default_tz or local_tz()
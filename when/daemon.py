@@ -0,0 +1,323 @@
+"""
+Optional when-cli daemon.
+
+`when-cli --daemon` keeps the imported libraries, settings and location index warm and serves
+requests on a unix socket. The `when-cli` entry point (`run`) is a thin client: it forwards the
+command line to a running daemon and prints the rendered result, or falls back to in-process
+execution when no daemon is running.
+
+Every request is handled by a child process forked from the warm daemon, so a client which reads
+slowly (e.g. `when-cli ... | less`) doesn't block others, and a command can't leak its environment,
+working directory or settings into the next one. The output is streamed to the client in chunks
+(newline-delimited JSON messages, see Output), large outputs (long ranges) are neither buffered by
+the daemon nor by the client.
+
+Only the standard library may be imported at module level, the client must stay lightweight.
+"""
+import contextlib
+import io
+import json
+import os
+import shutil
+import signal
+import socket
+import stat
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+from when import trace
+
+PROTOCOL = 3
+
+# seconds a client waits for the daemon to accept its request before it falls back to in-process
+# execution, and a connection may take to send its request
+TIMEOUT = 2.0
+
+# characters per output chunk
+CHUNK_SIZE = 65536
+
+# arguments which need the client process itself (stdin, shell detection, the daemon itself)
+LOCAL_ARGS = ("--batch", "--daemon", "--install-completion", "--show-completion")
+# sub-commands which stream files (stdin) and run worker processes
+LOCAL_COMMANDS = ("convert-file", "filter")
+
+# environment of the client which influences the rendering
+TERMINAL_ENV = ("TERM", "COLORTERM", "NO_COLOR", "FORCE_COLOR", "COLUMNS", "LINES")
+
+
+def socket_path() -> Path:
+    """Daemon socket, WHEN_DAEMON_SOCKET, in the (private) runtime directory or in a private directory in /tmp."""
+    if path := os.environ.get("WHEN_DAEMON_SOCKET"):
+        return Path(path)
+    if runtime_dir := os.environ.get("XDG_RUNTIME_DIR"):
+        return Path(runtime_dir) / f"when-cli-{os.getuid()}.sock"
+    return Path(tempfile.gettempdir()) / f"when-cli-{os.getuid()}" / "daemon.sock"
+
+
+def private_dir(path: Path) -> None:
+    """Create the directory of the socket in /tmp (0700), it must not be someone else's."""
+    if path.parent != Path(tempfile.gettempdir()) / f"when-cli-{os.getuid()}":
+        return
+    with contextlib.suppress(FileExistsError):
+        path.parent.mkdir(mode=0o700)
+    info = os.lstat(path.parent)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError(f"{path.parent} is not a private directory of this user")
+
+
+def trusted(path: Path) -> bool:
+    """Only a socket of this user which no one else can access is a daemon of this user."""
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(info.st_mode) and info.st_uid == os.getuid() and not info.st_mode & 0o077
+
+
+def fingerprint(env: dict[str, str]) -> dict[str, str]:
+    """Environment which is evaluated once at daemon start (settings, host timezone, locale)."""
+    return {k: v for k, v in env.items() if k.startswith("WHEN_CONFIG_") or k in ("TZ", "LANG", "LC_ALL", "LC_TIME")}
+
+
+def _send(sock: socket.socket, data: dict) -> None:
+    sock.sendall(json.dumps(data).encode("utf-8"))
+    sock.shutdown(socket.SHUT_WR)
+
+
+def _receive(sock: socket.socket) -> dict:
+    chunks = []
+    while chunk := sock.recv(65536):
+        chunks.append(chunk)
+    return json.loads(b"".join(chunks))
+
+
+def _send_message(sock: socket.socket, data: dict) -> None:
+    sock.sendall(json.dumps(data).encode("utf-8") + b"\n")
+
+
+class Output(io.TextIOBase):
+    """stdout or stderr of a command run by the daemon, sent to the client as {name: text} messages.
+
+    The text is buffered up to CHUNK_SIZE characters or until it is flushed, the response ends with
+    {"status": "ok", "code": exit code}. {"status": "fallback"} instead is only sent before any output.
+    """
+
+    def __init__(self, sock: socket.socket, name: str):
+        self.sock = sock
+        self.name = name
+        self.buffer: list[str] = []
+        self.size = 0
+        self.sent = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self.buffer.append(text)
+        self.size += len(text)
+        if self.size >= CHUNK_SIZE:
+            self.flush()
+        return len(text)
+
+    def flush(self) -> None:
+        if self.buffer:
+            text = "".join(self.buffer)
+            self.buffer, self.size = [], 0
+            self.sent = True
+            _send_message(self.sock, {self.name: text})
+
+
+def forward(argv: list[str], path: Path | None = None) -> int | None:
+    """Let a running daemon handle argv.
+
+    Returns the exit code or None if there is no daemon or argv must be handled in-process.
+    """
+    if not hasattr(socket, "AF_UNIX") or "_WHEN_CLI_COMPLETE" in os.environ:
+        return None
+    if any(arg.split("=")[0] in LOCAL_ARGS for arg in argv) or argv[:1] and argv[0] in LOCAL_COMMANDS:
+        return None
+
+    env = {k: v for k, v in os.environ.items() if k.startswith("WHEN_") or k in TERMINAL_ENV}
+    if sys.stdout.isatty():
+        env.setdefault("COLUMNS", str(shutil.get_terminal_size().columns))
+        if "NO_COLOR" not in env:
+            env.setdefault("FORCE_COLOR", "1")
+    request = {
+        "protocol": PROTOCOL,
+        "argv": argv,
+        "cwd": os.getcwd(),
+        "env": env,
+        "fingerprint": fingerprint(dict(os.environ)),
+    }
+
+    path = path or socket_path()
+    if not trusted(path):
+        return None
+    streams = {"stdout": sys.stdout, "stderr": sys.stderr}
+    output = False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            # a stuck daemon must not block the client
+            sock.settimeout(TIMEOUT)
+            sock.connect(str(path))
+            _send(sock, request)
+            with sock.makefile("rb") as messages:
+                for line in messages:
+                    message = json.loads(line)
+                    if message.get("status") == "accepted":
+                        # the command may take its time
+                        sock.settimeout(None)
+                        continue
+                    if "status" in message:
+                        return message["code"] if message["status"] == "ok" else None
+                    for name, text in message.items():
+                        streams[name].write(text)
+                        streams[name].flush()
+                        output = True
+    except (OSError, ValueError):
+        pass
+    # the daemon has gone away, after output the command can't be repeated
+    return 1 if output else None
+
+
+def execute(argv: list[str], env: dict[str, str], stdout: Output, stderr: Output) -> int:
+    """Run the when-cli command with the environment of the client, the output is sent to the client."""
+    import rich
+
+    from when import config
+    from when.__main__ import dispatch
+
+    saved_env = dict(os.environ)
+    code = 0
+    try:
+        os.environ.clear()
+        os.environ.update({k: v for k, v in saved_env.items() if not k.startswith("WHEN_") and k not in TERMINAL_ENV})
+        os.environ.update(env)
+        rich.reconfigure()
+        config.reset()
+        trace.mark()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            command, args, prog_name = dispatch(argv)
+            command.main(args=args, prog_name=prog_name)
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    finally:
+        os.environ.clear()
+        os.environ.update(saved_env)
+    # unexpected errors discard the buffered output, the client may still fall back
+    stdout.flush()
+    stderr.flush()
+    return code
+
+
+def handle(request: dict, sock: socket.socket) -> None:
+    """Run the request and send its output and the final status message."""
+    if request.get("protocol") != PROTOCOL or request.get("fingerprint") != fingerprint(dict(os.environ)):
+        _send_message(sock, {"status": "fallback"})
+        return
+    _send_message(sock, {"status": "accepted"})
+    cwd = os.getcwd()
+    stdout, stderr = Output(sock, "stdout"), Output(sock, "stderr")
+    try:
+        os.chdir(request["cwd"])
+        code = execute(request["argv"], request["env"], stdout, stderr)
+    except Exception:  # noqa
+        code = None
+    finally:
+        os.chdir(cwd)
+    # after partial output the command can't be repeated by the client
+    if code is None and not (stdout.sent or stderr.sent):
+        _send_message(sock, {"status": "fallback"})
+    else:
+        _send_message(sock, {"status": "ok", "code": 1 if code is None else code})
+
+
+def _serve_connection(conn: socket.socket) -> None:
+    """Receive the request of conn and handle it (in the forked child)."""
+    with conn:
+        conn.settimeout(TIMEOUT)
+        try:
+            request = _receive(conn)
+        except (OSError, ValueError):
+            return
+        # the output is sent at the pace of the client, like to a pipe
+        conn.settimeout(None)
+        with contextlib.suppress(OSError):
+            handle(request, conn)
+
+
+def serve(path: Path | None = None) -> None:
+    """Serve requests until interrupted."""
+    from when.__main__ import command, warm_up
+
+    path = path or socket_path()
+    private_dir(path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        with contextlib.suppress(OSError):
+            sock.connect(str(path))
+            raise RuntimeError(f"daemon already running on {path}")
+    with contextlib.suppress(FileNotFoundError):
+        path.unlink()
+
+    command()
+    warm_up()
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        umask = os.umask(0o177)
+        try:
+            server.bind(str(path))
+        finally:
+            os.umask(umask)
+        server.listen()
+        children: set[int] = set()
+        try:
+            while True:
+                conn, _ = server.accept()
+                if pid := os.fork():
+                    conn.close()
+                    children.add(pid)
+                    # reap the finished children, only our own (e.g. not the ones of a test runner)
+                    children -= {child for child in children if os.waitpid(child, os.WNOHANG)[0]}
+                    continue
+                code = 0
+                try:
+                    server.close()
+                    _serve_connection(conn)
+                except BaseException:  # noqa
+                    code = 1
+                finally:
+                    # the child never returns into the accept loop (or removes the socket)
+                    os._exit(code)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                path.unlink()
+
+
+def run():
+    """when-cli entry point."""
+    if "_WHEN_CLI_COMPLETE" in os.environ:
+        # locations are completed without typer and click
+        from when.completion import complete_shell
+
+        if (completed := complete_shell(dict(os.environ))) is not None:
+            output, code = completed
+            if output is not None:
+                print(output)
+            sys.exit(code)
+    code = forward(sys.argv[1:])
+    if code is None:
+        from when.__main__ import run as run_local
+
+        run_local()
+    else:
+        sys.exit(code)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,107 @@
+"""
+User location directory.
+
+A CSV file with many user-defined locations (people, sites, ...), configured via the
+`directory` setting:
+
+    key,tz,description,aliases
+    alice,Europe/Vienna,Alice Smith (Graz office),asmith;alice.smith
+    hq,America/Los_Angeles,Headquarters,
+
+Only key and tz are required, aliases are separated by semicolons. The file is indexed into a
+table file (see when.index) in the cache directory with lower-case keys and aliases, so a lookup
+is a binary search on the memory-mapped index and does not depend on parsing the directory. The
+index file name is derived from the path (its prefix) and from the modification time and size of
+the directory: a changed directory is indexed again when the settings are loaded the next time,
+and only the older indexes of the same directory are removed.
+"""
+import csv
+import hashlib
+import os
+import zoneinfo
+from pathlib import Path
+
+from .config import ConfigError, cache_dir
+from .index import Table, write_table
+from .model import Location
+
+# key, description, tz
+Entry = tuple[str, str, str]
+
+
+def read_directory(path: Path) -> dict[str, Entry]:
+    """Entries by lower-case key and alias, keys win over aliases and the first one wins.
+
+    Raises ConfigError with the file and line of the first invalid row.
+    """
+    timezones = zoneinfo.available_timezones()
+    entries: dict[str, Entry] = {}
+    aliases: list[tuple[str, Entry]] = []
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        try:
+            if not reader.fieldnames or not {"key", "tz"} <= set(reader.fieldnames):
+                raise ConfigError(f"{path}: key and tz columns are required")
+            for row in reader:
+                key, tz = (row["key"] or "").strip(), (row["tz"] or "").strip()
+                if not key:
+                    continue
+                if tz not in timezones:
+                    raise ConfigError(f"{path}:{reader.line_num}: unknown timezone '{tz}'")
+                entry = (key, (row.get("description") or "").strip(), tz)
+                entries.setdefault(key.lower(), entry)
+                aliases += [(alias.strip().lower(), entry) for alias in (row.get("aliases") or "").split(";")]
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise ConfigError(f"{path}:{reader.line_num + 1}: {e}")
+    for alias, entry in aliases:
+        if alias:
+            entries.setdefault(alias, entry)
+    return entries
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def index_prefix(path: Path) -> str:
+    """File name prefix of the indexes of the directory path."""
+    return f"directory-{_digest(str(path.absolute()))}-"
+
+
+def index_path(path: Path) -> Path:
+    """Index file of the current version of the directory."""
+    stat = path.stat()
+    return cache_dir() / f"{index_prefix(path)}{_digest(f'{stat.st_mtime_ns}:{stat.st_size}')}.idx"
+
+
+def build_index(path: Path, index: Path) -> Table:
+    """Index the directory, older indexes of the same directory are removed."""
+    entries = read_directory(path)
+    index.parent.mkdir(parents=True, exist_ok=True)
+    tmp = index.with_suffix(f".{os.getpid()}.tmp")
+    write_table(tmp, entries)
+    tmp.replace(index)
+    for old in index.parent.glob(f"{index_prefix(path)}*.idx"):
+        if old != index:
+            old.unlink(missing_ok=True)
+    return Table(index)
+
+
+def directory_table(path: Path) -> Table:
+    """Index of the directory, (re)built if the directory has changed.
+
+    Raises ConfigError if the directory can't be read or has invalid rows.
+    """
+    try:
+        index = index_path(path)
+        return Table(index) if index.exists() else build_index(path, index)
+    except OSError as e:
+        raise ConfigError(f"Directory {path}: {e.strerror or e}")
+
+
+def lookup(table: Table, key: str) -> Location | None:
+    """Location of a key or alias (case-insensitive) in the directory index."""
+    if entry := table.get(key.lower()):
+        key, description, tz = entry
+        return Location(key=key, description=description, tz=tz)
+    return None
@@ -0,0 +1,82 @@
+"""
+Compiled cell formatter for the --info-columns and the date, time and tz formats.
+
+Consecutive rows of a zone often share the date and the timezone, so every column remembers
+its last result and calls strftime again only if a value the format depends on has changed.
+"""
+import re
+from datetime import datetime
+from typing import Callable, Hashable, Mapping, Sequence
+
+DEFAULT_FORMATS = {"date": "%x", "time": "%H:%M", "tz": "%Z"}
+
+# strftime directives by the part of the datetime they depend on
+DATE_DIRECTIVES = set("aAbBCdDeFgGhjmuUVwWxyY")
+TIME_DIRECTIVES = set("HIklMpPrRSTfX")
+DIRECTIVE = re.compile(r"%[-_0^#]*(?::)?(.)")
+
+
+def _date(t: datetime) -> Hashable:
+    return t.toordinal()
+
+
+def _offset(t: datetime) -> Hashable:
+    return t.utcoffset()
+
+
+def _name(t: datetime) -> Hashable:
+    return t.tzname()
+
+
+def _constant(t: datetime) -> Hashable:
+    return None
+
+
+def _key(fmt: str) -> Callable[[datetime], Hashable] | None:
+    """The values fmt depends on as a function of the datetime, None if it changes (almost) every row."""
+    directives = {d for d in DIRECTIVE.findall(fmt) if d != "%"}
+    if directives & TIME_DIRECTIVES or directives - DATE_DIRECTIVES - {"z", "Z"}:
+        # time of day, %c, %s, ...
+        return None
+    parts = [_date] if directives & DATE_DIRECTIVES else []
+    parts += [_offset] if "z" in directives else []
+    parts += [_name] if "Z" in directives else []
+    if not parts:
+        return _constant
+    if len(parts) == 1:
+        return parts[0]
+    return lambda t: tuple(part(t) for part in parts)
+
+
+class _Column:
+    __slots__ = ("fmt", "key", "last_key", "last")
+
+    def __init__(self, fmt: str) -> None:
+        self.fmt = fmt
+        self.key = _key(fmt)
+        self.last_key: Hashable = object()
+        self.last = ""
+
+    def __call__(self, t: datetime) -> str:
+        if self.key is None:
+            return t.strftime(self.fmt)
+        key = self.key(t)
+        if key != self.last_key:
+            self.last_key = key
+            self.last = t.strftime(self.fmt)
+        return self.last
+
+
+class Formatter:
+    """Formats the times of one zone, use one formatter per zone (it caches per column)."""
+
+    def __init__(self, columns: Sequence[str], formats: Mapping[str, str] = DEFAULT_FORMATS) -> None:
+        self.columns = [col for col in columns if col in formats]
+        self._columns = [_Column(formats[col]) for col in self.columns]
+
+    def __call__(self, t: datetime) -> list[str]:
+        """The formatted columns of t."""
+        return [column(t) for column in self._columns]
+
+    def text(self, t: datetime) -> str:
+        return " ".join(column(t) for column in self._columns)
@@ -0,0 +1,225 @@
+"""
+Nearest place (and its timezone) of coordinates.
+
+The places (the cities of the geonames dump, see generate_cities.py, or the airports without it, see
+generate_index.py) are stored as a KD-tree of points on the unit sphere in a memory-mapped file:
+
+    header   magic, version, number of zones, number of places, crc32 of the payload
+    points   x, y, z (float32) per place, in KD-tree order
+    places   (offset, length) of the description and the zone number per place
+    zones    (offset, length) per zone
+    strings  utf-8 encoded string pool
+
+The tree is implicit: the node of the places [lo, hi) is the median (lo + hi) // 2, split on
+the axis depth % 3, its children are [lo, mid) and [mid + 1, hi). The straight-line distance
+between points on the unit sphere grows with the great-circle distance, so the nearest point
+is the nearest place, also across the poles and the date line. A lookup visits a few dozen
+nodes and parses nothing upfront.
+"""
+import math
+import mmap
+import re
+import struct
+import tempfile
+import zlib
+from array import array
+from functools import cache
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+from .index import TableError
+
+PLACES_INDEX = Path(__file__).parent / "data" / "places.idx"
+
+MAGIC = b"WHENGEO\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sHHII")
+POINT = struct.Struct("<3f")
+PLACE = struct.Struct("<IHH")
+ZONE = struct.Struct("<IH")
+
+# latitude,longitude in decimal degrees, e.g. 46.62,14.31 or -33.9, 18.4
+COORDINATES = re.compile(r"\s*(?P<lat>[+-]?\d{1,2}(?:\.\d+)?)\s*,\s*(?P<lon>[+-]?\d{1,3}(?:\.\d+)?)\s*")
+
+
+class Place(NamedTuple):
+    lat: float
+    lon: float
+    description: str
+    tz: str
+
+
+def parse_coordinates(text: str) -> tuple[float, float] | None:
+    """(latitude, longitude) of text like 46.62,14.31, None if text isn't a coordinate pair."""
+    if not (m := COORDINATES.fullmatch(text)):
+        return None
+    lat, lon = float(m["lat"]), float(m["lon"])
+    if abs(lat) > 90 or abs(lon) > 180:
+        return None
+    return lat, lon
+
+
+def unit_vector(lat: float, lon: float) -> tuple[float, float, float]:
+    phi, lam = math.radians(lat), math.radians(lon)
+    return math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi)
+
+
+def _select(order: array, coords: array, lo: int, hi: int, k: int, axis: int) -> None:
+    """Partition order[lo:hi] in place: order[k] is the place with the k-th smallest axis coordinate,
+    the places before it are not larger, the ones after it not smaller (Hoare's selection)."""
+    hi -= 1
+    while lo < hi:
+        pivot = coords[3 * order[(lo + hi) // 2] + axis]
+        i, j = lo, hi
+        while i <= j:
+            while coords[3 * order[i] + axis] < pivot:
+                i += 1
+            while coords[3 * order[j] + axis] > pivot:
+                j -= 1
+            if i <= j:
+                order[i], order[j] = order[j], order[i]
+                i, j = i + 1, j - 1
+        if k <= j:
+            hi = j
+        elif k >= i:
+            lo = i
+        else:
+            return
+
+
+def _kd_order(coords: array) -> array:
+    """Place numbers in the implicit KD-tree order, see the module docstring."""
+    order = array("I", range(len(coords) // 3))
+    stack = [(0, len(order), 0)]
+    while stack:
+        lo, hi, depth = stack.pop()
+        if hi - lo < 2:
+            continue
+        mid = (lo + hi) // 2
+        _select(order, coords, lo, hi, mid, depth % 3)
+        stack.append((lo, mid, depth + 1))
+        stack.append((mid + 1, hi, depth + 1))
+    return order
+
+
+def write_places(path: Path, places: Iterable[Place]) -> int:
+    """Write places to a places file and return the number of places.
+
+    The places are streamed: the coordinates are collected in an array (float32, like they are
+    searched), the strings in a temporary file, and the tree is built in place.
+    """
+    coords = array("f")
+    descriptions = array("I")
+    lengths = array("H")
+    zone_ids = array("H")
+    zones: dict[str, int] = {}
+    with tempfile.TemporaryFile() as pool:
+        for place in places:
+            coords.extend(unit_vector(place.lat, place.lon))
+            data = place.description.encode("utf-8")
+            descriptions.append(pool.tell())
+            lengths.append(len(data))
+            pool.write(data)
+            zone_ids.append(zones.setdefault(place.tz, len(zones)))
+        zone_records = []
+        for tz in zones:
+            data = tz.encode("utf-8")
+            zone_records.append(ZONE.pack(pool.tell(), len(data)))
+            pool.write(data)
+
+        order = _kd_order(coords)
+        crc = 0
+        with open(path, "wb") as f:
+
+            def write(data: bytes) -> None:
+                nonlocal crc
+                crc = zlib.crc32(data, crc)
+                f.write(data)
+
+            f.write(HEADER.pack(MAGIC, VERSION, len(zones), len(order), 0))
+            for i in order:
+                write(POINT.pack(coords[3 * i], coords[3 * i + 1], coords[3 * i + 2]))
+            for i in order:
+                write(PLACE.pack(descriptions[i], lengths[i], zone_ids[i]))
+            for record in zone_records:
+                write(record)
+            pool.seek(0)
+            while data := pool.read(65536):
+                write(data)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, len(zones), len(order), crc))
+    return len(order)
+
+
+class Places:
+    """Read-only, memory-mapped places file."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._buf) < HEADER.size:
+            raise TableError(f"{path}: file too short")
+        magic, version, self._zones, self._count, self._crc = HEADER.unpack_from(self._buf)
+        if magic != MAGIC:
+            raise TableError(f"{path}: not a places file")
+        if version != VERSION:
+            raise TableError(f"{path}: unsupported version {version}, expected {VERSION}")
+        points_end = HEADER.size + self._count * POINT.size
+        self._coords = memoryview(self._buf)[HEADER.size : points_end].cast("f")
+        self._places = points_end
+        self._zone_records = self._places + self._count * PLACE.size
+        self._pool = self._zone_records + self._zones * ZONE.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _string(self, offset: int, length: int) -> str:
+        return self._buf[self._pool + offset : self._pool + offset + length].decode("utf-8")
+
+    def place(self, i: int) -> tuple[str, str]:
+        """(description, tz) of the place i (in tree order)."""
+        offset, length, zone = PLACE.unpack_from(self._buf, self._places + i * PLACE.size)
+        tz = self._string(*ZONE.unpack_from(self._buf, self._zone_records + zone * ZONE.size))
+        return self._string(offset, length), tz
+
+    def nearest_index(self, lat: float, lon: float) -> int:
+        """Tree position of the place nearest to (lat, lon), -1 if there are no places."""
+        query = unit_vector(lat, lon)
+        coords = self._coords
+        best = [math.inf, -1]
+
+        def search(lo: int, hi: int, axis: int) -> None:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                base = 3 * mid
+                dx, dy, dz = query[0] - coords[base], query[1] - coords[base + 1], query[2] - coords[base + 2]
+                distance = dx * dx + dy * dy + dz * dz
+                if distance < best[0]:
+                    best[0], best[1] = distance, mid
+                diff = query[axis] - coords[base + axis]
+                near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+                axis = (axis + 1) % 3
+                search(*near, axis)
+                # the other half only if it can be nearer than the best place so far
+                if diff * diff >= best[0]:
+                    return
+                lo, hi = far
+
+        search(0, self._count, 0)
+        return best[1]
+
+    def nearest(self, lat: float, lon: float) -> tuple[str, str] | None:
+        """(description, tz) of the place nearest to (lat, lon)."""
+        i = self.nearest_index(lat, lon)
+        return self.place(i) if i >= 0 else None
+
+    def verify(self) -> bool:
+        """Check the payload against the stored checksum."""
+        return zlib.crc32(self._buf[HEADER.size :]) == self._crc
+
+
+@cache
+def places_index() -> Places:
+    """Places with coordinates (see generate_cities.py)."""
+    return Places(PLACES_INDEX)
@@ -0,0 +1,144 @@
+"""
+Sorted, memory-mapped lookup tables.
+
+A table file maps string keys to a fixed number of string fields:
+
+    header   magic, version, number of fields, number of records, crc32 of the payload
+    records  one fixed size record per key (sorted by key), (offset, length) pairs into the string pool
+    strings  utf-8 encoded, deduplicated string pool
+
+Lookups (and prefix searches) use a binary search directly on the memory-mapped file, nothing is
+parsed or loaded upfront.
+"""
+import mmap
+import struct
+import zlib
+from bisect import bisect_left
+from functools import cache
+from pathlib import Path
+from typing import Iterator, Mapping, Sequence
+
+LOCATIONS_INDEX = Path(__file__).parent / "data" / "locations.idx"
+
+MAGIC = b"WHENIDX\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sHHII")
+
+
+class TableError(ValueError):
+    """Invalid or incompatible table file."""
+
+
+def _record_struct(fields: int) -> struct.Struct:
+    return struct.Struct("<" + "IH" * (fields + 1))
+
+
+def write_table(path: Path, entries: Mapping[str, Sequence[str]]) -> int:
+    """Write entries (key -> fields) to a table file and return the number of records."""
+    fields = len(next(iter(entries.values()), ()))
+    record = _record_struct(fields)
+    records = bytearray()
+    pool = bytearray()
+    offsets: dict[str, tuple[int, int]] = {}
+
+    def add(s: str) -> tuple[int, int]:
+        if s not in offsets:
+            data = s.encode("utf-8")
+            offsets[s] = (len(pool), len(data))
+            pool.extend(data)
+        return offsets[s]
+
+    # str ordering by code point is identical to the utf-8 byte ordering used for lookups
+    for key in sorted(entries):
+        values = entries[key]
+        if len(values) != fields:
+            raise TableError(f"entry '{key}' has {len(values)} fields, expected {fields}")
+        pairs = [add(key)] + [add(v) for v in values]
+        records.extend(record.pack(*[i for pair in pairs for i in pair]))
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, fields, len(entries), zlib.crc32(pool, zlib.crc32(records))))
+        f.write(records)
+        f.write(pool)
+    return len(entries)
+
+
+class _Keys:
+    """Sequence view on the (encoded) keys of a table, used for bisect."""
+
+    def __init__(self, table: "Table") -> None:
+        self.table = table
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __getitem__(self, i: int) -> bytes:
+        return self.table._key(i)
+
+
+class Table:
+    """Read-only, memory-mapped table file."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._buf) < HEADER.size:
+            raise TableError(f"{path}: file too short")
+        magic, version, self.fields, self._count, self._crc = HEADER.unpack_from(self._buf)
+        if magic != MAGIC:
+            raise TableError(f"{path}: not a table file")
+        if version != VERSION:
+            raise TableError(f"{path}: unsupported version {version}, expected {VERSION}")
+        self._record = _record_struct(self.fields)
+        self._pool = HEADER.size + self._count * self._record.size
+        self._keys = _Keys(self)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield self._key(i).decode("utf-8")
+
+    def items(self) -> Iterator[tuple[str, tuple[str, ...]]]:
+        """All (key, fields) in key order."""
+        for i in range(self._count):
+            yield self._key(i).decode("utf-8"), self._fields(i)
+
+    def _key(self, i: int) -> bytes:
+        offset, length = struct.unpack_from("<IH", self._buf, HEADER.size + i * self._record.size)
+        return self._buf[self._pool + offset : self._pool + offset + length]
+
+    def _fields(self, i: int) -> tuple[str, ...]:
+        values = self._record.unpack_from(self._buf, HEADER.size + i * self._record.size)
+        return tuple(
+            self._buf[self._pool + values[j] : self._pool + values[j] + values[j + 1]].decode("utf-8")
+            for j in range(2, len(values), 2)
+        )
+
+    def get(self, key: str) -> tuple[str, ...] | None:
+        """Fields of key or None."""
+        encoded = key.encode("utf-8")
+        i = bisect_left(self._keys, encoded)
+        if i < self._count and self._key(i) == encoded:
+            return self._fields(i)
+        return None
+
+    def prefix(self, prefix: str) -> Iterator[tuple[str, tuple[str, ...]]]:
+        """(key, fields) of all keys starting with prefix, in key order."""
+        encoded = prefix.encode("utf-8")
+        i = bisect_left(self._keys, encoded)
+        while i < self._count and (key := self._key(i)).startswith(encoded):
+            yield key.decode("utf-8"), self._fields(i)
+            i += 1
+
+    def verify(self) -> bool:
+        """Check the payload against the stored checksum."""
+        return zlib.crc32(self._buf[HEADER.size :]) == self._crc
+
+
+@cache
+def locations_index() -> Table:
+    """Airports, cities and timezones index (see generate_index.py)."""
+    return Table(LOCATIONS_INDEX)
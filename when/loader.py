@@ -0,0 +1,58 @@
+"""
+Settings validation, used by when.config on a cache miss only.
+"""
+import json
+import os
+from pathlib import Path
+from typing import List, Optional
+
+from pydantic import BaseSettings, Field, ValidationError
+from pydantic.env_settings import SettingsError
+
+from .config import DEFAULT_LOCATIONS, ConfigError, Settings
+from .model import Location
+
+
+class SettingsModel(BaseSettings):
+    default_tz: Optional[str] = None
+    locations: List[Location] = Field(default_factory=lambda: [Location(**loc) for loc in DEFAULT_LOCATIONS])
+    directory: Optional[str] = None
+
+    class Config:
+        env_prefix = "when_config_"
+
+        @classmethod
+        def customise_sources(cls, init_settings, env_settings, file_secret_settings):
+            # the config file is passed as init arguments, the environment wins
+            return env_settings, init_settings, file_secret_settings
+
+
+def _source(path: Path, field: str) -> str:
+    """The config file or the environment variable of field, the environment wins."""
+    name = f"{SettingsModel.Config.env_prefix}{field}"
+    return next((k for k in os.environ if k.lower() == name), str(path))
+
+
+def load(path: Path) -> Settings:
+    """Settings from the config file (JSON, optional) and the WHEN_CONFIG_* environment variables.
+
+    Raises ConfigError with the file (or environment variable) and the field of the first error.
+    """
+    try:
+        data = json.loads(path.read_text())
+    except FileNotFoundError:
+        data = {}
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"{path}: {e}")
+    if not isinstance(data, dict):
+        raise ConfigError(f"{path}: expected an object with default_tz and locations")
+    try:
+        model = SettingsModel(**data)
+    except SettingsError as e:
+        raise ConfigError(str(e))
+    except ValidationError as e:
+        first, *rest = e.errors()
+        field = ".".join(str(part) for part in first["loc"])
+        more = f" (and {len(rest)} more)" if rest else ""
+        raise ConfigError(f"{_source(path, str(first['loc'][0]))}: {field}: {first['msg']}{more}")
+    return Settings(default_tz=model.default_tz, locations=model.locations, directory=model.directory)
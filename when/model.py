@@ -1,24 +1,56 @@
 import zoneinfo
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator
 
-from pydantic import BaseModel, validator
 
-
-class Location(BaseModel):
+@dataclass(slots=True)
+class Location:
     key: str
     description: str
-    tz: str
+    tz: zoneinfo.ZoneInfo
+
+    def __post_init__(self):
+        if not isinstance(self.tz, zoneinfo.ZoneInfo):
+            try:
+                self.tz = zoneinfo.ZoneInfo(self.tz)
+            except Exception:  # noqa
+                raise ValueError(f"Unknown timezone '{self.tz}'")
 
-    @validator("tz")
-    def tz_as_zoneinfo(cls, v):
-        try:
-            return zoneinfo.ZoneInfo(v)
-        except:  # noqa
-            raise ValueError(f"Unknown timezone '{v}'")
+    @classmethod
+    def __get_validators__(cls):
+        # locations in the pydantic settings (e.g. WHEN_CONFIG_LOCATIONS)
+        yield cls.validate
 
+    @classmethod
+    def validate(cls, v):
+        if isinstance(v, cls):
+            return v
+        if not isinstance(v, dict):
+            raise TypeError("location must be a mapping with key, description and tz")
+        return cls(**v)
 
-class Zone(BaseModel):
-    name: str = ""
-    description: str = ""
+
+@dataclass(slots=True)
+class Zone:
+    name: str
+    description: str
     tz: str
+    # UTC offset (seconds) of the first time
     offset: int
-    times: list[str]
+    # iterators if converted lazily (see when.when.to_zones), they can be consumed once only
+    times: list[datetime] | Iterator[datetime]
+    # UTC offset (seconds) of every time
+    offsets: list[int] | Iterator[int]
+
+
+@dataclass(slots=True)
+class Slot:
+    """Time slot [start, end) in UTC."""
+
+    start: datetime
+    end: datetime
+
+    @property
+    def duration(self) -> int:
+        return int((self.end - self.start).total_seconds())
@@ -0,0 +1,142 @@
+"""
+Machine-readable output of converted times.
+
+The rows are written straight to a text stream while they are generated, rich is never imported.
+Times are ISO 8601 strings, except for the plain format which formats them like the table cells.
+The UTC offset of an ISO time is the per row offset of the zone (see Zone.offsets), so the tz
+database is not consulted again.
+"""
+import csv
+import json
+from datetime import datetime
+from functools import cache
+from typing import Iterable, Iterator, Mapping, Sequence, TextIO
+
+from .formatter import DEFAULT_FORMATS, Formatter
+from .model import Slot, Zone
+
+FORMATS = ("json", "jsonl", "csv", "tsv", "plain")
+
+Rows = Iterable[tuple[datetime, ...]]
+Offsets = Iterable[tuple[int, ...]] | None
+
+
+def labels(zones: list[Zone]) -> list[str]:
+    """Unique column label per zone: the location key or the timezone name."""
+    result: list[str] = []
+    for zone in zones:
+        label = zone.name or zone.tz
+        n = 1
+        while label in result:
+            n += 1
+            label = f"{zone.name or zone.tz}-{n}"
+        result.append(label)
+    return result
+
+
+@cache
+def utc_offset_text(seconds: int) -> str:
+    """ISO 8601 UTC offset like datetime.isoformat(): +HH:MM[:SS]."""
+    sign = "-" if seconds < 0 else "+"
+    hours, rest = divmod(abs(seconds), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{sign}{hours:02d}:{minutes:02d}" + (f":{seconds:02d}" if seconds else "")
+
+
+def iso_rows(rows: Rows, offsets: Offsets = None) -> Iterator[list[str]]:
+    """The times of rows as ISO 8601 strings, the UTC offsets are taken from offsets (rows in lockstep) if given."""
+    if offsets is None:
+        return ([t.isoformat() for t in row] for row in rows)
+    return (
+        [t.replace(tzinfo=None).isoformat() + utc_offset_text(o) for t, o in zip(row, row_offsets)]
+        for row, row_offsets in zip(rows, offsets)
+    )
+
+
+def write_json(zones: list[Zone], rows: Rows, stream: TextIO, offsets: Offsets = None) -> None:
+    """One JSON document with the zones and all rows."""
+    meta = [
+        {"label": label, "name": zone.name, "description": zone.description, "tz": zone.tz, "offset": zone.offset}
+        for label, zone in zip(labels(zones), zones)
+    ]
+    stream.write('{"zones": ' + json.dumps(meta) + ', "rows": [')
+    sep = "\n"
+    for row in iso_rows(rows, offsets):
+        stream.write(sep + json.dumps(row))
+        sep = ",\n"
+    stream.write("\n]}\n")
+
+
+def write_jsonl(zones: list[Zone], rows: Rows, stream: TextIO, offsets: Offsets = None) -> None:
+    """One JSON object (label -> time) per row."""
+    keys = labels(zones)
+    for row in iso_rows(rows, offsets):
+        stream.write(json.dumps(dict(zip(keys, row))) + "\n")
+
+
+def write_csv(zones: list[Zone], rows: Rows, stream: TextIO, delimiter: str = ",", offsets: Offsets = None) -> None:
+    """Header with the labels and one line per row."""
+    writer = csv.writer(stream, delimiter=delimiter, lineterminator="\n")
+    writer.writerow(labels(zones))
+    writer.writerows(iso_rows(rows, offsets))
+
+
+def write_plain(
+    zones: list[Zone],
+    rows: Rows,
+    stream: TextIO,
+    columns: Sequence[str],
+    formats: Mapping[str, str],
+) -> None:
+    """One line per row, the times formatted like the table cells and separated by tabs, no header."""
+    formatters = [Formatter(columns, formats) for _ in zones]
+    for row in rows:
+        stream.write("\t".join(formatter.text(t) for formatter, t in zip(formatters, row)) + "\n")
+
+
+def write(
+    output: str,
+    zones: list[Zone],
+    rows: Rows,
+    stream: TextIO,
+    columns: Sequence[str] = ("date", "time", "tz"),
+    formats: Mapping[str, str] = DEFAULT_FORMATS,
+    offsets: Offsets = None,
+) -> None:
+    """Write rows in the output format (see FORMATS).
+
+    columns and formats are used by the plain format, offsets (see when.offset_rows) by the ISO formats.
+    """
+    if output == "json":
+        write_json(zones, rows, stream, offsets=offsets)
+    elif output == "jsonl":
+        write_jsonl(zones, rows, stream, offsets=offsets)
+    elif output == "csv":
+        write_csv(zones, rows, stream, offsets=offsets)
+    elif output == "tsv":
+        write_csv(zones, rows, stream, delimiter="\t", offsets=offsets)
+    elif output == "plain":
+        write_plain(zones, rows, stream, columns, formats)
+    else:
+        raise ValueError(f"Unknown output format '{output}'")
+
+
+def write_slots(output: str, slots: Iterable[Slot], stream: TextIO) -> None:
+    """Slots (UTC ISO 8601 start and end, duration in minutes) in the output format (see FORMATS)."""
+    header = ["start", "end", "minutes"]
+    rows = ([slot.start.isoformat(), slot.end.isoformat(), slot.duration // 60] for slot in slots)
+    if output == "json":
+        json.dump([dict(zip(header, row)) for row in rows], stream)
+        stream.write("\n")
+    elif output == "jsonl":
+        for row in rows:
+            stream.write(json.dumps(dict(zip(header, row))) + "\n")
+    elif output in ("csv", "tsv"):
+        writer = csv.writer(stream, delimiter="," if output == "csv" else "\t", lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(rows)
+    elif output == "plain":
+        for row in rows:
+            stream.write("\t".join(str(v) for v in row) + "\n")
+    else:
+        raise ValueError(f"Unknown output format '{output}'")
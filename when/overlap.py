@@ -0,0 +1,99 @@
+"""
+Common working hours of many locations.
+
+The working hours of every location are converted into UTC intervals, one per local working day,
+and the sorted interval lists are intersected pairwise. The cost grows with the number of
+locations and days, not with the number of hours in the date range. DST changes are handled by
+converting every working day on its own.
+"""
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, Sequence
+from zoneinfo import ZoneInfo
+
+from .model import Location, Slot
+
+HOURS = re.compile(r"(?P<start>\d{1,2}(?::\d{2})?)\s*-\s*(?P<end>\d{1,2}(?::\d{2})?)")
+DEFAULT_HOURS = "09:00-17:00"
+
+# working hours: minutes since local midnight, end may be on the next day
+Hours = tuple[int, int]
+Interval = tuple[int, int]
+
+
+def _minutes(value: str) -> int:
+    hour, _, minute = value.partition(":")
+    minutes = int(hour) * 60 + int(minute or 0)
+    if int(minute or 0) > 59 or minutes > 24 * 60:
+        raise ValueError(f"Invalid time '{value}'")
+    return minutes
+
+
+def parse_hours(text: str) -> Hours:
+    """Working hours like 09:00-17:00 or 22-6 (ends on the next day)."""
+    m = HOURS.fullmatch(text.strip())
+    if not m:
+        raise ValueError(f"Invalid working hours '{text}', use e.g. 09:00-17:00")
+    start, end = _minutes(m["start"]), _minutes(m["end"])
+    if start == end or start >= 24 * 60:
+        raise ValueError(f"Invalid working hours '{text}'")
+    return start, end if end > start else end + 24 * 60
+
+
+def _epoch(day: date, minutes: int, tz: ZoneInfo) -> int:
+    """Wall time minutes after midnight of day in tz as UTC epoch seconds."""
+    day += timedelta(days=minutes // (24 * 60))
+    minutes %= 24 * 60
+    return int(datetime.combine(day, time(minutes // 60, minutes % 60), tzinfo=tz).timestamp())
+
+
+def working_intervals(tz: ZoneInfo, hours: Hours, first: date, last: date, weekends: bool = False) -> list[Interval]:
+    """UTC intervals [start, end) of the working hours on every local day from first to last (inclusive)."""
+    intervals = []
+    day = first
+    while day <= last:
+        if weekends or day.weekday() < 5:
+            start, end = _epoch(day, hours[0], tz), _epoch(day, hours[1], tz)
+            if start < end:
+                intervals.append((start, end))
+        day += timedelta(days=1)
+    return intervals
+
+
+def intersect(a: Sequence[Interval], b: Sequence[Interval]) -> list[Interval]:
+    """Intersection of two sorted lists of disjoint intervals."""
+    result = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start, end = max(a[i][0], b[j][0]), min(a[i][1], b[j][1])
+        if start < end:
+            result.append((start, end))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def overlap(
+    locations: Iterable[tuple[Location, Hours]],
+    first: date,
+    last: date,
+    weekends: bool = False,
+    min_duration: int = 0,
+) -> list[Slot]:
+    """Slots within the working hours of all locations (local days first to last, inclusive).
+
+    min_duration (seconds) drops shorter slots.
+    """
+    common: list[Interval] | None = None
+    for location, hours in locations:
+        intervals = working_intervals(location.tz, hours, first, last, weekends=weekends)
+        common = intervals if common is None else intersect(common, intervals)
+        if not common:
+            return []
+    return [
+        Slot(start=datetime.fromtimestamp(start, timezone.utc), end=datetime.fromtimestamp(end, timezone.utc))
+        for start, end in common or []
+        if end - start >= max(min_duration, 1)
+    ]
@@ -0,0 +1,137 @@
+"""
+Date/time parser for the documented TIME_STRING syntax.
+
+    [DATE] TIME  or  TIME [DATE]
+
+The documented forms (see SHORT_USAGE) are parsed with a few precompiled regular expressions.
+Everything else is handed over to dateutil, which is much slower and imported only if needed.
+"""
+import re
+from datetime import date, datetime
+
+# which parser was used
+FAST = "fast"
+DATEUTIL = "dateutil"
+
+MONTHS = {
+    name: i
+    for i, names in enumerate(
+        [
+            ("january", "jan", "januar", "jänner", "jän"),
+            ("february", "feb", "februar"),
+            ("march", "mar", "märz", "maerz", "mär", "mrz"),
+            ("april", "apr"),
+            ("may", "mai"),
+            ("june", "jun", "juni"),
+            ("july", "jul", "juli"),
+            ("august", "aug"),
+            ("september", "sep", "sept"),
+            ("october", "oct", "oktober", "okt"),
+            ("november", "nov"),
+            ("december", "dec", "dezember", "dez"),
+        ],
+        start=1,
+    )
+    for name in names
+}
+
+# HH:MM[:SS] [am|pm] or HH am|pm
+TIME = re.compile(
+    r"(?<![\w.:/-])(?P<hour>\d{1,2})(?:(?::(?P<minute>\d{1,2})(?::(?P<second>\d{1,2}))?)\s*(?P<ampm>[ap]\.?m\.?)?"
+    r"|\s*(?P<ampm_only>[ap]\.?m\.?))(?![\w:])",
+    re.IGNORECASE,
+)
+
+# range steps: 30s, 15m, 1h, 1d
+STEP = re.compile(r"(?P<count>\d+)\s*(?P<unit>[smhd])", re.IGNORECASE)
+STEP_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+DAY = r"(?P<day>\d{1,2})(?:\.|st|nd|rd|th)?"
+MONTH = r"(?P<month>[^\W\d_]+)\.?"
+YEAR = r"(?P<year>\d{4})"
+
+DATES = [
+    # 2021-09-30, 2021.09.30, 2021/09/30
+    re.compile(r"(?P<year>\d{4})([-./])(?P<month_num>\d{1,2})\2(?P<day>\d{1,2})"),
+    # 30.09.1979, 30.09.79, 30.09.
+    re.compile(r"(?P<day>\d{1,2})\.(?P<month_num>\d{1,2})\.(?P<year>\d{4}|\d{2})?"),
+    # 30. September [1979], 30th Sep [1979], 30 of September
+    re.compile(DAY + r"\s*(?:of\s+)?" + MONTH + r",?(?:\s+" + YEAR + ")?", re.IGNORECASE),
+    # September 30th[,] [1979]
+    re.compile(MONTH + r"\s*" + DAY + r",?(?:\s+" + YEAR + ")?", re.IGNORECASE),
+    # 1979 September 30th
+    re.compile(YEAR + r"\s+" + MONTH + r"\s*" + DAY, re.IGNORECASE),
+]
+
+
+def _year(value: str | None, today: date) -> int:
+    """Year incl. 2-digit years within +/- 50 years of today (like dateutil)."""
+    if not value:
+        return today.year
+    year = int(value)
+    if len(value) > 2:
+        return year
+    year += today.year // 100 * 100
+    if year >= today.year + 50:
+        year -= 100
+    elif year < today.year - 50:
+        year += 100
+    return year
+
+
+def _date(text: str, today: date) -> date | None:
+    if not text:
+        return today
+    for pattern in DATES:
+        if m := pattern.fullmatch(text):
+            groups = m.groupdict()
+            if groups.get("month_num"):
+                month = int(groups["month_num"])
+            elif not (month := MONTHS.get(groups["month"].lower(), 0)):
+                return None
+            try:
+                return date(_year(groups["year"], today), month, int(groups["day"]))
+            except ValueError:
+                return None
+    return None
+
+
+def parse_fast(text: str, today: date | None = None) -> datetime | None:
+    """Parse the documented DATE/TIME forms into a naive datetime, None if text isn't one of them."""
+    today = today or date.today()
+    hour = minute = second = 0
+    if m := TIME.search(text):
+        hour = int(m["hour"])
+        minute = int(m["minute"] or 0)
+        second = int(m["second"] or 0)
+        if ampm := (m["ampm"] or m["ampm_only"]):
+            if not 1 <= hour <= 12:
+                return None
+            hour = hour % 12 + (12 if ampm[0].lower() == "p" else 0)
+        text = text[: m.start()] + " " + text[m.end() :]
+    elif not text.strip():
+        return None
+
+    day = _date(" ".join(text.split()), today)
+    if day is None or hour > 23 or minute > 59 or second > 59:
+        return None
+    return datetime(day.year, day.month, day.day, hour, minute, second)
+
+
+def parse(text: str, today: date | None = None) -> tuple[datetime, str]:
+    """Parse text into a naive datetime. Returns the datetime and the parser used (FAST or DATEUTIL)."""
+    if (value := parse_fast(text, today)) is not None:
+        return value, FAST
+
+    from dateutil.parser import parse as dateutil_parse
+
+    default = datetime.combine(today or date.today(), datetime.min.time())
+    return dateutil_parse(text, default=default, ignoretz=True), DATEUTIL
+
+
+def parse_step(text: str) -> int:
+    """Range step (e.g. 15m, 1h, 1d) in seconds."""
+    m = STEP.fullmatch(text.strip())
+    if not m or not int(m["count"]):
+        raise ValueError(f"Invalid step '{text}', use e.g. 15m, 1h or 1d")
+    return int(m["count"]) * STEP_UNITS[m["unit"].lower()]
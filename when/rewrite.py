@@ -0,0 +1,211 @@
+"""
+Timestamp rewriting of log lines, see `when-cli filter`.
+
+Timestamps are found with one precompiled regular expression with the named groups year,
+month, day, hour, minute and second (optional: sep, fraction and offset). The fields are
+converted with int() and a few cached lookups, neither strptime nor the time string parser
+is used:
+
+* the UTC offsets come from the current transition window of a zone (see when.transitions),
+  a new window is looked up only if a timestamp is outside of it, local timestamps without
+  UTC offset are converted the same way,
+* a timestamp is converted once per distinct second (dates once per distinct day), only the
+  fraction of a second is added per match.
+
+The input is read in chunks of what is available (read1), the complete lines of a chunk are
+written and flushed together: behind `tail -f` every line is written as soon as it arrives,
+for files and pipes the writes are batched.
+"""
+import re
+from datetime import date, datetime
+from functools import cache
+from typing import BinaryIO, Iterator
+from zoneinfo import ZoneInfo
+
+from .output import utc_offset_text
+from .parser import MONTHS
+from .transitions import DAY, transitions
+
+DEFAULT_PATTERN = (
+    r"(?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2})(?P<sep>[T ])(?P<hour>\d{2}):(?P<minute>\d{2}):(?P<second>\d{2})"
+    r"(?P<fraction>[.,]\d+)?(?P<offset>Z|[+-]\d{2}:?\d{2})?"
+)
+REQUIRED_GROUPS = ("year", "month", "day", "hour", "minute", "second")
+OPTIONAL_GROUPS = ("sep", "fraction", "offset")
+# all but the fraction of a second
+KEY_GROUPS = REQUIRED_GROUPS + ("sep", "offset")
+MISSING = object()
+DIGITS = [f"{i:02}" for i in range(60)]
+OFFSET = re.compile(r"(?P<sign>[+-])(?P<hours>\d{2}):?(?P<minutes>\d{2})")
+
+CHUNK_SIZE = 65536
+# entries of the per timestamp and per day caches, they are cleared when full
+CACHE_SIZE = 65536
+
+MIN, MAX = -(2**63), 2**63
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+@cache
+def offset_seconds(text: str) -> int:
+    """UTC offset like Z, +02:00 or -0700 in seconds."""
+    if m := OFFSET.fullmatch(text):
+        seconds = int(m["hours"]) * 3600 + int(m["minutes"]) * 60
+        return -seconds if m["sign"] == "-" else seconds
+    return 0
+
+
+class ZoneWindow:
+    """UTC offsets of a zone, one transition window is cached for UTC instants and one for local times."""
+
+    def __init__(self, tz: ZoneInfo):
+        self.tz = tz
+        self.transitions = transitions(tz)
+        # UTC instants [start, end) and local times [local_start, local_end) with offset
+        self.start = self.end = self.local_start = self.local_end = 0
+        self.offset = self.local_offset = 0
+
+    def utcoffset(self, instant: int) -> int:
+        """UTC offset of a UTC instant."""
+        if not self.start <= instant < self.end:
+            window = self.transitions.window(instant)
+            self.start = MIN if window.start is None else window.start
+            self.end = MAX if window.end is None else window.end
+            self.offset = window.period.offset
+        return self.offset
+
+    def to_utc(self, local: int) -> int:
+        """UTC instant of local seconds since the epoch, like zoneinfo (fold=0) for skipped and repeated times."""
+        if self.local_start <= local < self.local_end:
+            return local - self.local_offset
+
+        days, seconds = divmod(local, DAY)
+        naive = datetime.fromordinal(days + EPOCH_ORDINAL).replace(
+            hour=seconds // 3600, minute=seconds // 60 % 60, second=seconds % 60, tzinfo=self.tz
+        )
+        instant = local - int(naive.utcoffset().total_seconds())  # type: ignore[union-attr]
+        window = self.transitions.window(instant)
+        offset = window.period.offset
+        if local - offset == instant:
+            # not skipped, local times repeated at the start of the window belong to the previous one
+            start = MIN if window.start is None else max(window.start, window.fold_end or window.start)
+            self.local_start = start + offset
+            self.local_end = MAX if window.end is None else window.end + offset
+            self.local_offset = offset
+        return instant
+
+
+class Rewriter:
+    """Rewrite (or annotate) the timestamps of text into the local times of targets (label, timezone).
+
+    Timestamps without UTC offset are local times of source.
+    """
+
+    def __init__(
+        self, source: ZoneInfo, targets: list[tuple[str, ZoneInfo]], pattern: str = DEFAULT_PATTERN, annotate=False
+    ):
+        try:
+            compiled = re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Invalid pattern '{pattern}': {e}")
+        if missing := [group for group in REQUIRED_GROUPS if group not in compiled.groupindex]:
+            raise ValueError(f"Pattern '{pattern}' has no group(s) {', '.join(missing)}")
+        if not targets:
+            raise ValueError("No target location")
+        if not annotate and len(targets) > 1:
+            raise ValueError("Timestamps can be rewritten into one location only, annotate them for more")
+        # empty optional groups, so every match has all groups
+        empty = "".join(f"(?P<{group}>)" for group in OPTIONAL_GROUPS if group not in compiled.groupindex)
+        self.pattern = re.compile(f"(?:{pattern}){empty}") if empty else compiled
+        self.source = ZoneWindow(source)
+        self.targets = [(label, ZoneWindow(tz)) for label, tz in targets]
+        self.annotate = annotate
+        # date fields -> days since the epoch -> ISO date, timestamp fields -> (head, tail) per target (None: invalid)
+        self._days: dict[tuple[str, str, str], int] = {}
+        self._dates: dict[int, str] = {}
+        self._converted: dict[tuple[str | None, ...], list[tuple[str, str]] | None] = {}
+
+    def __call__(self, text: str) -> str:
+        return self.pattern.sub(self._replace, text)
+
+    def _epoch_day(self, year: str, month: str, day: str) -> int:
+        if len(self._days) >= CACHE_SIZE:
+            self._days.clear()
+        month_number = int(month) if month.isdigit() else MONTHS[month.lower()]
+        days = self._days[year, month, day] = date(int(year), month_number, int(day)).toordinal() - EPOCH_ORDINAL
+        return days
+
+    def _date(self, days: int) -> str:
+        if len(self._dates) >= CACHE_SIZE:
+            self._dates.clear()
+        text = self._dates[days] = date.fromordinal(days + EPOCH_ORDINAL).isoformat()
+        return text
+
+    def _convert(self, fields: tuple[str, ...]) -> list[tuple[str, str]] | None:
+        """Local time in every target zone (before and after the fraction of a second) of the timestamp fields."""
+        year, month, day, hour, minute, second, sep, offset = fields
+        try:
+            days = self._days.get((year, month, day))
+            if days is None:
+                days = self._epoch_day(year, month, day)
+            h, m, s = int(hour), int(minute), int(second)
+        except (ValueError, KeyError):
+            # not a date, e.g. month 13
+            return None
+        if h > 23 or m > 59 or s > 59:
+            return None
+
+        local = days * DAY + h * 3600 + m * 60 + s
+        instant = local - offset_seconds(offset) if offset else self.source.to_utc(local)
+        converted = []
+        for _, zone in self.targets:
+            utc_offset = zone.utcoffset(instant)
+            days, seconds = divmod(instant + utc_offset, DAY)
+            text = self._dates.get(days) or self._date(days)
+            h, m = divmod(seconds // 60, 60)
+            converted.append(
+                (f"{text}{sep or 'T'}{DIGITS[h]}:{DIGITS[m]}:{DIGITS[seconds % 60]}", utc_offset_text(utc_offset))
+            )
+        return converted
+
+    def _replace(self, m: re.Match) -> str:
+        # timestamps are converted once per second
+        fields = m.group(*KEY_GROUPS)
+        converted = self._converted.get(fields, MISSING)
+        if converted is MISSING:
+            if len(self._converted) >= CACHE_SIZE:
+                self._converted.clear()
+            converted = self._converted[fields] = self._convert(fields)
+        if converted is None:
+            return m[0]
+
+        fraction = m["fraction"] or ""
+        if self.annotate:
+            annotations = [
+                f"{label} {head}{fraction}{tail}" for (label, _), (head, tail) in zip(self.targets, converted)
+            ]
+            return f"{m[0]} [{', '.join(annotations)}]"
+        head, tail = converted[0]
+        return head + fraction + tail
+
+
+def chunks(stream: BinaryIO, size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Complete lines of stream, as many as are available at once (the last one may miss its line break)."""
+    rest = b""
+    while data := stream.read1(size):  # type: ignore[attr-defined]
+        data = rest + data
+        end = data.rfind(b"\n") + 1
+        rest = data[end:]
+        if end:
+            yield data[:end]
+    if rest:
+        yield rest
+
+
+def rewrite_stream(rewriter: Rewriter, input: BinaryIO, output: BinaryIO) -> None:
+    """Rewrite the lines of input, every chunk of lines is flushed (see chunks)."""
+    for chunk in chunks(input):
+        # bytes which are not UTF-8 are passed through unchanged
+        text = rewriter(chunk.decode("utf-8", "surrogateescape"))
+        output.write(text.encode("utf-8", "surrogateescape"))
+        output.flush()
@@ -0,0 +1,125 @@
+"""
+Phase timings and profiling.
+
+`when-cli --timings` (or WHEN_TRACE=1) reports the wall time and the allocated memory blocks
+of every phase (startup, settings, imports, locations, parse, convert, render) to stderr as one
+JSON object, `--profile FILE` dumps a cProfile file. Phases may nest and repeat: `ms` is the
+total time of a phase, `self_ms` the time without nested phases, `blocks` the change of
+sys.getallocatedblocks().
+
+When tracing is off, phase() returns a shared no-op context manager and iterate() the
+iterable itself. Only the standard library may be imported here.
+"""
+import contextlib
+import json
+import sys
+import time
+from typing import ContextManager, Iterable, Iterator, TextIO, TypeVar
+
+T = TypeVar("T")
+
+_NULL: ContextManager = contextlib.nullcontext()
+
+# process start (import of this module), see startup phase
+_start = time.perf_counter()
+# name -> [calls, seconds, self seconds, blocks], None when tracing is off
+_totals: dict[str, list] | None = None
+# seconds of the nested phases of the running phases
+_nested: list[float] = []
+_profiler = None
+_profile_path: str | None = None
+
+
+def enabled() -> bool:
+    return _totals is not None
+
+
+def mark() -> None:
+    """Start of the startup phase, e.g. a new request of the daemon."""
+    global _start
+    _start = time.perf_counter()
+
+
+def start(timings: bool = True, profile: str | None = None) -> None:
+    """Enable the phase timings and/or the profiler, the time since mark() is the startup phase."""
+    global _totals, _profiler, _profile_path
+    if timings:
+        _totals = {}
+        _nested.clear()
+        _add("startup", time.perf_counter() - _start, 0.0, 0)
+    if profile:
+        import cProfile
+
+        _profile_path = profile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def stop(stream: TextIO | None = None) -> None:
+    """Write the report (stderr by default) and the profile, disable tracing."""
+    global _totals, _profiler, _profile_path
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_profile_path)
+        _profiler = _profile_path = None
+    if _totals is not None:
+        (stream or sys.stderr).write(json.dumps(report()) + "\n")
+        _totals = None
+
+
+def report() -> dict:
+    phases = {
+        name: {"calls": calls, "ms": round(seconds * 1000, 3), "self_ms": round(own * 1000, 3), "blocks": blocks}
+        for name, (calls, seconds, own, blocks) in (_totals or {}).items()
+    }
+    return {"total_ms": round((time.perf_counter() - _start) * 1000, 3), "phases": phases}
+
+
+def _add(name: str, seconds: float, nested: float, blocks: int) -> None:
+    totals = _totals.setdefault(name, [0, 0.0, 0.0, 0])  # type: ignore[union-attr]
+    totals[0] += 1
+    totals[1] += seconds
+    totals[2] += seconds - nested
+    totals[3] += blocks
+
+
+@contextlib.contextmanager
+def _phase(name: str) -> Iterator[None]:
+    # reported in the order the phases are started first
+    _totals.setdefault(name, [0, 0.0, 0.0, 0])  # type: ignore[union-attr]
+    blocks = sys.getallocatedblocks()
+    _nested.append(0.0)
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - begin
+        nested = _nested.pop()
+        if _nested:
+            _nested[-1] += seconds
+        if _totals is not None:
+            _add(name, seconds, nested, sys.getallocatedblocks() - blocks)
+
+
+def phase(name: str) -> ContextManager:
+    """Time the with block as phase name."""
+    if _totals is None:
+        return _NULL
+    return _phase(name)
+
+
+def iterate(name: str, iterable: Iterable[T]) -> Iterable[T]:
+    """Time the generation of every item as phase name, e.g. times which are converted while they are rendered."""
+    if _totals is None:
+        return iterable
+    return _iterate(name, iter(iterable))
+
+
+def _iterate(name: str, iterator: Iterator[T]) -> Iterator[T]:
+    while True:
+        with _phase(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
@@ -0,0 +1,317 @@
+"""
+UTC offsets from the transition tables of the tz database.
+
+The TZif file of a zone is read once. A UTC instant is mapped to its local time by a
+binary search in the sorted transition times; all instants between two transitions share
+the same offset, so a run of instants is converted with a single lookup. Instants after the
+last transition in the file follow the POSIX TZ rule of the file footer.
+
+The results are identical to `datetime.fromtimestamp(t, ZoneInfo(key))`, including `fold`.
+"""
+import calendar
+import os
+import re
+import struct
+import zoneinfo
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from functools import cache
+from importlib import resources
+from itertools import accumulate, chain, repeat
+from typing import Iterable, Iterator, NamedTuple, Sequence
+from zoneinfo import ZoneInfo
+
+EPOCH = datetime(1970, 1, 1)
+DAY = 86400
+
+HEADER = struct.Struct(">4sc15x6l")
+TZ_STRING = re.compile(
+    r"(?P<std>[^<0-9:.+-]+|<[a-zA-Z0-9+-]+>)(?P<std_offset>[+-]?\d{1,3}(?::\d{2}(?::\d{2})?)?)"
+    r"(?:(?P<dst>[^0-9:.+-]+|<[a-zA-Z0-9+-]+>)(?P<dst_offset>[+-]?\d{1,3}(?::\d{2}(?::\d{2})?)?)?"
+    r",(?P<start>[^,]+),(?P<end>[^,]+))?",
+    re.ASCII,
+)
+RULE_DATE = re.compile(
+    r"(?:J(?P<julian>\d{1,3})|(?P<day>\d{1,3})|M(?P<month>\d{1,2})\.(?P<week>[1-5])\.(?P<weekday>[0-6]))"
+    r"(?:/(?P<time>[+-]?\d{1,3}(?::\d{2}(?::\d{2})?)?))?",
+    re.ASCII,
+)
+
+
+class Period(NamedTuple):
+    """Local time type: UTC offset in seconds, DST flag and abbreviation."""
+
+    offset: int
+    isdst: bool
+    name: str
+
+
+class Run(NamedTuple):
+    """count instants from start with the same offset, the first folds of them are the second occurrence."""
+
+    start: int
+    count: int
+    folds: int
+    offset: int
+
+
+class Window(NamedTuple):
+    """Instants in [start, end) share period, instants before fold_end are the second occurrence (fold=1).
+
+    None means unbounded.
+    """
+
+    start: int | None
+    end: int | None
+    period: Period
+    fold_end: int | None = None
+
+
+def _seconds(value: str) -> int:
+    """[+-]hh[:mm[:ss]] in seconds."""
+    sign = -1 if value.startswith("-") else 1
+    h, m, s = ([int(p) for p in value.lstrip("+-").split(":")] + [0, 0])[:3]
+    return sign * (h * 3600 + m * 60 + s)
+
+
+def _year_start(year: int) -> int:
+    return (datetime(year, 1, 1) - EPOCH).days * DAY
+
+
+class Rule:
+    """POSIX TZ rule from the TZif footer, e.g. CET-1CEST,M3.5.0,M10.5.0/3"""
+
+    def __init__(self, tz_string: str) -> None:
+        m = TZ_STRING.fullmatch(tz_string)
+        if not m:
+            raise ValueError(f"Invalid TZ string '{tz_string}'")
+        # POSIX offsets are positive west of Greenwich
+        self.std = Period(-_seconds(m["std_offset"]), False, m["std"].strip("<>"))
+        self.dst: Period | None = None
+        if m["dst"]:
+            offset = -_seconds(m["dst_offset"]) if m["dst_offset"] else self.std.offset + 3600
+            self.dst = Period(offset, True, m["dst"].strip("<>"))
+            self.start = RULE_DATE.fullmatch(m["start"])
+            self.end = RULE_DATE.fullmatch(m["end"])
+            if not self.start or not self.end:
+                raise ValueError(f"Invalid TZ string '{tz_string}'")
+
+    @staticmethod
+    def _local(year: int, rule: re.Match) -> int:
+        """Local time (as epoch seconds) of a rule date in year."""
+        if rule["julian"]:
+            # 1..365, February 29th is never counted
+            day = int(rule["julian"]) - 1
+            day += calendar.isleap(year) and day >= 59
+        elif rule["day"]:
+            # 0..365, February 29th is counted
+            day = int(rule["day"])
+        else:
+            month, week, weekday = int(rule["month"]), int(rule["week"]), int(rule["weekday"])
+            first, days = calendar.monthrange(year, month)
+            # weekday 0 is Sunday, week 5 is the last one of the month
+            month_day = (weekday - (first + 1)) % 7 + 1 + (week - 1) * 7
+            if month_day > days:
+                month_day -= 7
+            day = (datetime(year, month, month_day) - datetime(year, 1, 1)).days
+        return _year_start(year) + day * DAY + _seconds(rule["time"] or "2")
+
+    def transitions(self, year: int) -> tuple[int, int]:
+        """UTC instants of the DST start and end in year."""
+        return self._local(year, self.start) - self.std.offset, self._local(year, self.end) - self.dst.offset
+
+    def window(self, instant: int) -> Window:
+        """Window of instant, the rule is evaluated per UTC year (like zoneinfo)."""
+        if not self.dst:
+            return Window(None, None, self.std)
+        year = (EPOCH + timedelta(seconds=instant)).year
+        start, end = self.transitions(year)
+        year_start, year_end = _year_start(year), _year_start(year + 1)
+        bounds = [year_start, *sorted(min(max(t, year_start), year_end) for t in (start, end)), year_end]
+        periods = (self.std, self.dst, self.std) if start < end else (self.dst, self.std, self.dst)
+        i = min(bisect_right(bounds, instant) - 1, 2)
+
+        # the wall times right after the change to the smaller offset are repeated
+        shift = self.dst.offset - self.std.offset
+        fold_start, fold_end = (end, end + shift) if shift > 0 else (start, start - shift)
+        return Window(bounds[i], bounds[i + 1], periods[i], fold_end if bounds[i] == fold_start else None)
+
+
+def _read_tzif(data: bytes) -> tuple[list[int], list[Period], list[Period], str]:
+    """Transition times, their periods, all periods and the footer TZ string of TZif data."""
+    magic, version, isutcnt, isstdcnt, leapcnt, timecnt, typecnt, charcnt = HEADER.unpack_from(data)
+    if magic != b"TZif":
+        raise ValueError("Invalid TZif data")
+    offset = HEADER.size
+    time_format = "l"
+    if version >= b"2":
+        # skip the version 1 data block (32 bit times), use the 64 bit one
+        offset += timecnt * 5 + typecnt * 6 + charcnt + leapcnt * 8 + isstdcnt + isutcnt
+        _, _, isutcnt, isstdcnt, leapcnt, timecnt, typecnt, charcnt = HEADER.unpack_from(data, offset)
+        offset += HEADER.size
+        time_format = "q"
+
+    times = list(struct.unpack_from(f">{timecnt}{time_format}", data, offset))
+    offset += timecnt * struct.calcsize(time_format)
+    indices = struct.unpack_from(f">{timecnt}B", data, offset)
+    offset += timecnt
+    ttinfos = [struct.unpack_from(">lBB", data, offset + i * 6) for i in range(typecnt)]
+    offset += typecnt * 6
+    chars = data[offset : offset + charcnt]
+    offset += charcnt + leapcnt * (struct.calcsize(time_format) + 4) + isstdcnt + isutcnt
+
+    types = [Period(utoff, bool(isdst), chars[i : chars.index(b"\0", i)].decode()) for utoff, isdst, i in ttinfos]
+    footer = data[offset:].strip(b"\n").decode() if version >= b"2" else ""
+    return times, [types[i] for i in indices], types, footer
+
+
+def tzif_data(key: str) -> bytes:
+    """TZif data of a zone, searched like zoneinfo does: TZPATH first, then the tzdata package."""
+    if os.path.isabs(key) or ".." in key.split("/"):
+        raise zoneinfo.ZoneInfoNotFoundError(f"No time zone found with key {key}")
+    for path in zoneinfo.TZPATH:
+        filename = os.path.join(path, key)
+        if os.path.isfile(filename):
+            with open(filename, "rb") as f:
+                return f.read()
+    try:
+        return resources.files("tzdata.zoneinfo").joinpath(*key.split("/")).read_bytes()
+    except (ImportError, OSError):
+        raise zoneinfo.ZoneInfoNotFoundError(f"No time zone found with key {key}")
+
+
+class Transitions:
+    """Transition table of a zone."""
+
+    def __init__(self, tz: ZoneInfo, times: list[int], periods: list[Period], types: list[Period], footer: str):
+        self.tz = tz
+        self.times = times
+        self.periods = periods
+        rule = Rule(footer) if footer else None
+        # instants after the last transition follow the rule, if it has DST
+        self.rule = rule if rule and rule.dst else None
+        if times:
+            # before the first transition: the first standard time type (like zoneinfo)
+            self.before = next((t for t in types if not t.isdst), periods[0])
+        elif rule or types:
+            self.before = rule.std if rule else types[-1]
+        else:
+            raise ValueError(f"No time zone information found for {tz.key}")
+
+    @classmethod
+    def load(cls, tz: ZoneInfo) -> "Transitions":
+        if tz.key is None:
+            raise ValueError(f"{tz!r} has no key")
+        return cls(tz, *_read_tzif(tzif_data(tz.key)))
+
+    def window(self, instant: int) -> Window:
+        """Transition window of instant."""
+        times = self.times
+        if self.rule and (not times or instant > times[-1]):
+            window = self.rule.window(instant)
+            if times and window.start <= times[-1]:
+                window = window._replace(start=times[-1] + 1)
+            return window
+        if not times:
+            return Window(None, None, self.before)
+        if instant < times[0]:
+            return Window(None, times[0], self.before)
+
+        i = bisect_right(times, instant) - 1
+        if i + 1 < len(times):
+            end = times[i + 1]
+        else:
+            end = times[-1] + 1 if self.rule else None
+        previous = self.periods[i - 1] if i else self.before
+        period = self.periods[i]
+        return Window(times[i], end, period, times[i] + previous.offset - period.offset)
+
+    def windows(self, start: int, stop: int) -> Iterator[Window]:
+        """Consecutive windows covering [start, stop)."""
+        while start < stop:
+            window = self.window(start)
+            yield window
+            if window.end is None:
+                return
+            start = window.end
+
+    def table(self, start: int, stop: int) -> tuple[list[int], list[int]]:
+        """Window starts and UTC offsets covering [start, stop), e.g. for numpy.searchsorted."""
+        starts, offsets = [], []
+        for window in self.windows(start, stop):
+            starts.append(start if window.start is None else max(window.start, start))
+            offsets.append(window.period.offset)
+        return starts, offsets
+
+    def utcoffset(self, instant: int) -> int:
+        return self.window(instant).period.offset
+
+    def _runs(self, instants: Sequence[int]) -> Iterator[tuple[int, int, Window]]:
+        """(first, last) index ranges of sorted instants sharing a window."""
+        i, n = 0, len(instants)
+        while i < n:
+            window = self.window(instants[i])
+            j = n if window.end is None else bisect_right(instants, window.end - 1, i)
+            yield i, j, window
+            i = j
+
+    def offsets(self, instants: Sequence[int]) -> list[int]:
+        """UTC offsets of sorted instants."""
+        result: list[int] = []
+        for i, j, window in self._runs(instants):
+            result.extend(repeat(window.period.offset, j - i))
+        return result
+
+    def localize(self, instants: Sequence[int]) -> list[datetime]:
+        """Local times of sorted instants."""
+        result: list[datetime] = []
+        for i, j, window in self._runs(instants):
+            base = (EPOCH + timedelta(seconds=window.period.offset)).replace(tzinfo=self.tz)
+            result.extend(base + timedelta(seconds=t) for t in instants[i:j])
+            if window.fold_end is not None:
+                k = i
+                while k < j and instants[k] < window.fold_end:
+                    result[k] = result[k].replace(fold=1)
+                    k += 1
+        return result
+
+    def range_runs(self, start: int, stop: int, step: int) -> Iterator[Run]:
+        """Runs of range(start, stop, step) sharing an offset, step must be positive."""
+        instant = start
+        while instant < stop:
+            window = self.window(instant)
+            last = stop if window.end is None else min(stop, window.end)
+            count = -(-(last - instant) // step)
+            folds = 0
+            if window.fold_end is not None and window.fold_end > instant:
+                folds = min(count, -(-(window.fold_end - instant) // step))
+            yield Run(instant, count, folds, window.period.offset)
+            instant += count * step
+
+    def localize_range(self, start: int, stop: int, step: int) -> Iterator[datetime]:
+        """Local times of range(start, stop, step), step must be positive."""
+        return localize_runs(self.range_runs(start, stop, step), step, self.tz)
+
+
+def localize_runs(runs: Iterable[Run], step: int, tz: ZoneInfo) -> Iterator[datetime]:
+    """Local times in tz of the instants of runs (see Transitions.range_runs)."""
+    delta = timedelta(seconds=step)
+    for run in runs:
+        local = (EPOCH + timedelta(seconds=run.start + run.offset)).replace(tzinfo=tz)
+        for _ in range(run.folds):
+            yield local.replace(fold=1)
+            local += delta
+        if run.count > run.folds:
+            # no DST change within the run, the same offset applies to all of them
+            yield from accumulate(repeat(delta, run.count - run.folds - 1), initial=local)
+
+
+def run_offsets(runs: Iterable[Run]) -> Iterator[int]:
+    """UTC offsets of the instants of runs."""
+    return chain.from_iterable(repeat(run.offset, run.count) for run in runs)
+
+
+@cache
+def transitions(tz: ZoneInfo) -> Transitions:
+    """Transition table of tz, loaded once per zone."""
+    return Transitions.load(tz)
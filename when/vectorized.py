@@ -0,0 +1,52 @@
+"""
+NumPy backend for bulk conversions.
+
+Needs the optional numpy extra (`pip install when-cli[numpy]`) and is never imported by the CLI.
+The UTC offsets of a whole array are looked up at once with `numpy.searchsorted` in the
+transition table of the zone (see when.transitions).
+"""
+from typing import NamedTuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from .model import Location
+from .transitions import transitions
+
+
+class LocalArray(NamedTuple):
+    """Local times (naive datetime64) and UTC offsets (seconds) of a location."""
+
+    location: Location
+    local: np.ndarray
+    offsets: np.ndarray
+
+
+def utc_seconds(timestamps: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Epoch seconds of datetime64 (UTC) or int (epoch seconds) timestamps and the NaT mask."""
+    values = np.asarray(timestamps)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[s]").astype(np.int64), np.isnat(values)
+    if not np.issubdtype(values.dtype, np.integer):
+        raise TypeError(f"expected datetime64 or integer timestamps, got {values.dtype}")
+    return values.astype(np.int64), np.zeros(values.shape, dtype=bool)
+
+
+def utc_offsets(timestamps: np.ndarray, tz: ZoneInfo) -> np.ndarray:
+    """UTC offsets (seconds) of timestamps in tz, 0 for NaT."""
+    seconds, nat = utc_seconds(timestamps)
+    offsets = np.zeros(seconds.shape, dtype=np.int64)
+    valid = seconds[~nat]
+    if valid.size:
+        starts, table = transitions(tz).table(int(valid.min()), int(valid.max()) + 1)
+        offsets[~nat] = np.asarray(table, dtype=np.int64)[np.searchsorted(starts, valid, side="right") - 1]
+    return offsets
+
+
+def localize(timestamps: np.ndarray, location: Location) -> LocalArray:
+    """Local times of timestamps (datetime64 keeps its unit, epoch seconds become datetime64[s])."""
+    values = np.asarray(timestamps)
+    offsets = utc_offsets(values, location.tz)
+    if not np.issubdtype(values.dtype, np.datetime64):
+        values = values.astype("datetime64[s]")
+    return LocalArray(location=location, local=values + offsets.astype("timedelta64[s]"), offsets=offsets)
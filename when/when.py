@@ -1,83 +1,283 @@
-import json
 import zoneinfo
-from datetime import datetime
-from pathlib import Path
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Sequence
 from zoneinfo import ZoneInfo
 
-import airportsdata
-import arrow
-from dateutil.parser import parse
-
-from .config import settings
+from . import trace
+from .config import default_tz, get_settings
+from .geo import PLACES_INDEX, parse_coordinates, places_index
+from .index import locations_index
 from .model import Location, Zone
+from .parser import parse
+from .transitions import DAY, Run, localize_runs, run_offsets, transitions
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from .vectorized import LocalArray
+
+HOUR = 3600
 
 
 def location_by_key(key: str) -> Location:
     """Get a location by key/name"""
-    # user self defined locations first
-    for location in settings.locations:
-        if location.key.lower() == key.lower():
-            return location
-
-    # IATA 3-letter code
-    # ICAO 4-alphanumeric code or FAA/TD LID prefaced by “K”
-    for code in ["IATA", "ICAO"]:
-        airports = airportsdata.load(code)
-        if key.upper() in airports:
-            entry = airports[key.upper()]
-            return Location(key=key, description=f"{entry['name']}, {entry['country']}", tz=entry["tz"])
-
-    # city name?
-    cities = json.loads((Path(__file__).parent / "data" / "cities.json").read_text())
-    try:
-        city = cities[key.lower()]
-        return Location(key="", description=f"{city['name']}, {city['country']}", tz=city["tz"])
-    except KeyError:
-        pass
+    # user self defined locations and the user location directory first
+    if location := get_settings().location(key):
+        return location
+
+    # latitude,longitude: timezone of the nearest city (the nearest airport without the geonames dump)
+    if coordinates := parse_coordinates(key):
+        try:
+            place = places_index().nearest(*coordinates)
+        except OSError:
+            raise zoneinfo.ZoneInfoNotFoundError(f"{key} ({PLACES_INDEX.name} is missing, see generate_cities.py)")
+        if place:
+            description, tz = place
+            return Location(key="", description=description, tz=tz)
 
-    # ok than it must be a TZ name
+    # airport code (IATA, ICAO), city name or TZ name
+    if entry := locations_index().get(key.lower()):
+        kind, description, tz = entry
+        if kind in ("IATA", "ICAO"):
+            return Location(key=key, description=description, tz=tz)
+        if kind == "city":
+            return Location(key="", description=description, tz=tz)
+        # TZ names are case-sensitive
+        if tz == key:
+            return Location(key="", description="", tz=tz)
+
+    # ok than it must be a TZ name (unknown to the index)
     if key not in zoneinfo.available_timezones():
         raise zoneinfo.ZoneInfoNotFoundError(key)
 
     return Location(key="", description="", tz=key)
 
 
-def when(time_string: str, location_keys: list[str]) -> list[Zone]:
+def when(
+    time_string: str, location_keys: list[str], step: int = HOUR, limit: int | None = None, offset: int = 0
+) -> list[Zone]:
+    tzone = Tzone(time_string=time_string)
+    with trace.phase("locations"):
+        locations = [location_by_key(key) for key in location_keys]
+    return to_zones(tzone, locations, step=step, limit=limit, offset=offset)
+
+
+def when_stream(
+    time_string: str, location_keys: list[str], step: int = HOUR, limit: int | None = None, offset: int = 0
+) -> list[Zone]:
+    """Like when(), but the times of the zones are generated on demand.
+
+    The times of all zones are in lockstep, see rows().
+    """
     tzone = Tzone(time_string=time_string)
+    with trace.phase("locations"):
+        locations = [location_by_key(key) for key in location_keys]
+    return to_zones(tzone, locations, step=step, limit=limit, offset=offset, lazy=True)
+
+
+def rows(zones: list[Zone]) -> Iterator[tuple[datetime, ...]]:
+    """The times of all zones row by row."""
+    return zip(*[zone.times for zone in zones])
+
+
+def offset_rows(zones: list[Zone]) -> Iterator[tuple[int, ...]]:
+    """The UTC offsets of all zones row by row, in lockstep with rows()."""
+    return zip(*[zone.offsets for zone in zones])
+
+
+def when_many(
+    time_strings: Iterable[str], location_keys: list[str], step: int = HOUR, limit: int | None = None, offset: int = 0
+) -> Iterator[list[Zone]]:
+    """Convert many time strings into the same locations, the zones are generated on demand (one per time string).
+
+    The locations are resolved up front (unknown keys raise here), a time string which can't be
+    converted raises when its zones are generated. See Converter to reuse the resolved locations
+    across calls and when_batch to collect the errors.
+    """
+    return Converter(location_keys, step=step, limit=limit, offset=offset).many(time_strings)
+
+
+def when_batch(
+    time_strings: Iterable[str], location_keys: list[str], step: int = HOUR, limit: int | None = None
+) -> Iterator[tuple[str, list[Zone] | Exception]]:
+    """Convert many time strings, locations are resolved only once.
+
+    Yields (time_string, zones) or (time_string, exception) for every non-empty time string.
+    """
+    converter = Converter(location_keys, step=step, limit=limit)
+    for time_string in time_strings:
+        time_string = time_string.strip()
+        if not time_string:
+            continue
+        try:
+            yield time_string, converter.convert(time_string)
+        except Exception as e:  # noqa
+            yield time_string, e
+
+
+class Converter:
+    """Convert time strings into a fixed set of locations, e.g. when-cli embedded in a service.
+
+    The locations are resolved and their transition tables loaded once, the timezones of the
+    time strings (e.g. "in LAX") once per key. A converter can be shared between threads: the
+    only state changed after construction is the cache of resolved keys, a dict which is
+    filled with setdefault.
+    """
+
+    def __init__(self, location_keys: list[str], step: int = HOUR, limit: int | None = None, offset: int = 0) -> None:
+        self.step = step
+        self.limit = limit
+        self.offset = offset
+        with trace.phase("locations"):
+            self.locations = [location_by_key(key) for key in location_keys]
+        self._resolved: dict[str, Location] = {}
+        for location in self.locations:
+            if location.tz.key is not None:
+                transitions(location.tz)
+
+    def resolve(self, key: str) -> Location:
+        """location_by_key, cached per converter."""
+        try:
+            return self._resolved[key]
+        except KeyError:
+            # errors (unknown keys) are not cached
+            return self._resolved.setdefault(key, location_by_key(key))
+
+    def convert(self, time_string: str, lazy: bool = False) -> list[Zone]:
+        """Zones of time_string, like when() (or when_stream() if lazy)."""
+        tzone = Tzone(time_string=time_string, resolve=self.resolve)
+        return to_zones(tzone, self.locations, step=self.step, limit=self.limit, offset=self.offset, lazy=lazy)
+
+    def many(self, time_strings: Iterable[str]) -> Iterator[list[Zone]]:
+        """Zones of every time string, converted on demand."""
+        for time_string in time_strings:
+            yield self.convert(time_string)
+
+
+def when_array(timestamps: "np.ndarray", location_keys: list[str]) -> list["LocalArray"]:
+    """Convert an array of UTC timestamps (datetime64 or int epoch seconds) into every location.
+
+    Needs the optional numpy extra, see when.vectorized.
+    """
+    from .vectorized import localize
+
+    return [localize(timestamps, location_by_key(key)) for key in location_keys]
+
+
+def to_zones(
+    tzone: "Tzone",
+    locations: list[Location],
+    step: int = HOUR,
+    limit: int | None = None,
+    offset: int = 0,
+    lazy: bool = False,
+) -> list[Zone]:
     zones = []
-    for key in location_keys:
-        location = location_by_key(key)
+    for location in locations:
+        # times and offsets are generated from the same runs, the transition table is searched once per run
+        with trace.phase("convert"):
+            runs = tzone.runs(tz=location.tz, step=step, limit=limit, offset=offset)
+            times = localize_runs(runs, step, location.tz)
+            offsets = run_offsets(runs)
+            if not lazy:
+                times, offsets = list(times), list(offsets)
         zones.append(
             Zone(
                 name=location.key,
                 description=location.description,
                 tz=str(location.tz),
-                offset=tzone.utc_offset(location.tz),
-                times=[dt.isoformat() for dt in tzone.convert(tz=location.tz)],
+                offset=runs[0].offset if runs else 0,
+                # lazy: converted while the rows are consumed, e.g. rendered
+                times=trace.iterate("convert", times) if lazy else times,
+                offsets=offsets,
             )
         )
     return zones
 
 
 class Tzone:
-    def __init__(self, time_string: str) -> None:
+    def __init__(self, time_string: str, resolve: Callable[[str], Location] = location_by_key) -> None:
         self.time_string = time_string
 
-        t1, t2, tz = split_time_string(self.time_string)
-        tz = location_by_key(tz if tz else settings.default_tz).tz
+        with trace.phase("parse"):
+            t1, t2, tz = split_time_string(self.time_string)
+            with trace.phase("locations"):
+                tz = resolve(tz if tz else default_tz()).tz
+
+            self.t1 = parse_time_string(t1, tz)
+            self.t2 = parse_time_string(t2, tz) if t2 else self.t1
+
+    def ranges(self, step: int = HOUR, limit: int | None = None, offset: int = 0) -> list[range]:
+        """UTC epoch seconds from t1 to t2 (inclusive) every step seconds, paged by offset and limit.
+
+        Steps shorter than a day are taken in UTC, so all zones get the same instants, even across
+        DST changes: one range. Steps of whole days are taken in the local time of the time string,
+        09:00 stays 09:00 there: one range per UTC offset of the time string's zone.
+        """
+        if step % DAY or not isinstance(self.t1.tzinfo, ZoneInfo):
+            instants = range(int(self.t1.timestamp()), int(self.t2.timestamp()) + 1, step)
+            return [instants[offset:] if limit is None else instants[offset : offset + limit]]
+
+        start, delta = self.t1.replace(tzinfo=None), timedelta(seconds=step)
+        steps = range(max(0, (self.t2.replace(tzinfo=None) - start) // delta + 1))
+        steps = steps[offset:] if limit is None else steps[offset : offset + limit]
+        ranges: list[range] = []
+        for i in steps:
+            instant = int((start + i * delta).replace(tzinfo=self.t1.tzinfo, fold=self.t1.fold).timestamp())
+            if ranges and ranges[-1].stop == instant:
+                ranges[-1] = range(ranges[-1].start, instant + 1, step)
+            else:
+                ranges.append(range(instant, instant + 1, step))
+        return ranges
+
+    def instants(self, step: int = HOUR, limit: int | None = None, offset: int = 0) -> Sequence[int]:
+        """The instants of ranges(), a range for steps shorter than a day."""
+        ranges = self.ranges(step=step, limit=limit, offset=offset)
+        return ranges[0] if len(ranges) == 1 else [instant for instants in ranges for instant in instants]
 
-        self.t1 = parse_time_string(t1, tz)
-        self.t2 = parse_time_string(t2, tz) if t2 else self.t1
+    def runs(self, tz: ZoneInfo | str, step: int = HOUR, limit: int | None = None, offset: int = 0) -> list[Run]:
+        """The instants() grouped into runs sharing the UTC offset in tz, one per DST period (and range)."""
+        tz = as_zoneinfo(tz)
+        runs: list[Run] = []
+        for instants in self.ranges(step=step, limit=limit, offset=offset):
+            if tz.key is not None:
+                runs.extend(transitions(tz).range_runs(instants.start, instants.stop, instants.step))
+                continue
 
-    def convert(self, tz: ZoneInfo | str) -> list[datetime]:
-        t1 = self.t1.to(tz)
-        t2 = self.t2.to(tz)
-        return [t.datetime for t in arrow.Arrow.range("hour", t1, t2)]
+            # not loaded from the tz database (ZoneInfo.from_file), no transition table
+            first = len(runs)
+            for instant in instants:
+                local = datetime.fromtimestamp(instant, tz)
+                utc_offset = int(local.utcoffset().total_seconds())  # type: ignore[union-attr]
+                if (
+                    len(runs) > first
+                    and runs[-1].offset == utc_offset
+                    and (not local.fold or runs[-1].folds == runs[-1].count)
+                ):
+                    runs[-1] = runs[-1]._replace(count=runs[-1].count + 1, folds=runs[-1].folds + local.fold)
+                else:
+                    runs.append(Run(instant, 1, local.fold, utc_offset))
+        return runs
 
-    def utc_offset(self, tz) -> int:
-        if offset := arrow.now(tz).utcoffset():
-            return int(offset.total_seconds())
-        return 0
+    def iter_convert(
+        self, tz: ZoneInfo | str, step: int = HOUR, limit: int | None = None, offset: int = 0
+    ) -> Iterator[datetime]:
+        """The instants() in tz, generated on demand.
+
+        The offsets come from the transition table of the zone, one lookup per DST period.
+        """
+        tz = as_zoneinfo(tz)
+        return localize_runs(self.runs(tz, step=step, limit=limit, offset=offset), step, tz)
+
+    def convert(
+        self, tz: ZoneInfo | str, step: int = HOUR, limit: int | None = None, offset: int = 0
+    ) -> list[datetime]:
+        """Steps (hourly by default) from t1 to t2 (inclusive) in tz."""
+        return list(self.iter_convert(tz, step=step, limit=limit, offset=offset))
+
+    def utc_offsets(self, tz: ZoneInfo | str, step: int = HOUR, limit: int | None = None, offset: int = 0) -> list[int]:
+        """UTC offsets (seconds) of the instants() in tz."""
+        return list(run_offsets(self.runs(tz, step=step, limit=limit, offset=offset)))
 
 
 def split_time_string(time_string: str) -> tuple[str, str, str]:
@@ -102,5 +302,10 @@ def split_time_string(time_string: str) -> tuple[str, str, str]:
         raise Exception(f"can't parse {time_string}")
 
 
-def parse_time_string(time_string: str, tz: ZoneInfo | str) -> arrow.Arrow:
-    return arrow.get(parse(time_string, ignoretz=True), tz)
+def parse_time_string(time_string: str, tz: ZoneInfo | str) -> datetime:
+    value, _ = parse(time_string)
+    return value.replace(tzinfo=as_zoneinfo(tz))
+
+
+def as_zoneinfo(tz: ZoneInfo | str) -> ZoneInfo:
+    return tz if isinstance(tz, ZoneInfo) else ZoneInfo(tz)